@@ -0,0 +1,68 @@
+"""
+Регрессионный бенчмарк проверок доступа к приватным постам.
+
+По умолчанию используется 10k постов и 10k строк в access.txt и access_requests.txt.
+Запуск из директории blog-backend:
+    python -m benchmarks.bench_access
+    python -m benchmarks.bench_access --budget-ms 500
+
+С параметром --budget-ms бенчмарк завершается с ошибкой, если какая-либо
+функция работает дольше заданного времени.
+"""
+import argparse
+import sys
+import tempfile
+import time
+
+from benchmarks.dataset import configure_environment, generate_dataset
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк проверок доступа")
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--access-rows", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        configure_environment(directory)
+        # Импортируем репозиторий только после настройки путей к файлам
+        from repositories import post_repository
+        from repositories.storage import get_storage
+
+        usernames = generate_dataset(
+            directory,
+            users=args.users,
+            posts=args.posts,
+            private_ratio=0.5,
+            access_ratio=1.0,
+            access_rows=args.access_rows,
+        )
+        viewer = usernames[0]
+        cases = {
+            "get_access_requests_for_my_posts": lambda: post_repository.get_access_requests_for_my_posts(viewer),
+            "get_posts_by_authors": lambda: post_repository.get_posts_by_authors(usernames[1:50], viewer),
+            "get_accessible_private_posts": lambda: post_repository.get_accessible_private_posts(viewer),
+            "get_inaccessible_private_posts": lambda: post_repository.get_inaccessible_private_posts(viewer),
+        }
+        get_storage().load()
+
+        print(f"posts={args.posts} access_rows={args.access_rows}")
+        over_budget = []
+        for name, case in cases.items():
+            best = float("inf")
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                case()
+                best = min(best, time.perf_counter() - started)
+            print(f"{name:<36} {best * 1000:>10.1f} ms")
+            if args.budget_ms is not None and best * 1000 > args.budget_ms:
+                over_budget.append(name)
+
+        if over_budget:
+            print(f"Превышен бюджет {args.budget_ms} ms: {', '.join(over_budget)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Нагрузочный тест: задержка легкого эндпоинта, пока параллельно выполняются тяжелые.
+
+Легкий запрос - GET /posts/{post_id}, тяжелый - полная публичная лента GET /posts/public/feed.
+Запросы выполняются в одном цикле событий через ASGI-транспорт httpx, поэтому любая
+блокирующая операция в обработчике сразу видна как рост задержки остальных запросов.
+
+Запуск из директории blog-backend:
+    python -m benchmarks.bench_concurrency --posts 5000 --heavy 8
+
+p99 легкого эндпоинта под нагрузкой должен оставаться близким к p99 без нагрузки.
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+from benchmarks.dataset import configure_environment, generate_dataset
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+async def measure_cheap(client, path, headers, duration):
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.text
+        await asyncio.sleep(0.005)
+    return latencies
+
+async def run_heavy(client, stop):
+    count = 0
+    while not stop.is_set():
+        response = await client.get("/posts/public/feed")
+        assert response.status_code == 200
+        count += 1
+    return count
+
+async def run(args, post_id, headers):
+    import httpx
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        path = f"/posts/{post_id}"
+        idle = await measure_cheap(client, path, headers, args.duration)
+
+        stop = asyncio.Event()
+        heavy = [asyncio.create_task(run_heavy(client, stop)) for _ in range(args.heavy)]
+        loaded = await measure_cheap(client, path, headers, args.duration)
+        stop.set()
+        heavy_requests = sum(await asyncio.gather(*heavy))
+
+    print(f"{'':>14} {'requests':>9} {'p50, ms':>9} {'p99, ms':>9}")
+    for name, latencies in [("idle", idle), ("under load", loaded)]:
+        print(f"{name:>14} {len(latencies):>9} {statistics.median(latencies) * 1000:>9.2f} "
+              f"{percentile(latencies, 0.99) * 1000:>9.2f}")
+    print(f"heavy feed requests completed: {heavy_requests}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест легких и тяжелых эндпоинтов")
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--heavy", type=int, default=8, help="число параллельных запросов ленты")
+    parser.add_argument("--duration", type=float, default=3.0, help="длительность каждой фазы, секунды")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        configure_environment(directory)
+        usernames = generate_dataset(directory, users=args.users, posts=args.posts)
+        # Импортируем приложение только после настройки путей к файлам
+        from repositories.storage import get_storage
+        from services.auth_service import create_access_token
+
+        storage = get_storage()
+        storage.load()
+        post_id = storage.list_public_posts()[0].id
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': usernames[0]})}"}
+        asyncio.run(run(args, post_id, headers))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Бенчмарк ленты пользователя (get_user_feed) на синтетических данных разного размера.
+
+Запуск из директории blog-backend:
+    python -m benchmarks.bench_feed --sizes 1000 2000 4000 8000
+
+Время на один пост должно оставаться примерно постоянным,
+то есть время сборки ленты растет линейно с количеством постов.
+"""
+import argparse
+import tempfile
+import time
+
+from benchmarks.dataset import configure_environment, generate_dataset
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк get_user_feed")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 2000, 4000, 8000])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        configure_environment(directory)
+        # Импортируем сервис только после настройки путей к файлам
+        from services.post_service import get_user_feed
+
+        print(f"{'posts':>8} {'feed, ms':>10} {'us/post':>10}")
+        for size in args.sizes:
+            usernames = generate_dataset(directory, users=args.users, posts=size)
+            best = float("inf")
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                get_user_feed(usernames[0])
+                best = min(best, time.perf_counter() - started)
+            print(f"{size:>8} {best * 1000:>10.1f} {best * 1e6 / size:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Бенчмарк памяти: пиковый RSS процесса после загрузки постов и типичных запросов.
+
+Набор данных генерируется в родительском процессе, измерение выполняется
+в отдельном процессе, чтобы генерация не влияла на пиковый RSS.
+Запуск из директории blog-backend:
+    python -m benchmarks.bench_memory --posts 100000 --content-length 1000
+"""
+import argparse
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.dataset import configure_environment, generate_dataset
+
+def peak_rss_mb() -> float:
+    # В Linux ru_maxrss возвращается в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def measure(directory: str, users: int):
+    configure_environment(directory)
+    # Импортируем сервисы только после настройки путей к файлам
+    from repositories import post_repository
+    from repositories.storage import get_storage
+    from services.post_service import get_all_posts_for_public_feed, get_user_feed
+    from services.user_service import get_followed_users_posts
+
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    get_storage().load()
+    load_seconds = time.perf_counter() - started
+    after_load = peak_rss_mb()
+
+    viewer = "user0"
+    get_user_feed(viewer, limit=20)
+    get_all_posts_for_public_feed(limit=20)
+    get_followed_users_posts(viewer, limit=20)
+    post_repository.get_accessible_private_posts(viewer)
+    post_repository.get_posts_by_authors([f"user{i}" for i in range(1, min(users, 50))], viewer)
+    after_requests = peak_rss_mb()
+
+    print(f"{'import, MB':<24} {baseline:>10.1f}")
+    print(f"{'load, MB':<24} {after_load:>10.1f} ({load_seconds:.1f} s)")
+    print(f"{'requests, MB':<24} {after_requests:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк памяти хранилища постов")
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--content-length", type=int, default=1000)
+    parser.add_argument("--measure", metavar="DIRECTORY", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, args.users)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        generate_dataset(
+            directory, users=args.users, posts=args.posts, comments_per_post=0.5, content_length=args.content_length
+        )
+        print(f"posts={args.posts} content_length={args.content_length}")
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_memory", "--users", str(args.users), "--measure", directory],
+            check=True,
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Бенчмарк поиска постов (/posts/search) на синтетических данных.
+
+Тексты постов составляются из слов словаря benchmarks.dataset.VOCABULARY с частотами
+по закону Ципфа, поэтому в запросах есть и очень частые, и редкие слова.
+Запуск из директории blog-backend:
+    python -m benchmarks.bench_search
+    python -m benchmarks.bench_search --posts 100000 --budget-ms 10
+
+С параметром --budget-ms бенчмарк завершается с ошибкой, если какой-либо
+запрос выполняется дольше заданного времени.
+"""
+import argparse
+import sys
+import tempfile
+import time
+
+from benchmarks.dataset import VOCABULARY, configure_environment, generate_dataset
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк поиска постов")
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--content-length", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        configure_environment(directory)
+        # Импортируем сервис только после настройки путей к файлам
+        from repositories.storage import get_storage
+        from services.search import search_index, search_posts
+
+        usernames = generate_dataset(
+            directory, users=args.users, posts=args.posts, comments_per_post=0, content_length=args.content_length
+        )
+        get_storage().load()
+        started = time.perf_counter()
+        search_index.ensure_built()
+        print(f"posts={args.posts} index build: {time.perf_counter() - started:.1f} s")
+
+        viewer = usernames[0]
+        cases = {
+            "частое слово": {"query": VOCABULARY[0]},
+            "слово средней частоты": {"query": VOCABULARY[300]},
+            "редкое слово": {"query": VOCABULARY[15000]},
+            "три слова": {"query": f"{VOCABULARY[1]} {VOCABULARY[50]} {VOCABULARY[2000]}"},
+            "частые слова": {"query": f"{VOCABULARY[0]} {VOCABULARY[1]} {VOCABULARY[2]}"},
+            "слово и тег": {"query": VOCABULARY[10], "tags": ["python"]},
+            "два тега": {"query": "", "tags": ["python", "news"]},
+        }
+        over_budget = []
+        for name, case in cases.items():
+            best = float("inf")
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                search_posts(case["query"], case.get("tags", []), viewer, limit=args.limit)
+                best = min(best, time.perf_counter() - started)
+            print(f"{name:<28} {best * 1000:>10.2f} ms")
+            if args.budget_ms is not None and best * 1000 > args.budget_ms:
+                over_budget.append(name)
+
+        if over_budget:
+            print(f"Превышен бюджет {args.budget_ms} ms: {', '.join(over_budget)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import itertools
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+
+# Переменные окружения с путями к файлам базы данных и имена файлов синтетического набора
+DATABASE_FILES = {
+    "DATABASE_USERS_FILE": "users.txt",
+    "DATABASE_POSTS_FILE": "posts.txt",
+    "DATABASE_ACCESS_REQUESTS_FILE": "access_requests.txt",
+    "DATABASE_ACCESS_FILE": "access.txt",
+    "DATABASE_COMMENTS_FILE": "comments.txt",
+    "DATABASE_SUBSCRIPTIONS_FILE": "subscriptions.txt",
+}
+
+# Словарь для текстов постов: частота слова обратно пропорциональна его рангу (закон Ципфа)
+VOCABULARY = [f"слово{rank}" for rank in range(20000)]
+_VOCABULARY_CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+
+def configure_environment(directory: str):
+    """
+    Направляет репозитории на файлы в указанной директории.
+    Вызывается до импорта модулей repositories, так как пути читаются при импорте.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for env_name, file_name in DATABASE_FILES.items():
+        os.environ[env_name] = os.path.join(directory, file_name)
+    # Служебные файлы (refresh token, журнал изменений) тоже не должны попасть в database/
+    os.environ["DATABASE_REFRESH_TOKENS_FILE"] = os.path.join(directory, "refresh_tokens.txt")
+    os.environ["CHANGE_JOURNAL_FILE"] = os.path.join(directory, "changes.log")
+
+def generate_dataset(
+    directory: str,
+    users: int,
+    posts: int,
+    comments_per_post: float = 2,
+    private_ratio: float = 0.3,
+    access_ratio: float = 0.5,
+    subscriptions_per_user: int = 5,
+    access_rows: int = None,
+    content_length: int = 0,
+    seed: int = 42,
+):
+    """
+    Генерирует синтетический набор данных в формате файлов базы данных.
+    access_rows задает число запросов на доступ (по умолчанию один на каждый приватный пост),
+    доля access_ratio из них одобрена и попадает в access.txt.
+    content_length дополняет текст каждого поста словами из VOCABULARY до указанной длины.
+    Возвращает список имен пользователей.
+    """
+    rng = random.Random(seed)
+    usernames = [f"user{i}" for i in range(users)]
+    start = datetime(2024, 1, 1)
+
+    def created_at(index: int) -> str:
+        return str(start + timedelta(seconds=index, microseconds=rng.randint(1, 999999)))
+
+    def new_id() -> str:
+        return str(uuid.UUID(int=rng.getrandbits(128)))
+
+    paths = {env_name: os.path.join(directory, file_name) for env_name, file_name in DATABASE_FILES.items()}
+    os.makedirs(directory, exist_ok=True)
+
+    with open(paths["DATABASE_USERS_FILE"], "w") as file:
+        for username in usernames:
+            file.write(f"{username}:{username}@example.com:not-a-real-hash:\n")
+
+    post_ids = []
+    private_posts = []
+    with open(paths["DATABASE_POSTS_FILE"], "w", encoding="utf-8") as file:
+        for i in range(posts):
+            post_id = new_id()
+            author = rng.choice(usernames)
+            is_public = rng.random() >= private_ratio
+            tags = ",".join(rng.sample(["python", "fastapi", "news", "travel", "food"], 2))
+            content = f"Текст поста {i}"
+            if len(content) < content_length:
+                # Средняя длина слова словаря с пробелом - около 10 символов
+                words = rng.choices(VOCABULARY, cum_weights=_VOCABULARY_CUM_WEIGHTS, k=(content_length - len(content)) // 10 + 1)
+                content = f"{content} {' '.join(words)}"[:content_length]
+            file.write(f"{post_id}|Пост {i}|{content}|{is_public}|{author}|{tags}|{created_at(i)}\n")
+            post_ids.append(post_id)
+            if not is_public:
+                private_posts.append((post_id, author))
+
+    with open(paths["DATABASE_COMMENTS_FILE"], "w", encoding="utf-8") as file:
+        for i in range(int(posts * comments_per_post)):
+            file.write(f"{new_id()}|{rng.choice(post_ids)}|{rng.choice(usernames)}|Комментарий {i}|{created_at(i)}\n")
+
+    with open(paths["DATABASE_ACCESS_REQUESTS_FILE"], "w") as requests_file, \
+            open(paths["DATABASE_ACCESS_FILE"], "w") as access_file:
+        rows = len(private_posts) if access_rows is None else access_rows
+        for i in range(rows if private_posts else 0):
+            post_id, author = private_posts[i % len(private_posts)]
+            requester = rng.choice(usernames)
+            granted = rng.random() < access_ratio
+            status = "approved" if granted else rng.choice(["pending", "rejected"])
+            requests_file.write(f"{new_id()}|{post_id}|{requester}|{status}|{created_at(i)}\n")
+            if granted:
+                access_file.write(f"{new_id()}|{post_id}|{requester}|{author}|{created_at(i)}\n")
+
+    with open(paths["DATABASE_SUBSCRIPTIONS_FILE"], "w") as file:
+        for i, follower in enumerate(usernames):
+            for following in rng.sample(usernames, min(subscriptions_per_user, users)):
+                file.write(f"{new_id()}|{follower}|{following}|{created_at(i)}\n")
+
+    return usernames
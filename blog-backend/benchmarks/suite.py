@@ -0,0 +1,237 @@
+"""
+Набор бенчмарков репозиториев, сервисов и эндпоинтов с отчетом в JSON.
+
+Для каждого масштаба (числа постов) генерируется синтетический набор данных
+(benchmarks.dataset): пользователи, посты, комментарии, запросы на доступ, разрешения
+и подписки. Каждая функция и каждый эндпоинт (через TestClient) вызываются repeat раз
+после первого (холодного) вызова, в отчет попадают время первого вызова, минимум,
+медиана и p95, а также память, выделенная одним вызовом (пик tracemalloc). Набор данных определяется параметрами и seed, поэтому отчеты разных
+коммитов можно сравнивать.
+
+Запуск из директории blog-backend:
+    python -m benchmarks.suite --scales 1000 10000 100000 --output report.json
+    python -m benchmarks.suite --output new.json --compare report.json --max-regression 0.25
+
+С --compare печатается сравнение медиан с предыдущим отчетом; с --max-regression бенчмарк
+завершается с ошибкой, если медиана какого-либо случая выросла больше заданной доли
+(и больше чем на --min-delta-ms).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.dataset import VOCABULARY, configure_environment, generate_dataset
+
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench-password"
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def measure(case: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """
+    Время первого вызова и статистика следующих repeat вызовов, в миллисекундах,
+    и пик памяти, выделенной еще одним вызовом, в килобайтах. Память считается
+    отдельным вызовом, потому что tracemalloc замедляет выполнение.
+    """
+    started = time.perf_counter()
+    case()
+    first = time.perf_counter() - started
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        case()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        case()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "first_ms": round(first * 1000, 3),
+        "min_ms": round(min(timings) * 1000, 3),
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(percentile(timings, 0.95) * 1000, 3),
+        "peak_alloc_kb": round(peak / 1024, 1),
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def function_cases(usernames: List[str]) -> Dict[str, Callable[[], object]]:
+    from repositories import post_repository
+    from services import post_service
+    from services.search import search_posts
+    from services.serialization import dumps, ndjson_lines
+    from services.tags import get_top_tags
+
+    def stream_public_posts():
+        # Потоковая выдача (NDJSON) без HTTP: порции читаются и сериализуются по одной
+        for _ in (ndjson_lines(posts) for posts in post_service.iter_public_posts()):
+            pass
+
+    viewer = usernames[0]
+    authors = usernames[1:50]
+    return {
+        "get_user_feed": lambda: post_service.get_user_feed(viewer),
+        "get_user_feed page": lambda: post_service.get_user_feed(viewer, limit=20),
+        "get_all_posts_for_public_feed": lambda: post_service.get_all_posts_for_public_feed(),
+        "get_all_posts_for_public_feed page": lambda: post_service.get_all_posts_for_public_feed(limit=20),
+        "public posts JSON": lambda: dumps(post_service.get_all_public_posts()[0]),
+        "public posts NDJSON stream": stream_public_posts,
+        "get_posts_by_authors": lambda: post_repository.get_posts_by_authors(authors, viewer),
+        "get_access_requests_for_my_posts": lambda: post_repository.get_access_requests_for_my_posts(viewer),
+        "get_accessible_private_posts": lambda: post_repository.get_accessible_private_posts(viewer),
+        "get_inaccessible_private_posts": lambda: post_repository.get_inaccessible_private_posts(viewer),
+        "get_top_tags": lambda: get_top_tags(20),
+        "search_posts": lambda: search_posts(VOCABULARY[10], [], viewer, limit=20),
+    }
+
+def endpoint_cases(client, usernames: List[str], post_id: str) -> Dict[str, Callable[[], object]]:
+    client.post("/register", json={"username": BENCH_USER, "email": "bench@example.com", "password": BENCH_PASSWORD})
+    token = client.post("/token", data={"username": BENCH_USER, "password": BENCH_PASSWORD}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    for username in usernames[:20]:
+        client.post(f"/users/follow/{username}", headers=headers)
+
+    def get(path: str, **params):
+        def call():
+            response = client.get(path, params=params, headers=headers)
+            assert response.status_code == 200, f"{path}: {response.status_code} {response.text}"
+        return call
+
+    return {
+        "GET /posts/feed": get("/posts/feed"),
+        "GET /posts/feed?limit=20": get("/posts/feed", limit=20),
+        "GET /posts/public/feed": get("/posts/public/feed"),
+        "GET /posts/public/feed?limit=20": get("/posts/public/feed", limit=20),
+        "GET /posts/public?limit=20": get("/posts/public", limit=20),
+        "GET /posts/public/tags": get("/posts/public/tags"),
+        "GET /posts/search": get("/posts/search", q=VOCABULARY[10], limit=20),
+        "GET /users/followed/posts?limit=20": get("/users/followed/posts", limit=20),
+        "GET /posts/{post_id}": get(f"/posts/{post_id}"),
+    }
+
+def run_scale(directory: str, posts: int, args) -> List[dict]:
+    from fastapi.testclient import TestClient
+    from main import app
+    from repositories.storage import get_storage
+
+    started = time.perf_counter()
+    usernames = generate_dataset(
+        directory,
+        users=max(args.min_users, posts // args.posts_per_user),
+        posts=posts,
+        content_length=args.content_length,
+        seed=args.seed,
+    )
+    generation = time.perf_counter() - started
+    started = time.perf_counter()
+    get_storage().load()
+    results = [
+        {"scale": posts, "kind": "setup", "name": "generate_dataset", "first_ms": round(generation * 1000, 3)},
+        {"scale": posts, "kind": "setup", "name": "storage.load",
+         "first_ms": round((time.perf_counter() - started) * 1000, 3)},
+    ]
+    for name, case in function_cases(usernames).items():
+        results.append({"scale": posts, "kind": "function", "name": name, **measure(case, args.repeat)})
+        print_result(results[-1])
+    post_id = get_storage().list_posts_page(None, 1, is_public=True)[0].id
+    with TestClient(app) as client:
+        for name, case in endpoint_cases(client, usernames, post_id).items():
+            results.append({"scale": posts, "kind": "endpoint", "name": name, **measure(case, args.repeat)})
+            print_result(results[-1])
+    return results
+
+def print_result(result: dict):
+    print(
+        f"{result['scale']:>8} {result['name']:<40} {result['first_ms']:>10.1f} "
+        f"{result['median_ms']:>10.2f} {result['p95_ms']:>10.2f} {result['peak_alloc_kb']:>12.1f}"
+    )
+
+def compare(results: List[dict], baseline: dict, max_regression: Optional[float], min_delta_ms: float) -> List[str]:
+    """
+    Печатает изменение медиан относительно предыдущего отчета.
+    Возвращает случаи, медиана которых выросла больше допустимого.
+    """
+    previous = {(item["scale"], item["name"]): item for item in baseline["results"] if "median_ms" in item}
+    regressions = []
+    print(f"\nСравнение с {baseline['meta'].get('commit') or 'предыдущим отчетом'}")
+    for result in results:
+        before = previous.get((result["scale"], result["name"]))
+        if before is None or "median_ms" not in result:
+            continue
+        ratio = result["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+        allocations = ""
+        if "peak_alloc_kb" in before and "peak_alloc_kb" in result:
+            allocations = f", {before['peak_alloc_kb']:.0f} -> {result['peak_alloc_kb']:.0f} KB"
+        print(
+            f"{result['scale']:>8} {result['name']:<40} {before['median_ms']:>10.2f} "
+            f"-> {result['median_ms']:>10.2f} ms ({ratio:.2f}x){allocations}"
+        )
+        delta = result["median_ms"] - before["median_ms"]
+        if max_regression is not None and ratio > 1 + max_regression and delta > min_delta_ms:
+            regressions.append(f"{result['scale']} {result['name']}")
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Набор бенчмарков с отчетом в JSON")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 10000], help="число постов")
+    parser.add_argument("--posts-per-user", type=int, default=10)
+    parser.add_argument("--min-users", type=int, default=100)
+    parser.add_argument("--content-length", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="файл отчета JSON")
+    parser.add_argument("--compare", default=None, help="предыдущий отчет JSON для сравнения")
+    parser.add_argument("--max-regression", type=float, default=None, help="допустимый рост медианы (доля)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="рост медианы меньше этого не считается")
+    args = parser.parse_args(argv)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        configure_environment(directory)
+        print(f"{'posts':>8} {'case':<40} {'first, ms':>10} {'median, ms':>10} {'p95, ms':>10} {'alloc, KB':>12}")
+        # Файлы набора перезаписываются для каждого масштаба, хранилище и кэши замечают изменение
+        for posts in args.scales:
+            report["results"].extend(run_scale(directory, posts, args))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare(report["results"], json.load(file), args.max_regression, args.min_delta_ms)
+        if regressions:
+            print(f"Медиана выросла больше чем на {args.max_regression:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
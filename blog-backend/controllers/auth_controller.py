@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from datetime import timedelta, datetime
@@ -7,12 +7,21 @@ from services.auth_service import (
     authenticate_user,
     create_access_token,
     create_refresh_token,
-    get_password_hash,
-    save_user,
     register_user,
     get_current_user,  # Импортируем get_current_user
+    get_current_user_readonly,
 )
 from repositories.user_repository import get_user
+from repositories.token_repository import (
+    save_refresh_token,
+    get_refresh_token_owner,
+    revoke_refresh_token,
+    revoke_user_refresh_tokens,
+)
+from services.executor import run_blocking
+from controllers.network import PRIVATE_NETWORKS, address_in, parse_networks
+from typing import Optional
+import os
 
 router = APIRouter(tags=["auth"])
 
@@ -23,6 +32,18 @@ REFRESH_TOKEN_EXPIRE_DAYS = 7
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Брать адрес клиента из заголовка X-Real-IP (устанавливается nginx перед бэкендом)
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true"
+# Адреса прокси, которым разрешено передавать X-Real-IP. Заголовок от остальных клиентов
+# игнорируется, иначе подменой адреса можно было бы обойти ограничения попыток входа и регистрации
+TRUSTED_PROXIES = parse_networks(os.getenv("TRUSTED_PROXIES", PRIVATE_NETWORKS))
+
+def client_ip(request: Request) -> Optional[str]:
+    peer = request.client.host if request.client else None
+    if TRUST_PROXY_HEADERS and request.headers.get("X-Real-IP") and address_in(peer, TRUSTED_PROXIES):
+        return request.headers["X-Real-IP"]
+    return peer
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -34,13 +55,13 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return encoded_jwt
 
 @router.post("/register")
-async def register(user: User):
-    register_user(user.username, user.email, user.password)
+async def register(user: User, request: Request):
+    await register_user(user.username, user.email, user.password, client_ip(request))
     return {"message": "User registered successfully"}
 
 @router.post("/token")
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(form_data.username, form_data.password)
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await authenticate_user(form_data.username, form_data.password, client_ip(request))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -48,17 +69,19 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
             headers={"WWW-Authenticate": "Bearer"},
         )
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    # Email добавляется в токен для режима доверия данным токена (AUTH_TRUST_TOKEN_CLAIMS)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "email": user.email}, expires_delta=access_token_expires
     )
     # Создаем refresh token
     refresh_token_expires = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     refresh_token = create_refresh_token(
         data={"sub": user.username}, expires_delta=refresh_token_expires
     )
-    # Сохраняем refresh token в базе данных
-    user.refresh_token = refresh_token
-    save_user(user)
+    # Сохраняем хеш refresh token в хранилище токенов (файл пользователей не переписывается)
+    await run_blocking(
+        save_refresh_token, user.username, refresh_token, datetime.utcnow() + refresh_token_expires
+    )
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 @router.post("/refresh-token")
@@ -76,22 +99,36 @@ async def refresh_token(refresh_token: str):
         if username is None:
             raise credentials_exception
 
-        # Проверяем, что refresh token совпадает с сохраненным в базе
-        user = get_user(username)
-        if user is None or user.refresh_token != refresh_token:
+        # Проверяем, что refresh token сохранен в хранилище токенов и не отозван
+        if await run_blocking(get_refresh_token_owner, refresh_token) != username:
+            raise credentials_exception
+        user = await run_blocking(get_user, username)
+        if user is None:
             raise credentials_exception
 
         # Создаем новый access token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user.username}, expires_delta=access_token_expires
+            data={"sub": user.username, "email": user.email}, expires_delta=access_token_expires
         )
 
         return {"access_token": access_token, "token_type": "bearer"}
 
     except JWTError:
         raise credentials_exception
-        
+
+@router.post("/logout")
+async def logout(refresh_token: str):
+    # Отзываем refresh token текущего устройства, access token действует до истечения
+    await run_blocking(revoke_refresh_token, refresh_token)
+    return {"message": "Logged out"}
+
+@router.post("/logout-all")
+async def logout_all(current_user: UserInDB = Depends(get_current_user)):
+    # Отзываем refresh token всех устройств пользователя
+    await run_blocking(revoke_user_refresh_tokens, current_user.username)
+    return {"message": "Logged out from all devices"}
+
 @router.get("/users/me")
-async def read_users_me(current_user: UserInDB = Depends(get_current_user)):
+async def read_users_me(current_user: UserInDB = Depends(get_current_user_readonly)):
     return {"username": current_user.username, "email": current_user.email}
\ No newline at end of file
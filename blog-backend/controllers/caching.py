@@ -0,0 +1,128 @@
+import hashlib
+import os
+import re
+from typing import Callable, List, Optional, Tuple
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from repositories import versions
+from services.auth_service import decode_access_token
+from services.executor import run_blocking
+from services.serialization import wants_ndjson
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Сколько секунд общий кэш (nginx) и браузер могут отдавать публичный ответ без перепроверки
+PUBLIC_CACHE_MAX_AGE = int(os.getenv("PUBLIC_CACHE_MAX_AGE", "5"))
+
+# Правила для GET-эндпоинтов: шаблон пути -> (ресурсы, от версий которых зависит ответ;
+# является ли ответ одинаковым для всех пользователей)
+_RULES: List[Tuple[re.Pattern, Callable[[dict], Tuple[List[str], bool]]]] = [
+    (re.compile(r"^/posts/public$"), lambda params: (["posts"], True)),
+    (re.compile(r"^/posts/public/feed$"), lambda params: (["posts", "comments"], True)),
+    (re.compile(r"^/posts/public/tags(/[^/]+)?$"), lambda params: (["posts"], True)),
+    (re.compile(r"^/posts/me$"), lambda params: (["posts"], False)),
+    (re.compile(r"^/posts/feed$"), lambda params: (["posts", "comments", "access", "subscriptions"], False)),
+    (re.compile(r"^/posts/access/(my_requests|my_posts_requests)$"), lambda params: (["access", "posts"], False)),
+    (re.compile(r"^/users/followed/posts$"), lambda params: (["posts", "access", "subscriptions"], False)),
+    (re.compile(r"^/users/me$"), lambda params: (["users"], False)),
+    (re.compile(r"^/posts/search$"), lambda params: (["posts", "access"], False)),
+    (re.compile(r"^/posts/(?P<post_id>[^/]+)/comments/?$"), lambda params: (
+        [f"comments:{params['post_id']}", f"post:{params['post_id']}", "access"], False
+    )),
+    # Просмотр поста требует авторизации, поэтому ответ персональный даже для публичного поста
+    (re.compile(r"^/posts/(?P<post_id>[^/]+)$"), lambda params: (
+        [f"post:{params['post_id']}", "access"], False
+    )),
+]
+
+# Эндпоинты, которые по заголовку Accept отдают поток NDJSON вместо JSON-массива:
+# ETag учитывает формат ответа, а Vary сообщает кэшам, что ответ зависит от Accept
+_STREAMING = re.compile(r"^/posts/(me|public|public/feed)$")
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Проверяет заголовок If-None-Match (список ETag через запятую, "*" или слабые W/"...").
+    """
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
+
+def _token_subject(headers: Headers) -> Optional[str]:
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return decode_access_token(token)["sub"]
+    except HTTPException:
+        return None
+
+class ConditionalRequestMiddleware:
+    """
+    Условные запросы для GET-эндпоинтов чтения.
+
+    ETag вычисляется до вызова эндпоинта из версий ресурсов (repositories.versions, в пуле потоков),
+    пути, параметров запроса и, для персональных ответов, имени пользователя из токена.
+    Если ETag совпадает с If-None-Match, ответ 304 отправляется сразу, без сервисов и хранилища.
+    Публичные ответы помечаются Cache-Control: public, max-age, чтобы их кэшировал nginx,
+    персональные - private, no-cache (браузер хранит ответ, но всегда перепроверяет его).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+        rule = self._match(scope["path"])
+        if rule is None:
+            return await self.app(scope, receive, send)
+        keys, public = rule
+        headers = Headers(scope=scope)
+        username = ""
+        if not public:
+            username = _token_subject(headers)
+            if username is None:
+                # Без действительного токена ответ (401) формирует сам эндпоинт
+                return await self.app(scope, receive, send)
+        # Проверка версий читает журнал изменений и файлы хранилища, поэтому выполняется в пуле потоков
+        version = await run_blocking(versions.current, *keys)
+        streaming = _STREAMING.match(scope["path"]) is not None
+        representation = "ndjson" if streaming and wants_ndjson(headers.get("accept")) else ""
+        raw = (
+            f"{scope['path']}?{scope.get('query_string', b'').decode('latin-1')}|{username}|{version}"
+            f"|{representation}"
+        )
+        etag = '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20] + '"'
+        cache_headers = {"ETag": etag}
+        vary = [] if public else ["Authorization"]
+        if streaming:
+            vary.append("Accept")
+        if public:
+            cache_headers["Cache-Control"] = f"public, max-age={PUBLIC_CACHE_MAX_AGE}"
+        else:
+            cache_headers["Cache-Control"] = "private, no-cache"
+        if vary:
+            cache_headers["Vary"] = ", ".join(vary)
+
+        if etag_matches(headers.get("if-none-match"), etag):
+            return await Response(status_code=304, headers=cache_headers)(scope, receive, send)
+
+        async def send_with_cache_headers(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                response_headers = MutableHeaders(scope=message)
+                for name, value in cache_headers.items():
+                    response_headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache_headers)
+
+    def _match(self, path: str) -> Optional[Tuple[List[str], bool]]:
+        for pattern, resolve in _RULES:
+            match = pattern.match(path)
+            if match:
+                return resolve(match.groupdict())
+        return None
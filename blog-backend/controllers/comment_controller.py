@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
 from models.post import Comment
 from services.post_service import create_comment, get_comments_for_post
-from controllers.auth_controller import get_current_user
+from controllers.auth_controller import get_current_user, get_current_user_readonly
+from services.executor import run_blocking
+from services.serialization import json_response
 from models.user import UserInDB
 from typing import List
 
@@ -15,7 +17,7 @@ async def create_comment_endpoint(
     current_user: UserInDB = Depends(get_current_user)
 ):
     try:
-        return create_comment(post_id, current_user.username, content)
+        return await run_blocking(create_comment, post_id, current_user.username, content)
     except ValueError as e:
         raise HTTPException(status_code=403, detail=str(e))
 
@@ -23,9 +25,11 @@ async def create_comment_endpoint(
 @router.get("/", response_model=List[Comment])
 async def get_comments_for_post_endpoint(
     post_id: str,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: UserInDB = Depends(get_current_user_readonly)
 ):
     try:
-        return get_comments_for_post(post_id, current_user.username)
+        comments = await run_blocking(get_comments_for_post, post_id, current_user.username)
     except ValueError as e:
-        raise HTTPException(status_code=403, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=403, detail=str(e))
+    # Комментарии уже проверены при чтении: список сериализуется без повторной проверки response_model
+    return json_response(comments)
\ No newline at end of file
@@ -0,0 +1,126 @@
+import logging
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+from dotenv import load_dotenv
+from starlette.routing import Match
+from repositories import instrumentation
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Запросы дольше порога (секунды) пишутся в журнал с разбивкой по вызовам репозиториев
+SLOW_REQUEST_THRESHOLD = float(os.getenv("SLOW_REQUEST_THRESHOLD", "1.0"))
+
+# Границы корзин гистограммы времени обработки запросов, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger(__name__)
+
+class _Histogram:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self):
+        # Число наблюдений в каждой корзине (не накопительно) и сверх последней границы
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.buckets[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+# Гистограммы по (метод, шаблон пути, статус). Обновляются только в потоке цикла событий
+_latency: Dict[Tuple[str, str, str], _Histogram] = {}
+
+def route_template(scope) -> str:
+    """
+    Шаблон пути эндпоинта ("/posts/{post_id}"), чтобы число рядов метрик не зависело от ID в путях.
+    """
+    partial = None
+    for route in scope["app"].routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    # PARTIAL - путь найден, но метод не поддерживается (405)
+    return partial or "unmatched"
+
+class RequestMetricsMiddleware:
+    """
+    Время обработки HTTP-запросов по эндпоинтам и журнал медленных запросов.
+
+    Добавляется последним (внешним) middleware, поэтому учитывает и ответы 304
+    от ConditionalRequestMiddleware. Для запросов дольше SLOW_REQUEST_THRESHOLD
+    в журнал пишется разбивка по вызовам репозиториев (repositories.instrumentation).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        with instrumentation.track_request() as calls:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                elapsed = time.perf_counter() - started
+                route = route_template(scope)
+                key = (scope["method"], route, str(status))
+                histogram = _latency.get(key)
+                if histogram is None:
+                    histogram = _latency[key] = _Histogram()
+                histogram.observe(elapsed)
+                if elapsed >= SLOW_REQUEST_THRESHOLD:
+                    logger.warning(
+                        "Медленный запрос %s %s (%s) -> %s: %.1f мс%s",
+                        scope["method"], scope["path"], route, status, elapsed * 1000,
+                        "".join(f"\n  {line}" for line in instrumentation.breakdown(calls)),
+                    )
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def render_metrics() -> str:
+    """
+    Метрики процесса в текстовом формате Prometheus. Каждый воркер uvicorn считает свои метрики.
+    """
+    lines: List[str] = [
+        "# HELP http_request_duration_seconds Время обработки HTTP-запросов",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route, status), histogram in sorted(_latency.items()):
+        labels = f'method="{method}",route="{_label(route)}",status="{status}"'
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, histogram.buckets):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"http_request_duration_seconds_sum{{{labels}}} {histogram.sum}")
+        lines.append(f"http_request_duration_seconds_count{{{labels}}} {histogram.count}")
+
+    totals = sorted(instrumentation.totals().items())
+    for name, help_text, value in [
+        ("repository_calls_total", "Число вызовов функций репозиториев", lambda stats: stats.calls),
+        ("repository_call_seconds_total", "Суммарное время вызовов (включая вложенные)", lambda stats: stats.seconds),
+        ("repository_rows_scanned_total", "Прочитанные строки файлов и результатов SQL", lambda stats: stats.rows),
+        ("repository_bytes_read_total", "Прочитанные байты файлов", lambda stats: stats.bytes),
+    ]:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for function, stats in totals:
+            lines.append(f'{name}{{function="{_label(function)}"}} {value(stats)}')
+    return "\n".join(lines) + "\n"
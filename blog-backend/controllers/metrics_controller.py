@@ -0,0 +1,32 @@
+import os
+from dotenv import load_dotenv
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from controllers.metrics import render_metrics
+from controllers.network import PRIVATE_NETWORKS, address_in, parse_networks
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Сети, из которых метрики собираются напрямую с бэкенда (сборщик метрик в сети docker-compose)
+METRICS_ALLOWED_NETWORKS = parse_networks(os.getenv("METRICS_ALLOWED_NETWORKS", PRIVATE_NETWORKS))
+
+router = APIRouter(tags=["metrics"])
+
+def metrics_allowed(request: Request) -> bool:
+    """
+    Метрики отдаются только при прямом подключении из разрешенных сетей. Запросы,
+    пришедшие через nginx (с заголовками адреса клиента), отклоняются: адрес nginx
+    тоже внутренний, и без этой проверки метрики были бы доступны снаружи.
+    """
+    if "X-Real-IP" in request.headers or "X-Forwarded-For" in request.headers:
+        return False
+    peer = request.client.host if request.client else None
+    return address_in(peer, METRICS_ALLOWED_NETWORKS)
+
+# Метрики в текстовом формате Prometheus (снаружи закрыты в nginx и проверкой адреса в приложении)
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics_endpoint(request: Request):
+    if not metrics_allowed(request):
+        raise HTTPException(status_code=403, detail="Metrics are not available")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
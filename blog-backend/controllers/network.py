@@ -0,0 +1,25 @@
+import ipaddress
+from typing import List, Optional, Union
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+# Loopback и частные сети: адреса контейнеров docker-compose (nginx, сборщик метрик)
+PRIVATE_NETWORKS = "127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16,fc00::/7"
+
+def parse_networks(value: str) -> List[Network]:
+    """
+    Разбирает список сетей и адресов через запятую ("10.0.0.0/8,192.168.1.5").
+    """
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in value.split(",") if item.strip()]
+
+def address_in(host: Optional[str], networks: List[Network]) -> bool:
+    """
+    Входит ли адрес host в одну из сетей. Не-IP адреса (например, имя клиента тестов) не входят.
+    """
+    if not host:
+        return False
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException
-from models.post import PostWithDetails, PostCreate, Post, PostAccessRequest, PostAccess, Comment
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from models.post import PostWithDetails, PostCreate, Post, PostAccessRequest, PostAccess, Comment, TagCount
 from services.post_service import (
     create_comment,
     get_comments_for_post,
@@ -16,11 +17,18 @@ from services.post_service import (
     delete_user_post,
     get_post,
     get_user_feed,
-    get_all_posts_for_public_feed
+    iter_user_posts,
+    iter_public_posts
 )
-from controllers.auth_controller import get_current_user
+from controllers.auth_controller import get_current_user, get_current_user_readonly
+from services.executor import run_blocking
+from services.public_feed import public_feed_snapshot
+from services.serialization import NDJSON_MEDIA_TYPE, json_response, ndjson_lines, wants_ndjson
+from services.search import search_posts
+from services.tags import get_public_posts_by_tag, get_top_tags
 from models.user import UserInDB
-from typing import List
+from repositories.pagination import MAX_PAGE_LIMIT
+from typing import Iterator, List, Optional
 
 # Основной роутер для постов
 router = APIRouter(tags=["post"])
@@ -33,27 +41,141 @@ async def create_new_post(
     post: PostCreate,
     current_user: UserInDB = Depends(get_current_user)
 ):
-    return create_post(post, current_user.username)
+    return await run_blocking(create_post, post, current_user.username)
+
+def _page_response(load_page) -> Response:
+    try:
+        posts, next_cursor = load_page()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return json_response(posts, headers=headers)
+
+async def paginate(load_page, group: str = "posts"):
+    """
+    Возвращает страницу постов, а курсор следующей страницы передает в заголовке X-Next-Cursor.
+    Тело ответа остается списком постов, поэтому клиенты без пагинации работают как раньше.
+    Чтение данных и сериализация ответа выполняются в пуле потоков (в группе эндпоинта).
+    """
+    return await run_blocking(_page_response, load_page, group=group)
+
+async def _next_chunks(chunks: Iterator[bytes]):
+    # Каждая порция читается и сериализуется отдельной задачей пула: между порциями
+    # место в группе "stream" освобождается, и медленный клиент не держит его до конца выдачи
+    while True:
+        chunk = await run_blocking(next, chunks, None, group="stream")
+        if chunk is None:
+            return
+        yield chunk
+
+def stream(open_chunks) -> StreamingResponse:
+    """
+    Потоковый ответ NDJSON (Accept: application/x-ndjson): по одному JSON-объекту в строке.
+    open_chunks() возвращает итератор порций байтов и проверяет курсор до начала ответа.
+    Выдача не делится на страницы: отдаются все посты после курсора (не больше limit),
+    поэтому заголовка X-Next-Cursor нет.
+    """
+    try:
+        chunks = open_chunks()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # X-Accel-Buffering: nginx передает строки клиенту сразу, не накапливая весь ответ
+    return StreamingResponse(
+        _next_chunks(chunks), media_type=NDJSON_MEDIA_TYPE, headers={"X-Accel-Buffering": "no"}
+    )
+
+def stream_posts(open_posts) -> StreamingResponse:
+    """
+    Потоковый ответ из порций постов: open_posts() возвращает итератор списков постов.
+    """
+    return stream(lambda: (ndjson_lines(posts) for posts in open_posts()))
 
 @router.get("/posts/me", response_model=list[Post])
-async def read_my_posts(current_user: UserInDB = Depends(get_current_user)):
-    return get_user_posts(current_user.username)
+async def read_my_posts(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    accept: Optional[str] = Header(None),
+    current_user: UserInDB = Depends(get_current_user_readonly)
+):
+    if wants_ndjson(accept):
+        return stream_posts(lambda: iter_user_posts(current_user.username, cursor, limit))
+    return await paginate(lambda: get_user_posts(current_user.username, cursor, limit))
 
 @router.get("/posts/feed", response_model=List[PostWithDetails])
-async def read_user_feed_endpoint(current_user: UserInDB = Depends(get_current_user)):
-    return get_user_feed(current_user.username)
+async def read_user_feed_endpoint(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    current_user: UserInDB = Depends(get_current_user_readonly)
+):
+    return await paginate(lambda: get_user_feed(current_user.username, cursor, limit), group="feed")
 
 @router.get("/posts/public/feed", response_model=List[PostWithDetails])
-async def read_public_feed():
+async def read_public_feed(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    accept: Optional[str] = Header(None)
+):
     """
     Получить ленту постов для неавторизованных пользователей.
     Возвращает все посты, но для приватных постов скрывает содержимое.
+    Ответ собирается из готового снимка ленты (services.public_feed),
+    ETag и ответ 304 формирует ConditionalRequestMiddleware.
     """
-    return get_all_posts_for_public_feed()
+    # Проверка актуальности читает журнал изменений, а построение снимка - все посты,
+    # поэтому обе выполняются в пуле потоков
+    if not await run_blocking(public_feed_snapshot.is_fresh):
+        await run_blocking(public_feed_snapshot.ensure_fresh, group="public_feed")
+    if wants_ndjson(accept):
+        return stream(lambda: public_feed_snapshot.iter_ndjson(cursor, limit))
+    try:
+        body, next_cursor = public_feed_snapshot.render(cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return json_response(body, headers=headers)
 
 @router.get("/posts/public", response_model=list[Post])
-async def read_public_posts():
-    return get_all_public_posts()
+async def read_public_posts(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    accept: Optional[str] = Header(None)
+):
+    if wants_ndjson(accept):
+        return stream_posts(lambda: iter_public_posts(cursor, limit))
+    return await paginate(lambda: get_all_public_posts(cursor, limit))
+
+@router.get("/posts/public/tags", response_model=List[TagCount])
+async def read_top_tags(limit: int = Query(20, ge=1, le=MAX_PAGE_LIMIT)):
+    """
+    Самые популярные теги: limit тегов с наибольшим числом публичных постов.
+    """
+    return await run_blocking(get_top_tags, limit, group="tags")
+
+@router.get("/posts/public/tags/{tag}", response_model=List[Post])
+async def read_public_posts_by_tag(
+    tag: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT)
+):
+    """
+    Публичные посты с тегом в том же порядке и с той же пагинацией, что и /posts/public.
+    """
+    return await paginate(lambda: get_public_posts_by_tag(tag, cursor, limit))
+
+@router.get("/posts/search", response_model=List[Post])
+async def search_posts_endpoint(
+    q: str = "",
+    tags: List[str] = Query([]),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    current_user: UserInDB = Depends(get_current_user_readonly)
+):
+    """
+    Поиск постов по словам заголовка, текста и тегов (q) с фильтром по тегам (tags, все сразу).
+    Результаты упорядочены по релевантности, а без слов поиска - от новых постов к старым.
+    Возвращаются только посты, которые пользователь может открыть.
+    """
+    return await paginate(lambda: search_posts(q, tags, current_user.username, cursor, limit), group="search")
 
 @router.put("/posts/{post_id}", response_model=Post)
 async def update_post(
@@ -62,7 +184,7 @@ async def update_post(
     current_user: UserInDB = Depends(get_current_user)
 ):
     # Получаем пост по ID
-    post = get_post(post_id, current_user.username)
+    post = await run_blocking(get_post, post_id, current_user.username)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
@@ -80,7 +202,7 @@ async def update_post(
         author=current_user.username,
         created_at=post.created_at
     )
-    update_user_post(post_id, updated_post_data, current_user.username)
+    await run_blocking(update_user_post, post_id, updated_post_data, current_user.username)
     return updated_post_data
 
 @router.delete("/posts/{post_id}")
@@ -89,7 +211,7 @@ async def delete_existing_post(
     current_user: UserInDB = Depends(get_current_user)
 ):
     try:
-        delete_user_post(post_id, current_user.username)
+        await run_blocking(delete_user_post, post_id, current_user.username)
         return {"message": "Post deleted successfully"}
     except ValueError as e:
         raise HTTPException(status_code=403, detail=str(e))
@@ -98,10 +220,10 @@ async def delete_existing_post(
 @router.get("/posts/{post_id}", response_model=Post)
 async def read_post(
     post_id: str,
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: UserInDB = Depends(get_current_user_readonly)
 ):
     try:
-        post = get_post(post_id, current_user.username)
+        post = await run_blocking(get_post, post_id, current_user.username)
         if not post:
             raise HTTPException(status_code=404, detail="Post not found")
         return post
@@ -114,33 +236,33 @@ async def request_access_to_post(
     post_id: str,
     current_user: UserInDB = Depends(get_current_user)
 ):
-    return request_post_access(post_id, current_user.username)
+    return await run_blocking(request_post_access, post_id, current_user.username)
 
 @access_router.get("/my_requests", response_model=List[PostAccessRequest])
 async def get_my_access_requests(
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: UserInDB = Depends(get_current_user_readonly)
 ):
-    return get_my_post_access_requests_service(current_user.username)
+    return await run_blocking(get_my_post_access_requests_service, current_user.username)
 
 @access_router.get("/my_posts_requests", response_model=List[PostAccessRequest])
 async def get_access_requests_for_my_posts(
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: UserInDB = Depends(get_current_user_readonly)
 ):
-    return get_access_requests_for_my_posts_service(current_user.username)
+    return await run_blocking(get_access_requests_for_my_posts_service, current_user.username)
 
 @access_router.post("/grant/{request_id}", response_model=PostAccess)
 async def grant_access_to_post(
     request_id: str,
     current_user: UserInDB = Depends(get_current_user)
 ):
-    return grant_post_access(request_id, current_user.username)
+    return await run_blocking(grant_post_access, request_id, current_user.username)
 
 @access_router.delete("/revoke/{access_id}")
 async def revoke_access_to_post(
     access_id: str,
     current_user: UserInDB = Depends(get_current_user)
 ):
-    revoke_post_access(access_id)
+    await run_blocking(revoke_post_access, access_id)
     return {"message": "Доступ отозван"}
 
 @access_router.post("/reject/{request_id}")
@@ -148,7 +270,7 @@ async def reject_access_to_post(
     request_id: str,
     current_user: UserInDB = Depends(get_current_user)
 ):
-    reject_post_access(request_id)
+    await run_blocking(reject_post_access, request_id)
     return {"message": "Запрос отклонен"}
 
 # Подключаем роутер для запросов на доступ
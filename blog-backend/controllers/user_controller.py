@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from models.user import Subscription
 from services.user_service import follow_user, get_followed_users_posts
-from controllers.auth_controller import get_current_user
+from controllers.auth_controller import get_current_user, get_current_user_readonly
+from controllers.post_controller import paginate
+from services.executor import run_blocking
+from repositories.pagination import MAX_PAGE_LIMIT
 from models.user import UserInDB
-from typing import List
+from typing import List, Optional
 from models.post import Post
 
 router = APIRouter(tags=["user"])
@@ -14,11 +17,13 @@ async def follow_user_endpoint(
     following_username: str,
     current_user: UserInDB = Depends(get_current_user)
 ):
-    return follow_user(current_user.username, following_username)
+    return await run_blocking(follow_user, current_user.username, following_username)
 
 # Получить посты пользователей, на которых подписан текущий пользователь
 @router.get("/users/followed/posts", response_model=List[Post])
 async def get_followed_users_posts_endpoint(
-    current_user: UserInDB = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    current_user: UserInDB = Depends(get_current_user_readonly)
 ):
-    return get_followed_users_posts(current_user.username)
\ No newline at end of file
+    return await paginate(lambda: get_followed_users_posts(current_user.username, cursor, limit))
\ No newline at end of file
@@ -4,6 +4,11 @@ from controllers.auth_controller import router as auth_router
 from controllers.post_controller import router as post_router
 from controllers.user_controller import router as user_router
 from controllers.comment_controller import router as comment_router
+from controllers.metrics_controller import router as metrics_router
+from controllers.caching import ConditionalRequestMiddleware
+from controllers.metrics import RequestMetricsMiddleware
+from repositories.storage import get_storage
+from repositories.token_repository import migrate_legacy_refresh_tokens
 from dotenv import load_dotenv
 import os
 
@@ -12,6 +17,10 @@ load_dotenv()
 
 app = FastAPI()
 
+# Условные запросы (ETag/304) и Cache-Control для эндпоинтов чтения.
+# Добавляется до CORS, чтобы заголовки CORS получали и ответы 304
+app.add_middleware(ConditionalRequestMiddleware)
+
 # Настройка CORS
 app.add_middleware(
     CORSMiddleware,
@@ -19,9 +28,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Разрешить все методы (GET, POST, OPTIONS и т.д.)
     allow_headers=["*"],  # Разрешить все заголовки
+    expose_headers=["X-Next-Cursor", "ETag"],  # Курсор следующей страницы и ETag должны быть доступны фронтенду
 )
 
+# Время обработки запросов по эндпоинтам и журнал медленных запросов.
+# Добавляется последним, чтобы учитывать все middleware и ответы 304
+app.add_middleware(RequestMetricsMiddleware)
+
 app.include_router(auth_router)
 app.include_router(post_router)
 app.include_router(user_router)
-app.include_router(comment_router)
\ No newline at end of file
+app.include_router(comment_router)
+app.include_router(metrics_router)
+
+@app.on_event("startup")
+def load_storage():
+    # Подготавливаем хранилище (для текстовых файлов - загружаем посты в память) один раз при старте
+    get_storage().load()
+    # Refresh token из файла пользователей (прежний формат) переносятся в хранилище токенов
+    migrate_legacy_refresh_tokens()
\ No newline at end of file
@@ -17,6 +17,10 @@ class Post(PostBase):
     created_at: datetime
     access_status: Optional[str] = ""
 
+class TagCount(BaseModel):
+    tag: str
+    count: int  # Число публичных постов с тегом
+
 class PostAccessRequest(BaseModel):
     id: str
     post_id: str
@@ -17,4 +17,10 @@ class Subscription(BaseModel):
     id: str
     follower_username: str  # Тот, кто подписывается
     following_username: str  # Тот, на кого подписываются
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+
+class RefreshToken(BaseModel):
+    token_hash: str  # SHA-256 от refresh token, сам токен не хранится
+    username: str
+    expires_at: datetime
+    created_at: datetime
@@ -0,0 +1,157 @@
+"""
+Общий журнал изменений для нескольких процессов (воркеров uvicorn), работающих с одними данными.
+
+Каждая запись в хранилище через repositories.versions дописывает в журнал строку JSON:
+процесс-автор, событие ("post_saved", "comment_saved", ...), его предмет (ID поста,
+имя пользователя), изменившиеся ресурсы (ключи версий) и метку хранилища data_version()
+после записи. Смещение строки в журнале служит общей для всех процессов версией ресурсов,
+а события позволяют другим процессам обновить свои кэши так же, как после собственной записи.
+
+Журнал ведется без fsync: после сбоя перезапускаются все воркеры, и кэши строятся заново.
+Когда журнал вырастает больше CHANGE_JOURNAL_MAX_SIZE, он начинается заново (новое поколение):
+процессы, заметившие смену поколения, сбрасывают кэши целиком.
+"""
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+from repositories import write_coordinator
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: незавершенные записи других процессов не отслеживаются
+    fcntl = None
+
+# Загружаем переменные окружения
+load_dotenv()
+
+CHANGE_JOURNAL_FILE = os.getenv("CHANGE_JOURNAL_FILE", "database/changes.log")
+CHANGE_JOURNAL_MAX_SIZE = int(os.getenv("CHANGE_JOURNAL_MAX_SIZE", str(8 * 1024 * 1024)))
+
+# Событие изменения данных в обход репозиториев (замена файлов, ручная правка)
+EXTERNAL = "external"
+
+class Change(NamedTuple):
+    offset: int
+    instance: str
+    event: str
+    subject: Tuple[str, ...]
+    keys: Tuple[str, ...]
+    # Метка хранилища после записи
+    storage_version: str
+
+class ChangeJournal:
+    """
+    Чтение и запись журнала изменений. Позиция чтения у каждого процесса своя.
+    """
+
+    def __init__(self, path: str = CHANGE_JOURNAL_FILE):
+        self.path = path
+        self.generation: Optional[str] = None
+        self.position = 0
+        self._inode = None
+
+    def _create(self):
+        with write_coordinator.file_lock(self.path):
+            if not os.path.exists(self.path):
+                self._start_generation()
+
+    def _start_generation(self):
+        header = json.dumps({"generation": uuid.uuid4().hex[:12]}) + "\n"
+        write_coordinator.replace_file(self.path, [header.encode("utf-8")])
+
+    def read(self) -> Tuple[bool, List[Change]]:
+        """
+        Читает записи, появившиеся после предыдущего чтения.
+        Возвращает признак того, что журнал читается с начала (первое чтение
+        или новое поколение), и прочитанные записи.
+        """
+        if not os.path.exists(self.path):
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._create()
+        changes = []
+        with open(self.path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            restarted = stat.st_ino != self._inode or stat.st_size < self.position
+            if restarted:
+                self._inode = stat.st_ino
+                self.position = 0
+                self.generation = None
+            file.seek(self.position)
+            for raw_line in file:
+                # Незавершенная строка (ее сейчас дописывают) читается в следующий раз
+                if not raw_line.endswith(b"\n"):
+                    break
+                offset = self.position
+                self.position += len(raw_line)
+                record = json.loads(raw_line)
+                if "generation" in record:
+                    self.generation = record["generation"]
+                    continue
+                changes.append(Change(
+                    offset, record["i"], record["e"], tuple(record["s"]), tuple(record["k"]), record["v"]
+                ))
+        return restarted, changes
+
+    def append(
+        self,
+        instance: str,
+        event: str,
+        subject: Sequence[str],
+        keys: Sequence[str],
+        storage_version: Callable[[], str],
+    ) -> int:
+        """
+        Дописывает запись и возвращает ее смещение. Метка хранилища вычисляется
+        под блокировкой журнала, поэтому последняя запись журнала всегда содержит
+        метку, актуальную на момент ее записи.
+        """
+        if not os.path.exists(self.path):
+            self._create()
+        with write_coordinator.file_lock(self.path):
+            if os.path.getsize(self.path) > CHANGE_JOURNAL_MAX_SIZE:
+                self._start_generation()
+            record = {"i": instance, "e": event, "s": list(subject), "k": list(keys), "v": storage_version()}
+            with open(self.path, "ab") as file:
+                offset = os.fstat(file.fileno()).st_size
+                file.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        return offset
+
+    @contextmanager
+    def writing(self):
+        """
+        Отмечает запись, которая идет в хранилище и еще не попала в журнал
+        (разделяемая блокировка: писатели друг другу не мешают).
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.writers", "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def quiescent(self):
+        """
+        Пытается без ожидания получить монопольную блокировку писателей.
+        Возвращает True, если ни одна запись (ни в одном процессе) сейчас не идет.
+        """
+        if fcntl is None:
+            yield True
+            return
+        with open(f"{self.path}.writers", "a") as lock_file:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,187 @@
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from models.post import Comment
+from repositories import instrumentation, write_coordinator
+
+def parse_comment_fields(parts: List[str]) -> Comment:
+    return Comment(
+        id=parts[0],
+        post_id=parts[1],
+        author_username=parts[2],
+        content=parts[3],
+        created_at=parts[4]
+    )
+
+class CommentIndex:
+    """
+    Индекс комментариев по post_id, хранящийся рядом с comments.txt.
+
+    Для каждого поста в памяти хранятся смещения и длины его строк в comments.txt
+    и указатель на последний комментарий, поэтому чтение комментариев поста
+    сводится к seek по нужным строкам, а последний комментарий берется без сортировки.
+    Индекс сохраняется в отдельный файл строками "<comment_id>|<post_id>|<offset>|<length>|<created_at>"
+    и после перезапуска загружается из него; строки comments.txt, которых нет в индексе
+    (например, дописанные другим процессом), доиндексируются при следующем обращении.
+    """
+
+    def __init__(self, comments_path: str, index_path: str):
+        self.comments_path = comments_path
+        self.index_path = index_path
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        self._offsets: Dict[str, List[Tuple[int, int]]] = {}
+        self._latest: Dict[str, Tuple[datetime, int, int]] = {}
+        self._last_entry: Optional[Tuple[str, int]] = None
+        self._indexed_size = 0
+        self._stamp = None
+
+    def _comments_stamp(self) -> Tuple[int, int]:
+        try:
+            stat = os.stat(self.comments_path)
+        except FileNotFoundError:
+            return (0, 0)
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def _add(self, comment_id: str, post_id: str, offset: int, length: int, created_at: datetime):
+        self._offsets.setdefault(post_id, []).append((offset, length))
+        latest = self._latest.get(post_id)
+        # При равном времени остается комментарий, записанный раньше
+        if latest is None or created_at > latest[0]:
+            self._latest[post_id] = (created_at, offset, length)
+        self._last_entry = (comment_id, offset)
+        self._indexed_size = offset + length
+
+    def _load(self):
+        """
+        Загружает индекс из файла. Записи сортируются по смещению, дубликаты
+        (от нескольких процессов) пропускаются, индекс обрывается на первом пропуске.
+        """
+        self._reset()
+        entries = []
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                for line in file:
+                    parts = line.strip().split("|")
+                    if len(parts) == 5:
+                        entries.append((int(parts[2]), int(parts[3]), parts[0], parts[1], parts[4]))
+        except FileNotFoundError:
+            pass
+        entries.sort()
+        consistent = True
+        for offset, length, comment_id, post_id, created_at in entries:
+            if offset < self._indexed_size:
+                consistent = False
+                continue
+            if offset > self._indexed_size:
+                consistent = False
+                break
+            self._add(comment_id, post_id, offset, length, datetime.fromisoformat(created_at))
+        if not self._last_entry_matches():
+            # comments.txt был заменен: индекс строится заново
+            self._reset()
+            consistent = False
+        if not consistent:
+            self._write_index_file()
+        self._loaded = True
+
+    def _last_entry_matches(self) -> bool:
+        if self._last_entry is None:
+            return True
+        comment_id, offset = self._last_entry
+        if self._comments_stamp()[0] < self._indexed_size:
+            return False
+        with open(self.comments_path, "rb") as file:
+            file.seek(offset)
+            return file.read(len(comment_id) + 1) == f"{comment_id}|".encode("utf-8")
+
+    def _write_index_file(self):
+        entries = sorted(
+            (offset, length, post_id)
+            for post_id, post_offsets in self._offsets.items()
+            for offset, length in post_offsets
+        )
+        write_coordinator.replace_file(self.index_path, (
+            f"{parts[0]}|{post_id}|{offset}|{length}|{parts[4]}\n".encode("utf-8")
+            for offset, length, post_id in entries
+            for parts in [self._read_parts(offset, length)]
+        ))
+
+    def _ensure_current(self):
+        if not self._loaded:
+            self._load()
+        stamp = self._comments_stamp()
+        if stamp == self._stamp:
+            return
+        if stamp[0] < self._indexed_size or not self._last_entry_matches():
+            # Файл комментариев усечен или перезаписан
+            self._reset()
+            self._write_index_file()
+        if stamp[0] > self._indexed_size:
+            self._index_tail()
+        # Метка берется до индексации: строки, дописанные во время нее, проверятся при следующем обращении
+        self._stamp = stamp
+
+    def _index_tail(self):
+        """
+        Индексирует строки comments.txt после последней проиндексированной.
+        Незавершенная последняя строка (запись еще идет) пропускается.
+        """
+        with open(self.comments_path, "rb") as file, open(self.index_path, "a", encoding="utf-8") as index_file:
+            file.seek(self._indexed_size)
+            offset = self._indexed_size
+            for raw_line in file:
+                if not raw_line.endswith(b"\n"):
+                    break
+                self._index_line(index_file, raw_line, offset)
+                offset += len(raw_line)
+            self._indexed_size = offset
+
+    def _index_line(self, index_file, raw_line: bytes, offset: int):
+        parts = raw_line.decode("utf-8").strip().split("|")
+        if len(parts) == 5:
+            self._add(parts[0], parts[1], offset, len(raw_line), datetime.fromisoformat(parts[4]))
+            index_file.write(f"{parts[0]}|{parts[1]}|{offset}|{len(raw_line)}|{parts[4]}\n")
+
+    def _read_parts(self, offset: int, length: int, file=None) -> List[str]:
+        if file is None:
+            with open(self.comments_path, "rb") as file:
+                return self._read_parts(offset, length, file)
+        file.seek(offset)
+        return file.read(length).decode("utf-8").strip().split("|")
+
+    def append(self, line: str):
+        """
+        Дописывает строку комментария в comments.txt и сразу добавляет ее в индекс.
+        """
+        write_coordinator.append(self.comments_path, line.encode("utf-8"))
+        with self._lock:
+            # Индексируем новую строку (и строки, дописанные другими потоками и процессами перед ней)
+            self._ensure_current()
+
+    def get_comments(self, post_id: str) -> List[Comment]:
+        with self._lock:
+            self._ensure_current()
+            offsets = list(self._offsets.get(post_id, ()))
+        if not offsets:
+            return []
+        instrumentation.record_io(len(offsets), sum(length for _, length in offsets))
+        with open(self.comments_path, "rb") as file:
+            return [parse_comment_fields(self._read_parts(offset, length, file)) for offset, length in offsets]
+
+    def get_latest(self, post_ids: Iterable[str]) -> Dict[str, Comment]:
+        with self._lock:
+            self._ensure_current()
+            pointers = [(post_id, self._latest[post_id]) for post_id in set(post_ids) if post_id in self._latest]
+        if not pointers:
+            return {}
+        instrumentation.record_io(len(pointers), sum(length for _, (_, _, length) in pointers))
+        with open(self.comments_path, "rb") as file:
+            return {
+                post_id: parse_comment_fields(self._read_parts(offset, length, file))
+                for post_id, (_, offset, length) in pointers
+            }
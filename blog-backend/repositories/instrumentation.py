@@ -0,0 +1,117 @@
+"""
+Учет вызовов функций репозиториев: число вызовов, время, прочитанные строки и байты.
+
+Функции доступа к данным в модулях репозиториев оборачиваются instrument_module()
+при импорте. Хранилища сообщают о чтении файлов и запросах через record_io(): строки
+и байты относятся к самому внутреннему выполняемому вызову репозитория. Итоги
+по функциям копятся в счетчиках процесса (totals(), эндпоинт /metrics), а внутри track_request() - еще
+и в разбивке обрабатываемого запроса (журнал медленных запросов).
+Время вызова включает вложенные вызовы других функций репозиториев.
+"""
+import functools
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Iterator, List, Optional
+
+class CallStats:
+    __slots__ = ("calls", "seconds", "rows", "bytes")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+
+    def add(self, other: "CallStats"):
+        self.calls += other.calls
+        self.seconds += other.seconds
+        self.rows += other.rows
+        self.bytes += other.bytes
+
+_lock = threading.Lock()
+# Итоги процесса по функциям: "post_repository.get_post_by_id" -> CallStats
+_totals: Dict[str, CallStats] = {}
+# Разбивка текущего запроса по функциям (None вне запроса)
+_request: ContextVar[Optional[Dict[str, CallStats]]] = ContextVar("repository_calls", default=None)
+# Выполняемый вызов репозитория, которому засчитываются строки и байты
+_current: ContextVar[Optional[CallStats]] = ContextVar("repository_call", default=None)
+
+def record_io(rows: int = 0, size: int = 0):
+    """
+    Засчитывает прочитанные строки (записи файла, строки SQL) и байты текущему вызову репозитория.
+    """
+    stats = _current.get()
+    if stats is not None:
+        stats.rows += rows
+        stats.bytes += size
+
+def _finish(name: str, stats: CallStats):
+    with _lock:
+        _totals.setdefault(name, CallStats()).add(stats)
+    request = _request.get()
+    if request is not None:
+        # Словарь запроса общий для потоков пула, в которых выполняется обработчик
+        with _lock:
+            request.setdefault(name, CallStats()).add(stats)
+
+def instrumented(name: str, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = CallStats()
+        stats.calls = 1
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats.seconds = time.perf_counter() - started
+            _current.reset(token)
+            _finish(name, stats)
+    return wrapper
+
+def instrument_module(module_name: str, functions: Iterable[str]):
+    """
+    Оборачивает перечисленные функции доступа к данным модуля. Вызывается в конце модуля,
+    поэтому и вызовы внутри модуля, и импортирующие его модули получают обертки.
+    Вспомогательные функции (подписка на события, работа с кэшем) не перечисляются:
+    они не обращаются к хранилищу, и обертка только добавила бы им накладных расходов.
+    """
+    module = sys.modules[module_name]
+    prefix = module_name.rsplit(".", 1)[-1]
+    for attribute in functions:
+        setattr(module, attribute, instrumented(f"{prefix}.{attribute}", getattr(module, attribute)))
+
+@contextmanager
+def track_request() -> Iterator[Dict[str, CallStats]]:
+    """
+    Собирает разбивку вызовов репозиториев внутри блока (обработки запроса) в словарь по функциям.
+    """
+    calls: Dict[str, CallStats] = {}
+    token = _request.set(calls)
+    try:
+        yield calls
+    finally:
+        _request.reset(token)
+
+def totals() -> Dict[str, CallStats]:
+    with _lock:
+        result = {}
+        for name, stats in _totals.items():
+            result[name] = CallStats()
+            result[name].add(stats)
+        return result
+
+def breakdown(calls: Dict[str, CallStats]) -> List[str]:
+    """
+    Строки разбивки запроса по функциям, самые долгие первыми.
+    """
+    with _lock:
+        items = sorted(calls.items(), key=lambda item: item[1].seconds, reverse=True)
+        return [
+            f"{name}: вызовов {stats.calls}, {stats.seconds * 1000:.1f} мс, "
+            f"строк {stats.rows}, байт {stats.bytes}"
+            for name, stats in items
+        ]
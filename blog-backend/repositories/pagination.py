@@ -0,0 +1,79 @@
+import base64
+import binascii
+from typing import Callable, Iterator, List, Optional, Tuple
+from models.post import Post
+
+# Ключ сортировки постов при постраничной выдаче: (created_at, id).
+# Дата хранится строкой "YYYY-MM-DD HH:MM:SS[.ffffff]", поэтому ключи сравниваются лексикографически
+PostKey = Tuple[str, str]
+
+# Размер страницы, если передан только курсор
+DEFAULT_PAGE_LIMIT = 20
+# Максимальный размер страницы
+MAX_PAGE_LIMIT = 100
+# Размер порции постов, которыми читается потоковая выдача (NDJSON)
+STREAM_CHUNK_SIZE = 100
+
+def post_key(post: Post) -> PostKey:
+    return (str(post.created_at), post.id)
+
+def encode_cursor(key: PostKey) -> str:
+    """
+    Кодирует ключ последнего поста страницы в непрозрачную для клиента строку.
+    """
+    return base64.urlsafe_b64encode(f"{key[0]}|{key[1]}".encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> PostKey:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Некорректный курсор")
+    created_at, separator, post_id = raw.partition("|")
+    if not separator or not created_at or not post_id:
+        raise ValueError("Некорректный курсор")
+    return created_at, post_id
+
+def resolve_page(cursor: Optional[str], limit: Optional[int]) -> Tuple[Optional[PostKey], Optional[int]]:
+    """
+    Возвращает ключ, после которого начинается страница, и размер страницы.
+    Без курсора и лимита выдача не ограничивается.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    if limit is None and after is not None:
+        limit = DEFAULT_PAGE_LIMIT
+    return after, limit
+
+def fetch_limit(limit: Optional[int]) -> Optional[int]:
+    # Запрашиваем на один пост больше, чтобы узнать, есть ли следующая страница
+    return limit + 1 if limit is not None else None
+
+def split_page(posts: List, limit: Optional[int]) -> Tuple[List, Optional[str]]:
+    """
+    Отрезает лишний пост, запрошенный через fetch_limit, и возвращает страницу
+    вместе с курсором следующей страницы (None, если страница последняя).
+    """
+    if limit is None or len(posts) <= limit:
+        return posts, None
+    page = posts[:limit]
+    return page, encode_cursor(post_key(page[-1]))
+
+def iter_chunks(
+    fetch_page: Callable[[Optional[PostKey], int], List], after: Optional[PostKey], limit: Optional[int]
+) -> Iterator[List]:
+    """
+    Читает выдачу порциями fetch_page(after, size) по STREAM_CHUNK_SIZE постов, начиная
+    после ключа after, до конца выдачи или до limit постов. Каждая порция продолжает
+    предыдущую по ключу ее последнего поста, как страницы с курсором, поэтому
+    в памяти одновременно находится только одна порция.
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = STREAM_CHUNK_SIZE if remaining is None else min(STREAM_CHUNK_SIZE, remaining)
+        chunk = fetch_page(after, size)
+        if chunk:
+            yield chunk
+        if len(chunk) < size:
+            return
+        after = post_key(chunk[-1])
+        if remaining is not None:
+            remaining -= len(chunk)
@@ -0,0 +1,127 @@
+from itertools import chain
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+from repositories import instrumentation, record_log, write_coordinator
+from repositories.post_meta import PostMeta, tag_ids
+
+# Сохраненный индекс posts.txt (по умолчанию posts.txt.idx): метаданные постов без заголовка
+# и текста со смещением и длиной строки поста. По нему хранилище постов загружается после
+# перезапуска, не читая posts.txt целиком.
+#
+# Первая строка - заголовок "#<inode>|<end>|<records>|<marker>": индекс описывает posts.txt
+# с этим inode до смещения end (records строк, marker - последние байты перед end в hex,
+# см. record_log.read_tail). Дальше идут метаданные живых постов в порядке их первого появления:
+# "<id>|<offset>|<length>|<author>|<is_public>|<tags>|<created_at>".
+# Каждый процесс дописывает в конец индекса строки своих записей в posts.txt (с offset >= end),
+# удаление - строкой "<id>|<offset>|<length>|__deleted__". Строки, которые не удалось дописать
+# (процесс завершился, индекс заменен другим процессом), не страшны: после пропуска
+# posts.txt дочитывается с места, до которого индекс непрерывен.
+
+# Элемент индекса: ID поста, смещение и длина строки, метаданные (None для удаления)
+Entry = Tuple[str, int, int, Optional[PostMeta]]
+
+class IndexSnapshot(NamedTuple):
+    entries: List[Entry]
+    # Смещение в posts.txt, до которого индекс непрерывен, и число строк до него
+    end: int
+    records: int
+    # Индекс стоит переписать: в нем есть дописанные или пропущенные строки
+    stale: bool
+
+def format_entry(meta: PostMeta) -> str:
+    return (
+        f"{meta.id}|{meta.offset}|{meta.length}|{meta.author}|{meta.is_public}|"
+        f"{','.join(meta.tags)}|{meta.created_at}\n"
+    )
+
+def format_removal(post_id: str, offset: int, length: int) -> str:
+    return f"{post_id}|{offset}|{length}|{record_log.TOMBSTONE}\n"
+
+def _parse_entry(parts: List[str]) -> Optional[Entry]:
+    try:
+        if len(parts) == 7:
+            meta = PostMeta(
+                parts[0], parts[3], parts[4] == "True", tag_ids(parts[5].split(",") if parts[5] else []),
+                parts[6], int(parts[1]), int(parts[2]),
+            )
+            return (meta.id, meta.offset, meta.length, meta)
+        if len(parts) == 4 and parts[3] == record_log.TOMBSTONE:
+            return (parts[0], int(parts[1]), int(parts[2]), None)
+    except ValueError:
+        pass
+    return None
+
+def read_index(index_path: str, posts_path: str, stamp) -> Optional[IndexSnapshot]:
+    """
+    Читает индекс, если он описывает текущий posts.txt (stamp - его inode, размер и mtime),
+    иначе возвращает None. Дописанные строки проверяются по posts.txt и принимаются
+    по порядку смещений, пока не встретится пропуск.
+    """
+    try:
+        with open(index_path, "r", encoding="utf-8") as file:
+            header = file.readline()
+            lines = file.read().splitlines()
+    except FileNotFoundError:
+        return None
+    instrumentation.record_io(len(lines) + 1, len(header) + sum(len(line) + 1 for line in lines))
+    if not header.startswith("#"):
+        return None
+    try:
+        inode, end, records, marker = header[1:].strip().split("|")
+        inode, end, records, marker = int(inode), int(end), int(records), bytes.fromhex(marker)
+    except ValueError:
+        return None
+    if inode != stamp[0] or end > stamp[1] or record_log.read_marker(posts_path, end) != marker:
+        # posts.txt заменен или переписан на месте
+        return None
+
+    entries, appended = [], []
+    stale = False
+    for line in lines:
+        entry = _parse_entry(line.split("|"))
+        if entry is None:
+            # Недописанная строка
+            stale = True
+        elif entry[1] < end:
+            entries.append(entry)
+        else:
+            appended.append(entry)
+
+    accepted = 0
+    with open(posts_path, "rb") as file:
+        for entry in sorted(appended, key=lambda entry: entry[1]):
+            post_id, offset, length, _ = entry
+            if offset != end:
+                # Повтор строки или пропуск: после пропуска posts.txt дочитывается сам
+                stale = True
+                if offset < end:
+                    continue
+                break
+            file.seek(offset)
+            line = file.read(length)
+            if len(line) != length or not line.endswith(b"\n") or not line.startswith(f"{post_id}|".encode("utf-8")):
+                stale = True
+                break
+            entries.append(entry)
+            end += length
+            accepted += 1
+    return IndexSnapshot(entries, end, records + accepted, stale or accepted > 0)
+
+def write_index(index_path: str, inode: int, end: int, records: int, marker: bytes, metas: Iterable[PostMeta]):
+    """
+    Заменяет индекс снимком метаданных постов для posts.txt (inode) до смещения end.
+    """
+    header = f"#{inode}|{end}|{records}|{marker.hex()}\n"
+    write_coordinator.replace_file(index_path, (
+        line.encode("utf-8") for line in chain([header], (format_entry(meta) for meta in metas))
+    ))
+
+def append_entry(index_path: str, line: str):
+    """
+    Дописывает строку в индекс. Индекс не сбрасывается на диск (fsync): потерянные
+    строки восстанавливаются чтением posts.txt.
+    """
+    try:
+        with open(index_path, "a", encoding="utf-8") as file:
+            file.write(line)
+    except FileNotFoundError:
+        pass
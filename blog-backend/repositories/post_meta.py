@@ -0,0 +1,78 @@
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from models.post import Post
+from repositories.pagination import PostKey
+
+# Таблица тегов процесса: в метаданных постов теги хранятся номерами
+_tag_ids: Dict[str, int] = {}
+_tag_names: List[str] = []
+_tags_lock = threading.Lock()
+
+def tag_ids(tags: Iterable[str]) -> Tuple[int, ...]:
+    ids = []
+    for tag in tags:
+        tag_id = _tag_ids.get(tag)
+        if tag_id is None:
+            with _tags_lock:
+                tag_id = _tag_ids.get(tag)
+                if tag_id is None:
+                    tag_id = _tag_ids[tag] = len(_tag_names)
+                    _tag_names.append(tag)
+        ids.append(tag_id)
+    return tuple(ids)
+
+def tag_names(ids: Iterable[int]) -> List[str]:
+    return [_tag_names[tag_id] for tag_id in ids]
+
+def canonical_created_at(value: str) -> str:
+    """
+    Дата создания в виде str(datetime), как ее возвращает Post.created_at:
+    в этом виде она входит в ключ сортировки (created_at, id).
+    """
+    return str(datetime.fromisoformat(value))
+
+class PostMeta:
+    """
+    Метаданные поста без заголовка и текста.
+
+    Используются для фильтрации и объединения выборок (проверка доступа,
+    подписки, видимость): полный объект Post создается только для постов,
+    попадающих в ответ. Имя автора интернируется, теги хранятся номерами,
+    offset и length - смещение и длина строки поста в posts.txt в байтах (для текстового хранилища).
+    Объекты не изменяются после создания: изменение поста создает новые метаданные.
+    """
+
+    __slots__ = ("id", "author", "is_public", "tag_ids", "key", "order", "offset", "length")
+
+    def __init__(
+        self,
+        post_id: str,
+        author: str,
+        is_public: bool,
+        tags: Tuple[int, ...],
+        created_at: str,
+        offset: Optional[int] = None,
+        length: Optional[int] = None,
+    ):
+        self.id = post_id
+        self.author = sys.intern(author)
+        self.is_public = is_public
+        self.tag_ids = tags
+        self.key: PostKey = (created_at, post_id)
+        # Порядковый номер первого появления поста (порядок файла)
+        self.order = 0
+        self.offset = offset
+        self.length = length
+
+    @property
+    def created_at(self) -> str:
+        return self.key[0]
+
+    @property
+    def tags(self) -> List[str]:
+        return tag_names(self.tag_ids)
+
+def meta_from_post(post: Post, offset: Optional[int] = None, length: Optional[int] = None) -> PostMeta:
+    return PostMeta(post.id, post.author, post.is_public, tag_ids(post.tags), str(post.created_at), offset, length)
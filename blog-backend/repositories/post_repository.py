@@ -1,405 +1,263 @@
-import os
-from dotenv import load_dotenv
 from models.post import Post, PostAccessRequest, PostAccess, Comment
-from typing import List, Optional
+from repositories.pagination import PostKey
+from repositories.storage import get_storage
+from repositories import instrumentation, versions
+from typing import Callable, Dict, Iterable, List, Optional, Set
 
-# Загружаем переменные окружения
-load_dotenv()
+# Подписчики на изменения постов и комментариев: вызываются после записи в хранилище
+# с именем события ("post_saved", "post_updated", "post_deleted", "comment_saved") и данными
+_change_listeners: List[Callable[[str, object], None]] = []
 
-# Получаем путь к файлу базы данных
-DATABASE_POSTS_FILE = os.getenv("DATABASE_POSTS_FILE", "database/posts.txt")
-DATABASE_ACCESS_REQUESTS_FILE = os.getenv("DATABASE_ACCESS_REQUESTS_FILE", "database/access_requests.txt")
-DATABASE_ACCESS_FILE = os.getenv("DATABASE_ACCESS_FILE", "database/access.txt")
-DATABASE_COMMENTS_FILE = os.getenv("DATABASE_COMMENTS_FILE", "database/comments.txt")
+def add_change_listener(listener: Callable[[str, object], None]):
+    _change_listeners.append(listener)
+
+def _notify(event: str, payload: object):
+    for listener in _change_listeners:
+        listener(event, payload)
+
+def _on_remote_change(event: str, subject):
+    """
+    Изменение, записанное другим процессом: данные читаются из хранилища,
+    и подписчики оповещаются так же, как после собственной записи.
+    """
+    storage = get_storage()
+    if event in ("post_saved", "post_updated"):
+        post = storage.get_post(subject[0])
+        # Пост уже удален: об удалении сообщит следующее событие
+        if post is not None:
+            _notify(event, post)
+    elif event == "post_deleted":
+        _notify(event, subject[0])
+    elif event == "comment_saved":
+        post_id, comment_id = subject
+        for comment in storage.list_comments_by_post(post_id):
+            if comment.id == comment_id:
+                _notify(event, comment)
+                break
+
+versions.add_remote_listener(_on_remote_change)
 
 def get_posts_by_author(author: str) -> List[Post]:
-    posts = []
-    with open(DATABASE_POSTS_FILE, "r", encoding="utf-8") as file:
-        for line in file:
-            post_data = line.strip().split("|")
-            if post_data[4] == author:  # author is at index 4
-                posts.append(Post(
-                    id=post_data[0],
-                    title=post_data[1],
-                    content=post_data[2],
-                    is_public=post_data[3] == "True",
-                    tags=post_data[5].split(","),
-                    author=post_data[4],
-                    created_at=post_data[6]
-                ))
-    return posts
+    return get_storage().list_posts_by_author(author)
 
 def get_public_posts() -> List[Post]:
-    posts = []
-    with open(DATABASE_POSTS_FILE, "r", encoding="utf-8") as file:
-        for line in file:
-            post_data = line.strip().split("|")
-            if post_data[3] == "True":  # is_public is at index 3
-                posts.append(Post(
-                    id=post_data[0],
-                    title=post_data[1],
-                    content=post_data[2],
-                    is_public=True,
-                    tags=post_data[5].split(","),
-                    author=post_data[4],
-                    created_at=post_data[6]
-                ))
-    return posts
+    return get_storage().list_public_posts()
 
 def save_post(post: Post):
-    with open(DATABASE_POSTS_FILE, "a", encoding="utf-8") as file:
-        file.write(
-            f"{post.id}|{post.title}|{post.content}|{post.is_public}|{post.author}|{','.join(post.tags)}|{post.created_at}\n"
-        )
+    with versions.write("posts", f"post:{post.id}", event="post_saved", subject=(post.id,)):
+        get_storage().insert_post(post)
+    _notify("post_saved", post)
 
 def update_post(post_id: str, updated_post: Post, current_username: str):
-    posts = []
-    updated = False
-    with open(DATABASE_POSTS_FILE, "r", encoding="utf-8") as file:
-        for line in file:
-            post_data = line.strip().split("|")
-            if post_data[0] == post_id:
-                # Проверяем, что текущий пользователь является автором поста
-                if post_data[4] != current_username:
-                    raise ValueError("Вы не можете редактировать этот пост")
-                # Обновляем пост
-                posts.append(
-                    f"{post_id}|{updated_post.title}|{updated_post.content}|{updated_post.is_public}|{current_username}|{','.join(updated_post.tags)}|{post_data[6]}\n"
-                )
-                updated = True
-            else:
-                posts.append(line)
-    
-    if not updated:
+    storage = get_storage()
+    # Для проверки автора и даты создания достаточно метаданных поста
+    meta = storage.get_post_meta(post_id)
+    if meta is None:
         raise ValueError("Пост не найден")
-
-    # Перезаписываем файл с обновленными данными
-    with open(DATABASE_POSTS_FILE, "w", encoding="utf-8") as file:
-        file.writelines(posts)
+    # Проверяем, что текущий пользователь является автором поста
+    if meta.author != current_username:
+        raise ValueError("Вы не можете редактировать этот пост")
+    # Обновляем пост, дата создания остается прежней
+    post = Post(
+        id=post_id,
+        title=updated_post.title,
+        content=updated_post.content,
+        is_public=updated_post.is_public,
+        tags=updated_post.tags,
+        author=current_username,
+        created_at=meta.created_at
+    )
+    with versions.write("posts", f"post:{post_id}", event="post_updated", subject=(post_id,)):
+        storage.update_post(post)
+    _notify("post_updated", post)
 
 def delete_post(post_id: str, current_username: str):
-    posts = []
-    deleted = False
-    with open(DATABASE_POSTS_FILE, "r", encoding="utf-8") as file:
-        for line in file:
-            post_data = line.strip().split("|")
-            if post_data[0] == post_id:
-                # Проверяем, что текущий пользователь является автором поста
-                if post_data[4] != current_username:
-                    raise ValueError("Вы не можете удалить этот пост")
-                deleted = True
-            else:
-                posts.append(line)
-    
-    if not deleted:
+    storage = get_storage()
+    meta = storage.get_post_meta(post_id)
+    if meta is None:
         raise ValueError("Пост не найден")
-
-    # Перезаписываем файл без удаленного поста
-    with open(DATABASE_POSTS_FILE, "w", encoding="utf-8") as file:
-        file.writelines(posts)
+    # Проверяем, что текущий пользователь является автором поста
+    if meta.author != current_username:
+        raise ValueError("Вы не можете удалить этот пост")
+    with versions.write("posts", f"post:{post_id}", f"comments:{post_id}", event="post_deleted", subject=(post_id,)):
+        storage.delete_post(post_id)
+    _notify("post_deleted", post_id)
 
 def get_post_by_id(post_id: str, current_username: str = None):
-    with open(DATABASE_POSTS_FILE, "r", encoding="utf-8") as file:
-        for line in file:
-            post_data = line.strip().split("|")
-            if post_data[0] == post_id:
-                post = Post(
-                    id=post_data[0],
-                    title=post_data[1],
-                    content=post_data[2],
-                    is_public=post_data[3] == "True",
-                    tags=post_data[5].split(","),
-                    author=post_data[4],
-                    created_at=post_data[6]
-                )
-                # Проверяем, что пост публичный или пользователь является автором
-                if post.is_public or post.author == current_username:
-                    return post
-                # Проверяем, есть ли у пользователя доступ к посту
-                accesses = get_access_by_post(post_id)
-                if any(access.viewer_username == current_username for access in accesses):
-                    return post
-                else:
-                    raise ValueError("У вас нет доступа к этому посту")
-    return None
+    storage = get_storage()
+    # Доступ проверяется по метаданным, текст читается только для доступного поста
+    meta = storage.get_post_meta(post_id)
+    if meta is None:
+        return None
+    # Проверяем, что пост публичный или пользователь является автором
+    if meta.is_public or meta.author == current_username:
+        return storage.get_post(post_id)
+    # Проверяем, есть ли у пользователя доступ к посту
+    accesses = get_access_by_post(post_id)
+    if any(access.viewer_username == current_username for access in accesses):
+        return storage.get_post(post_id)
+    else:
+        raise ValueError("У вас нет доступа к этому посту")
+
+def get_posts_by_ids(post_ids: Iterable[str]) -> List[Post]:
+    """
+    Возвращает посты по списку ID в том же порядке, отсутствующие посты пропускаются.
+    """
+    return get_storage().get_posts(post_ids)
 
 def get_latest_comment(post_id: str) -> Optional[Comment]:
     """
     Возвращает последний комментарий к посту.
     """
-    comments = []
-    with open(DATABASE_COMMENTS_FILE, "r", encoding="utf-8") as file:
-        for line in file:
-            parts = line.strip().split("|")
-            if len(parts) == 5:
-                comment = Comment(
-                    id=parts[0],
-                    post_id=parts[1],
-                    author_username=parts[2],
-                    content=parts[3],
-                    created_at=parts[4]
-                )
-                if comment.post_id == post_id:
-                    comments.append(comment)
-    if comments:
-        # Сортируем комментарии по дате создания (последний комментарий будет первым)
-        comments.sort(key=lambda x: x.created_at, reverse=True)
-        return comments[0]
-    return None
+    return get_storage().get_latest_comments([post_id]).get(post_id)
+
+def get_latest_comments(post_ids: Iterable[str]) -> Dict[str, Comment]:
+    """
+    Возвращает последние комментарии сразу для набора постов.
+    """
+    return get_storage().get_latest_comments(post_ids)
 
 # Методы для работы с запросами на доступ
 def save_access_request(request: PostAccessRequest):
-    with open(DATABASE_ACCESS_REQUESTS_FILE, "a") as file:
-        file.write(f"{request.id}|{request.post_id}|{request.requester_username}|{request.status}|{request.created_at}\n")
+    with versions.write("access"):
+        get_storage().insert_access_request(request)
 
 def get_access_requests_by_post(post_id: str) -> List[PostAccessRequest]:
-    requests = []
-    with open(DATABASE_ACCESS_REQUESTS_FILE, "r") as file:
-        for line in file:
-            request_data = line.strip().split("|")
-            if request_data[1] == post_id:
-                requests.append(PostAccessRequest(
-                    id=request_data[0],
-                    post_id=request_data[1],
-                    requester_username=request_data[2],
-                    status=request_data[3],
-                    created_at=request_data[4]
-                ))
-    return requests
+    return get_storage().list_access_requests_by_post(post_id)
 
 def get_access_requests_by_requester(requester_username: str) -> List[PostAccessRequest]:
-    requests = []
-    with open(DATABASE_ACCESS_REQUESTS_FILE, "r") as file:
-        for line in file:
-            request_data = line.strip().split("|")
-            if request_data[2] == requester_username:
-                requests.append(PostAccessRequest(
-                    id=request_data[0],
-                    post_id=request_data[1],
-                    requester_username=request_data[2],
-                    status=request_data[3],
-                    created_at=request_data[4]
-                ))
-    return requests
+    return get_storage().list_access_requests_by_requester(requester_username)
+
+def get_access_request_statuses(requester_username: str) -> Dict[str, str]:
+    """
+    Возвращает статусы запросов пользователя на доступ в виде словаря post_id -> status.
+    Если запросов к посту несколько, учитывается первый из них.
+    """
+    statuses = {}
+    for request in get_storage().list_access_requests_by_requester(requester_username):
+        statuses.setdefault(request.post_id, request.status)
+    return statuses
 
 def update_access_request_status(request_id: str, status: str):
-    requests = []
-    updated = False
-    with open(DATABASE_ACCESS_REQUESTS_FILE, "r") as file:
-        for line in file:
-            request_data = line.strip().split("|")
-            if request_data[0] == request_id:
-                requests.append(f"{request_data[0]}|{request_data[1]}|{request_data[2]}|{status}|{request_data[4]}\n")
-                updated = True
-            else:
-                requests.append(line)
-    if updated:
-        with open(DATABASE_ACCESS_REQUESTS_FILE, "w") as file:
-            file.writelines(requests)
-    else:
+    storage = get_storage()
+    request = storage.get_access_request(request_id)
+    if request is None:
         raise ValueError("Запрос не найден")
+    request.status = status
+    with versions.write("access"):
+        storage.update_access_request(request)
 
 # Методы для работы с разрешениями на доступ
 def save_access(access: PostAccess):
-    with open(DATABASE_ACCESS_FILE, "a") as file:
-        file.write(f"{access.id}|{access.post_id}|{access.viewer_username}|{access.granted_by}|{access.created_at}\n")
+    with versions.write("access"):
+        get_storage().insert_access(access)
 
 def get_access_by_post(post_id: str) -> List[PostAccess]:
-    accesses = []
-    with open(DATABASE_ACCESS_FILE, "r") as file:
-        for line in file:
-            access_data = line.strip().split("|")
-            if access_data[1] == post_id:
-                accesses.append(PostAccess(
-                    id=access_data[0],
-                    post_id=access_data[1],
-                    viewer_username=access_data[2],
-                    granted_by=access_data[3],
-                    created_at=access_data[4]
-                ))
-    return accesses
+    return get_storage().list_access_by_post(post_id)
+
+def get_granted_post_ids(viewer_username: str) -> Set[str]:
+    """
+    Возвращает множество ID постов, к которым у пользователя есть доступ.
+    """
+    return get_storage().get_granted_post_ids(viewer_username)
 
 def delete_access(access_id: str):
-    accesses = []
-    with open(DATABASE_ACCESS_FILE, "r") as file:
-        for line in file:
-            access_data = line.strip().split("|")
-            if access_data[0] != access_id:
-                accesses.append(line)
-    with open(DATABASE_ACCESS_FILE, "w") as file:
-        file.writelines(accesses)
+    with versions.write("access"):
+        get_storage().delete_access(access_id)
 
 def get_access_requests_for_my_posts(author_username: str) -> List[PostAccessRequest]:
-    requests = []
-    with open(DATABASE_ACCESS_REQUESTS_FILE, "r") as file:
-        for line in file:
-            request_data = line.strip().split("|")
-            # Получаем пост по его ID
-            post_id = request_data[1]
-            # Проверяем, что пост принадлежит текущему пользователю
-            with open(DATABASE_POSTS_FILE, "r", encoding="utf-8") as posts_file:
-                for post_line in posts_file:
-                    post_data = post_line.strip().split("|")
-                    if post_data[0] == post_id and post_data[4] == author_username:
-                        requests.append(PostAccessRequest(
-                            id=request_data[0],
-                            post_id=post_id,
-                            requester_username=request_data[2],
-                            status=request_data[3],
-                            created_at=request_data[4]
-                        ))
-                        break  # Прерываем поиск поста, если нашли
-    return requests
+    return get_storage().list_access_requests_for_author(author_username)
 
 def get_my_post_access_requests(requester_username: str) -> List[PostAccessRequest]:
-    requests = []
-    with open(DATABASE_ACCESS_REQUESTS_FILE, "r") as file:
-        for line in file:
-            request_data = line.strip().split("|")
-            if request_data[2] == requester_username:  # requester_username находится на индексе 2
-                requests.append(PostAccessRequest(
-                    id=request_data[0],
-                    post_id=request_data[1],
-                    requester_username=request_data[2],
-                    status=request_data[3],
-                    created_at=request_data[4]
-                ))
-    return requests
+    return get_storage().list_access_requests_by_requester(requester_username)
 
 def get_posts_by_authors(authors: List[str], current_username: str) -> List[Post]:
-    posts = []
-    with open(DATABASE_POSTS_FILE, "r", encoding="utf-8") as file:
-        for line in file:
-            post_data = line.strip().split("|")
-            if post_data[4] in authors:  # author is at index 4
-                is_public = post_data[3] == "True"
-                if is_public:
-                    # Если пост публичный, добавляем его
-                    posts.append(Post(
-                        id=post_data[0],
-                        title=post_data[1],
-                        content=post_data[2],
-                        is_public=True,
-                        tags=post_data[5].split(","),
-                        author=post_data[4],
-                        created_at=post_data[6]
-                    ))
-                else:
-                    # Если пост скрытый, проверяем, есть ли разрешение на просмотр
-                    with open(DATABASE_ACCESS_FILE, "r") as access_file:
-                        for access_line in access_file:
-                            access_data = access_line.strip().split("|")
-                            if access_data[1] == post_data[0] and access_data[2] == current_username:
-                                # Если есть разрешение, добавляем пост
-                                posts.append(Post(
-                                    id=post_data[0],
-                                    title=post_data[1],
-                                    content=post_data[2],
-                                    is_public=False,
-                                    tags=post_data[5].split(","),
-                                    author=post_data[4],
-                                    created_at=post_data[6]
-                                ))
-                                break
-    return posts
+    storage = get_storage()
+    # Посты, к которым у пользователя есть доступ, собираем один раз
+    granted_post_ids = storage.get_granted_post_ids(current_username)
+    # Публичный пост добавляем всегда, скрытый - только при наличии разрешения на просмотр
+    return storage.get_posts(
+        meta.id for meta in storage.list_post_meta(authors=authors)
+        if meta.is_public or meta.id in granted_post_ids
+    )
 
 def save_comment(comment: Comment):
-    with open(DATABASE_COMMENTS_FILE, "a", encoding="utf-8") as file:
-        file.write(f"{comment.id}|{comment.post_id}|{comment.author_username}|{comment.content}|{comment.created_at}\n")
+    with versions.write(
+        "comments", f"comments:{comment.post_id}", event="comment_saved", subject=(comment.post_id, comment.id)
+    ):
+        get_storage().insert_comment(comment)
+    _notify("comment_saved", comment)
 
 def get_comments_by_post(post_id: str) -> List[Comment]:
-    comments = []
-    with open(DATABASE_COMMENTS_FILE, "r", encoding="utf-8") as file:
-        for line in file:
-            comment_data = line.strip().split("|")
-            if comment_data[1] == post_id:
-                comments.append(Comment(
-                    id=comment_data[0],
-                    post_id=comment_data[1],
-                    author_username=comment_data[2],
-                    content=comment_data[3],
-                    created_at=comment_data[4]
-                ))
-    return comments
+    return get_storage().list_comments_by_post(post_id)
 
 def get_accessible_private_posts(current_username: str) -> List[Post]:
-    posts = []
-    with open(DATABASE_POSTS_FILE, "r", encoding="utf-8") as file:
-        for line in file:
-            post_data = line.strip().split("|")
-            if post_data[4] != current_username and post_data[3] == "False":  # Приватные посты других пользователей
-                # Проверяем, есть ли доступ у текущего пользователя
-                with open(DATABASE_ACCESS_FILE, "r") as access_file:
-                    for access_line in access_file:
-                        access_data = access_line.strip().split("|")
-                        if access_data[1] == post_data[0] and access_data[2] == current_username:
-                            posts.append(Post(
-                                id=post_data[0],
-                                title=post_data[1],
-                                content=post_data[2],
-                                is_public=False,
-                                tags=post_data[5].split(","),
-                                author=post_data[4],
-                                created_at=post_data[6]
-                            ))
-                            break
-    return posts
+    storage = get_storage()
+    granted_post_ids = storage.get_granted_post_ids(current_username)
+    return storage.get_posts(
+        meta.id for meta in storage.list_post_meta(is_public=False)
+        # Приватные посты других пользователей, к которым есть доступ
+        if meta.author != current_username and meta.id in granted_post_ids
+    )
 
 def get_inaccessible_private_posts(current_username: str) -> List[Post]:
-    posts = []
-    with open(DATABASE_POSTS_FILE, "r", encoding="utf-8") as file:
-        for line in file:
-            post_data = line.strip().split("|")
-            if post_data[4] != current_username and post_data[3] == "False":  # Приватные посты других пользователей
-                # Проверяем, есть ли доступ у текущего пользователя
-                has_access = False
-                with open(DATABASE_ACCESS_FILE, "r") as access_file:
-                    for access_line in access_file:
-                        access_data = access_line.strip().split("|")
-                        if access_data[1] == post_data[0] and access_data[2] == current_username:
-                            has_access = True
-                            break
-                # Если доступа нет, добавляем только заголовок и автора
-                if not has_access:
-                    posts.append(Post(
-                        id=post_data[0],
-                        title=post_data[1],
-                        content="",  # Исключаем текст поста
-                        is_public=False,
-                        tags=[],  # Исключаем теги
-                        author=post_data[4],
-                        created_at=post_data[6]
-                    ))
+    storage = get_storage()
+    granted_post_ids = storage.get_granted_post_ids(current_username)
+    posts = storage.get_posts(
+        meta.id for meta in storage.list_post_meta(is_public=False)
+        # Приватные посты других пользователей, к которым нет доступа
+        if meta.author != current_username and meta.id not in granted_post_ids
+    )
+    for post in posts:
+        # Добавляем только заголовок и автора
+        post.content = ""  # Исключаем текст поста
+        post.tags = []  # Исключаем теги
     return posts
 
+# Постраничная выдача: посты в порядке (created_at, id) после ключа after
+def get_posts_page(after: Optional[PostKey], limit: Optional[int]) -> List[Post]:
+    return get_storage().list_posts_page(after, limit)
+
+def get_posts_by_author_page(author: str, after: Optional[PostKey], limit: Optional[int]) -> List[Post]:
+    return get_storage().list_posts_page(after, limit, authors=[author])
+
+def get_public_posts_page(after: Optional[PostKey], limit: Optional[int]) -> List[Post]:
+    return get_storage().list_posts_page(after, limit, is_public=True)
+
+def get_posts_by_authors_page(
+    authors: List[str], current_username: str, after: Optional[PostKey], limit: Optional[int]
+) -> List[Post]:
+    """
+    Страница постов авторов, видимых пользователю: публичные и приватные с разрешением.
+    Скрытые посты отбрасываются по метаданным, поэтому они читаются порциями,
+    пока страница не заполнится, а полные посты - только для страницы.
+    """
+    storage = get_storage()
+    granted_post_ids = storage.get_granted_post_ids(current_username)
+    post_ids = []
+    while True:
+        batch = storage.list_post_meta_page(after, limit, authors=authors)
+        post_ids.extend(meta.id for meta in batch if meta.is_public or meta.id in granted_post_ids)
+        if limit is None or len(post_ids) >= limit or len(batch) < limit:
+            return storage.get_posts(post_ids[:limit])
+        after = batch[-1].key
+
 def read_posts_from_file() -> List[Post]:
     """
-    Чтение постов из файла posts.txt.
+    Чтение всех постов из хранилища.
     Возвращает список объектов Post.
     """
-    posts = []
-    try:
-        with open(DATABASE_POSTS_FILE, "r", encoding="utf-8") as file:
-            for line in file:
-                # Разделяем строку по символу "|"
-                post_data = line.strip().split("|")
-
-                # Проверяем, что строка содержит все необходимые поля
-                if len(post_data) == 7:
-                    # Преобразуем данные в объект Post
-                    post = Post(
-                        id=post_data[0],
-                        title=post_data[1],
-                        content=post_data[2],
-                        is_public=post_data[3].lower() == "true",  # Преобразуем строку в boolean
-                        tags=post_data[5].split(",") if post_data[5] else [],  # Разделяем теги по запятой
-                        author=post_data[4],
-                        created_at=post_data[6]
-                    )
-                    posts.append(post)
-    except FileNotFoundError:
-        print(f"Файл {DATABASE_POSTS_FILE} не найден.")
-    except Exception as e:
-        print(f"Ошибка при чтении файла {DATABASE_POSTS_FILE}: {e}")
-
-    return posts
\ No newline at end of file
+    return get_storage().list_posts()
+
+# Учет вызовов (число, время, прочитанные строки и байты) для /metrics и журнала медленных запросов
+instrumentation.instrument_module(__name__, [
+    "get_posts_by_author", "get_public_posts", "save_post", "update_post", "delete_post",
+    "get_post_by_id", "get_posts_by_ids", "get_latest_comment", "get_latest_comments",
+    "save_access_request", "get_access_requests_by_post", "get_access_requests_by_requester",
+    "get_access_request_statuses", "update_access_request_status", "save_access",
+    "get_access_by_post", "get_granted_post_ids", "delete_access",
+    "get_access_requests_for_my_posts", "get_my_post_access_requests", "get_posts_by_authors",
+    "save_comment", "get_comments_by_post", "get_accessible_private_posts",
+    "get_inaccessible_private_posts", "get_posts_page", "get_posts_by_author_page",
+    "get_public_posts_page", "get_posts_by_authors_page", "read_posts_from_file",
+])
@@ -0,0 +1,546 @@
+import heapq
+import mmap
+import os
+import threading
+from bisect import bisect_right, insort
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from models.post import Post
+from repositories import instrumentation, post_index, record_log
+from repositories.write_coordinator import Appended
+from repositories.pagination import PostKey
+from repositories.post_meta import PostMeta, canonical_created_at, meta_from_post, tag_ids
+
+def _stamp(stat: os.stat_result):
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+def parse_post_fields(post_data: List[str]) -> Optional[Post]:
+    """
+    Преобразует поля строки posts.txt в объект Post.
+    Возвращает None для некорректных строк.
+    """
+    if len(post_data) != 7:
+        return None
+    return Post(
+        id=post_data[0],
+        title=post_data[1],
+        content=post_data[2],
+        is_public=post_data[3] == "True",
+        tags=post_data[5].split(",") if post_data[5] else [],
+        author=post_data[4],
+        created_at=post_data[6]
+    )
+
+def parse_post_meta(post_data: List[str], offset: int, length: int) -> Optional[PostMeta]:
+    """
+    Метаданные поста из полей строки posts.txt: заголовок и текст не сохраняются.
+    """
+    if len(post_data) != 7:
+        return None
+    try:
+        created_at = canonical_created_at(post_data[6])
+    except ValueError:
+        # Нестандартную запись даты разбираем так же, как модель Post
+        created_at = str(parse_post_fields(post_data).created_at)
+    tags = tag_ids(post_data[5].split(",") if post_data[5] else [])
+    return PostMeta(post_data[0], post_data[4], post_data[3] == "True", tags, created_at, offset, length)
+
+def format_post_line(post: Post) -> str:
+    """
+    Преобразует объект Post в строку для записи в posts.txt.
+    """
+    return f"{post.id}|{post.title}|{post.content}|{post.is_public}|{post.author}|{','.join(post.tags)}|{post.created_at}\n"
+
+def _end(metas: List[PostMeta]) -> int:
+    return max((meta.offset + meta.length for meta in metas), default=0)
+
+def _remove_key(keys: List[PostKey], key: PostKey):
+    position = bisect_right(keys, key) - 1
+    if position >= 0 and keys[position] == key:
+        del keys[position]
+
+def _keys_after(keys: List[PostKey], after: Optional[PostKey]):
+    start = bisect_right(keys, after) if after is not None else 0
+    return (keys[position] for position in range(start, len(keys)))
+
+class PostStore:
+    """
+    Хранилище постов с индексами в памяти процесса и записью изменений в posts.txt.
+    Файл ведется как журнал (см. record_log): изменения и удаления дописываются в конец.
+
+    В памяти хранятся только метаданные постов (PostMeta: ID, автор, видимость,
+    теги, дата, смещение и длина строки в файле), по ним работают индексы: по ID,
+    по автору и по видимости. Индексы автора и видимости хранят ID в порядке
+    следования постов в файле, поэтому выборки стоят O(размер результата).
+    Заголовок и текст берутся срезом отображенного в память (mmap) файла
+    только для постов, которые возвращаются наружу, поэтому память не растет
+    с объемом текстов, а чтение поста не открывает файл.
+    Метаданные сохраняются в индекс posts.txt.idx (см. post_index): после перезапуска
+    они загружаются из него, а posts.txt дочитывается только после проиндексированной части.
+    Строки, дописанные в файл другими процессами, дочитываются при следующем обращении
+    (индексы обновляются только по ним), а если файл переписан извне или компактизацией,
+    он перечитывается целиком.
+    Запись в файл выполняется без блокировки хранилища (группой с записями других
+    потоков, см. write_coordinator), индексы обновляются после нее; чужие записи,
+    появившиеся в файле перед нашей, обнаруживаются по состоянию файла до записи.
+
+    Для постраничной выдачи те же выборки хранятся еще и в виде отсортированных
+    списков ключей (created_at, id): начало страницы находится бинарным поиском.
+    """
+
+    def __init__(self, path: str, index_path: Optional[str] = None):
+        self.path = path
+        self.index_path = index_path or f"{path}.idx"
+        self._lock = threading.RLock()
+        self._meta: Dict[str, PostMeta] = {}
+        self._by_author: Dict[str, Dict[str, None]] = {}
+        self._public: Dict[str, None] = {}
+        self._private: Dict[str, None] = {}
+        self._next_order = 0
+        # Число записей и размер файла при загрузке (см. порядок новых постов в _index)
+        self._loaded_records = 0
+        self._loaded_size: Optional[int] = 0
+        # Отсортированные ключи (created_at, id): все посты, по автору и по видимости
+        self._keys: List[PostKey] = []
+        self._keys_by_author: Dict[str, List[PostKey]] = {}
+        self._keys_public: List[PostKey] = []
+        self._keys_private: List[PostKey] = []
+        self._stamp = None
+        # Последние байты файла перед прочитанной позицией (см. record_log.read_tail)
+        self._marker = b""
+        # Смещения надгробий постов, удаленных после загрузки: запоздавшая запись
+        # более старой версии поста не должна его вернуть
+        self._removed: Dict[str, int] = {}
+        # Смещения строк устарели: файл переписан компактизацией
+        self._offsets_stale = False
+        # Отображение posts.txt в память (создается при первом чтении поста)
+        self._map: Optional[mmap.mmap] = None
+        record_log.add_compaction_listener(path, self._on_compacted)
+
+    def _file_stamp(self):
+        try:
+            return _stamp(os.stat(self.path))
+        except FileNotFoundError:
+            return None
+
+    def _on_compacted(self, before: os.stat_result, after: os.stat_result):
+        # Компактизация не меняет содержимое, но сдвигает строки: смещения нужно перечитать
+        self._offsets_stale = True
+
+    def load(self):
+        """
+        Строит индексы по сохраненному индексу и дочитывает posts.txt после него.
+        Если индекса нет или он не подходит к файлу, posts.txt читается целиком,
+        а индекс сохраняется заново.
+        """
+        with self._lock:
+            # Метка берется до чтения: строки, дописанные во время чтения, вызовут повторную загрузку
+            stamp = self._file_stamp()
+            snapshot = None
+            if stamp is not None:
+                try:
+                    snapshot = post_index.read_index(self.index_path, self.path, stamp)
+                except FileNotFoundError:
+                    pass
+            if snapshot is not None and self._load_snapshot(snapshot, stamp):
+                if snapshot.stale or snapshot.end < stamp[1]:
+                    self._save_index()
+                return
+            self._reset()
+            try:
+                for meta in record_log.scan_records(self.path, parse_post_meta):
+                    self._index(meta, with_keys=False)
+            except FileNotFoundError:
+                pass
+            self._build_keys()
+            self._loaded(stamp, stamp[1] if stamp else 0)
+            self._save_index()
+
+    def _reset(self):
+        self._meta = {}
+        self._by_author = {}
+        self._public = {}
+        self._private = {}
+        self._next_order = 0
+        self._offsets_stale = False
+        self._loaded_size = None
+        self._removed = {}
+        # Прежнее отображение не закрывается: его могут читать другие потоки
+        self._map = None
+
+    def _loaded(self, stamp, end: int):
+        """
+        Запоминает, до какого смещения прочитан файл (stamp - состояние файла до чтения).
+        """
+        self._loaded_records = self._next_order
+        self._loaded_size = end
+        if stamp is None:
+            self._stamp = None
+        else:
+            self._stamp = stamp if end == stamp[1] else (stamp[0], end, None)
+        try:
+            self._marker = record_log.read_marker(self.path, end)
+        except FileNotFoundError:
+            self._marker = b""
+
+    def _load_snapshot(self, snapshot: post_index.IndexSnapshot, stamp) -> bool:
+        """
+        Строит индексы по сохраненному индексу и дочитывает строки posts.txt после него.
+        Возвращает False, если файл переписан во время чтения.
+        """
+        self._reset()
+        for post_id, offset, _, meta in snapshot.entries:
+            if meta is None:
+                self._unindex(post_id, offset, with_keys=False)
+            else:
+                self._index(meta, with_keys=False)
+        self._build_keys()
+        self._loaded(stamp, snapshot.end)
+        record_log.set_record_counts(self.path, snapshot.records, len(self._meta))
+        return snapshot.end == stamp[1] or self._catch_up()
+
+    def _save_index(self):
+        if self._stamp is None:
+            return
+        post_index.write_index(
+            self.index_path, self._stamp[0], self._stamp[1], record_log.record_counts(self.path)[0],
+            self._marker, sorted(self._meta.values(), key=lambda meta: meta.order),
+        )
+
+    def _refresh(self):
+        """
+        Приводит индексы в соответствие с файлом: дописанные строки дочитываются,
+        иначе (файл заменен, укорочен или переписан) файл читается целиком.
+        """
+        stamp = self._file_stamp()
+        if self._stamp is not None and self._stamp == stamp and not self._offsets_stale:
+            return
+        # Файл заменен или переписан без изменения размера: дописанных строк нет
+        if (
+            self._stamp is None or stamp is None or self._offsets_stale
+            or stamp[0] != self._stamp[0] or stamp[1] == self._stamp[1]
+        ):
+            self.load()
+            return
+        if not self._catch_up():
+            self.load()
+
+    def _catch_up(self) -> bool:
+        """
+        Дочитывает строки, дописанные после прочитанной части файла.
+        Возвращает False, если файл был переписан и его нужно читать целиком.
+        """
+        try:
+            tail = record_log.read_tail(self.path, self._stamp[1], self._marker)
+        except FileNotFoundError:
+            tail = None
+        if tail is None or tail.stat.st_ino != self._stamp[0]:
+            return False
+        for fields, offset, length in tail.records:
+            if record_log.is_tombstone(fields):
+                self._unindex(fields[0], offset)
+            else:
+                meta = parse_post_meta(fields, offset, length)
+                if meta is not None:
+                    self._index(meta)
+        self._marker = tail.marker
+        if tail.end == tail.stat.st_size:
+            self._stamp = _stamp(tail.stat)
+        else:
+            # Последнюю строку еще дописывают: она будет прочитана при следующем обращении
+            self._stamp = (tail.stat.st_ino, tail.end, None)
+        return True
+
+    def _ensure_loaded(self):
+        self._refresh()
+
+    def _build_keys(self):
+        # При загрузке ключи сортируются один раз, а не вставляются по одному
+        self._keys = []
+        self._keys_by_author = {}
+        self._keys_public = []
+        self._keys_private = []
+        for meta in self._meta.values():
+            self._keys.append(meta.key)
+            self._keys_by_author.setdefault(meta.author, []).append(meta.key)
+            (self._keys_public if meta.is_public else self._keys_private).append(meta.key)
+        for keys in [self._keys, self._keys_public, self._keys_private, *self._keys_by_author.values()]:
+            keys.sort()
+
+    def _index(self, meta: PostMeta, with_keys: bool = True):
+        previous = self._meta.get(meta.id)
+        # Более новая версия или удаление поста уже учтены (строки дочитаны из файла)
+        if meta.offset is not None and (
+            (previous is not None and previous.offset is not None and previous.offset > meta.offset)
+            or self._removed.get(meta.id, -1) > meta.offset
+        ):
+            return
+        if previous is not None:
+            self._unindex_secondary(previous, with_keys)
+            meta.order = previous.order
+        elif self._loaded_size is not None and meta.offset is not None and meta.offset >= self._loaded_size:
+            # Посты, дописанные после загрузки, упорядочены по смещению: потоки
+            # могут обновлять индексы не в том порядке, в каком записывали строки
+            meta.order = self._loaded_records + meta.offset
+        else:
+            meta.order = self._next_order
+            self._next_order += 1
+        # Повторное присваивание сохраняет позицию поста в словаре, то есть порядок файла
+        self._meta[meta.id] = meta
+        self._insert_ordered(self._by_author.setdefault(meta.author, {}), meta.id)
+        self._insert_ordered(self._public if meta.is_public else self._private, meta.id)
+        if with_keys:
+            insort(self._keys, meta.key)
+            insort(self._keys_by_author.setdefault(meta.author, []), meta.key)
+            insort(self._keys_public if meta.is_public else self._keys_private, meta.key)
+
+    def _unindex(self, post_id: str, offset: int, with_keys: bool = True):
+        self._removed[post_id] = max(self._removed.get(post_id, -1), offset)
+        meta = self._meta.get(post_id)
+        # Пост мог удалить параллельный запрос
+        if meta is not None and (meta.offset is None or meta.offset < offset):
+            del self._meta[post_id]
+            self._unindex_secondary(meta, with_keys)
+
+    def _unindex_secondary(self, meta: PostMeta, with_keys: bool = True):
+        author_ids = self._by_author[meta.author]
+        del author_ids[meta.id]
+        if not author_ids:
+            del self._by_author[meta.author]
+        (self._public if meta.is_public else self._private).pop(meta.id)
+        if with_keys:
+            _remove_key(self._keys, meta.key)
+            _remove_key(self._keys_by_author[meta.author], meta.key)
+            if not self._keys_by_author[meta.author]:
+                del self._keys_by_author[meta.author]
+            _remove_key(self._keys_public if meta.is_public else self._keys_private, meta.key)
+
+    def _insert_ordered(self, index: Dict[str, None], post_id: str):
+        in_order = not index or self._meta[next(reversed(index))].order < self._meta[post_id].order
+        index[post_id] = None
+        if not in_order:
+            # Пост, переехавший в другой индекс при обновлении, возвращаем на его место по порядку файла
+            items = sorted(index, key=lambda item: self._meta[item].order)
+            index.clear()
+            index.update(dict.fromkeys(items))
+
+    def _mapping(self, end: int) -> Optional[mmap.mmap]:
+        """
+        Отображение posts.txt, покрывающее смещение end. Хранилище только дописывает
+        файл или заменяет его целиком (компактизация), поэтому выросший файл отображается
+        заново, а прежнее отображение остается действительным для читающих его потоков.
+        """
+        if self._map is None or len(self._map) < end:
+            try:
+                with open(self.path, "rb") as file:
+                    if os.fstat(file.fileno()).st_size:
+                        self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except FileNotFoundError:
+                self._map = None
+        return self._map
+
+    def _read(self, metas: List[PostMeta], mapping: Optional[mmap.mmap]) -> Optional[List[Post]]:
+        """
+        Читает посты срезами отображения по смещениям и длинам строк, в порядке смещений.
+        Возвращает None, если строка по смещению не принадлежит посту (файл переписан).
+        """
+        if not metas:
+            return []
+        if mapping is None:
+            return None
+        posts = {}
+        size = 0
+        try:
+            for meta in sorted(metas, key=lambda meta: meta.offset):
+                raw_line = mapping[meta.offset:meta.offset + meta.length]
+                size += len(raw_line)
+                post_data = raw_line.decode("utf-8").strip().split("|")
+                post = parse_post_fields(post_data) if post_data[0] == meta.id and raw_line.endswith(b"\n") else None
+                if post is None:
+                    return None
+                posts[meta.id] = post
+        except UnicodeDecodeError:
+            return None
+        finally:
+            instrumentation.record_io(len(posts), size)
+        return [posts[meta.id] for meta in metas]
+
+    def _posts(self, select: Callable[[], List[PostMeta]]) -> List[Post]:
+        """
+        Выбирает метаданные под блокировкой и читает полные посты из отображения файла без нее.
+        Каждый вызов создает новые объекты, поэтому вызывающий код может их изменять.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            metas = select()
+            mapping = self._mapping(_end(metas))
+        posts = self._read(metas, mapping)
+        if posts is None:
+            # Файл переписан в обход хранилища: перечитываем индексы и строки
+            with self._lock:
+                self.load()
+                metas = select()
+                posts = self._read(metas, self._mapping(_end(metas)))
+            if posts is None:
+                raise RuntimeError(f"Файл {self.path} изменен во время чтения")
+        return posts
+
+    def _metas_by_ids(self, post_ids) -> List[PostMeta]:
+        return [self._meta[post_id] for post_id in post_ids]
+
+    def _metas_by_authors(self, authors: Iterable[str]) -> List[PostMeta]:
+        metas = [self._meta[post_id] for author in set(authors) for post_id in self._by_author.get(author, ())]
+        metas.sort(key=lambda meta: meta.order)
+        return metas
+
+    def _metas_page(
+        self,
+        after: Optional[PostKey],
+        limit: Optional[int],
+        authors: Optional[Iterable[str]],
+        is_public: Optional[bool],
+    ) -> List[PostMeta]:
+        if authors is not None:
+            sources = [self._keys_by_author.get(author, []) for author in set(authors)]
+        elif is_public is None:
+            sources = [self._keys]
+        else:
+            sources = [self._keys_public if is_public else self._keys_private]
+        # Списки ключей нескольких авторов сливаются лениво, без полной сортировки
+        metas = (self._meta[key[1]] for key in heapq.merge(*[_keys_after(source, after) for source in sources]))
+        if authors is not None and is_public is not None:
+            metas = (meta for meta in metas if meta.is_public == is_public)
+        return list(islice(metas, limit))
+
+    def get_meta(self, post_id: str) -> Optional[PostMeta]:
+        with self._lock:
+            self._ensure_loaded()
+            return self._meta.get(post_id)
+
+    def metas(self, authors: Optional[Iterable[str]] = None, is_public: Optional[bool] = None) -> List[PostMeta]:
+        """
+        Метаданные постов в порядке следования в файле с фильтрами по авторам и видимости.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if authors is not None:
+                metas = self._metas_by_authors(authors)
+                return metas if is_public is None else [meta for meta in metas if meta.is_public == is_public]
+            if is_public is None:
+                return list(self._meta.values())
+            return self._metas_by_ids(self._public if is_public else self._private)
+
+    def meta_page(
+        self,
+        after: Optional[PostKey],
+        limit: Optional[int],
+        authors: Optional[Iterable[str]] = None,
+        is_public: Optional[bool] = None,
+    ) -> List[PostMeta]:
+        """
+        Метаданные постов в порядке (created_at, id), начиная со следующего после ключа after.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            return self._metas_page(after, limit, authors, is_public)
+
+    def posts(self, post_ids: Iterable[str]) -> List[Post]:
+        """
+        Полные посты по списку ID в том же порядке, отсутствующие посты пропускаются.
+        """
+        post_ids = list(post_ids)
+        return self._posts(lambda: self._metas_by_ids(post_id for post_id in post_ids if post_id in self._meta))
+
+    def get(self, post_id: str) -> Optional[Post]:
+        posts = self.posts([post_id])
+        return posts[0] if posts else None
+
+    def all(self) -> List[Post]:
+        return self._posts(lambda: list(self._meta.values()))
+
+    def by_author(self, author: str) -> List[Post]:
+        return self._posts(lambda: self._metas_by_ids(self._by_author.get(author, ())))
+
+    def ids_by_author(self, author: str) -> Set[str]:
+        """
+        Множество ID постов автора без чтения самих постов.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            return set(self._by_author.get(author, ()))
+
+    def by_authors(self, authors) -> List[Post]:
+        """
+        Посты нескольких авторов в порядке следования в файле.
+        """
+        return self._posts(lambda: self._metas_by_authors(authors))
+
+    def public(self) -> List[Post]:
+        return self._posts(lambda: self._metas_by_ids(self._public))
+
+    def private(self) -> List[Post]:
+        return self._posts(lambda: self._metas_by_ids(self._private))
+
+    def page(
+        self,
+        after: Optional[PostKey],
+        limit: Optional[int],
+        authors: Optional[Iterable[str]] = None,
+        is_public: Optional[bool] = None,
+    ) -> List[Post]:
+        """
+        Посты в порядке (created_at, id), начиная со следующего после ключа after.
+        Из файла читаются только посты, попавшие на страницу.
+        """
+        return self._posts(lambda: self._metas_page(after, limit, authors, is_public))
+
+    def _apply(self, appended: Appended, change: Callable[[], None]):
+        """
+        Обновляет индексы после записи в файл.
+        Если перед нашей группой записей в файле появились чужие изменения
+        (или смещения устарели), индексы дочитывают файл вместе с нашей записью.
+        """
+        with self._lock:
+            before, after = _stamp(appended.before), _stamp(appended.after)
+            # Состояние after означает, что группу уже учел другой поток из нее
+            if self._stamp in (before, after) and not self._offsets_stale:
+                change()
+                self._stamp = after
+                try:
+                    self._marker = record_log.read_marker(self.path, after[1])
+                except FileNotFoundError:
+                    self._stamp = None
+            else:
+                self._refresh()
+                # Другой поток мог дочитать файл дальше нашей записи, пока она ждала блокировки:
+                # применяем ее еще раз (более новые версии поста защищены проверкой смещений)
+                change()
+
+    def add(self, post: Post):
+        """
+        Добавляет пост: дописывает строку в конец файла, обновляет индексы и дописывает их в индекс на диске.
+        """
+        line = format_post_line(post)
+        appended = record_log.append_record(self.path, line)
+        meta = meta_from_post(post, appended.offset, len(line.encode("utf-8")))
+        self._apply(appended, lambda: self._index(meta))
+        post_index.append_entry(self.index_path, post_index.format_entry(meta))
+
+    def update(self, post: Post):
+        """
+        Заменяет существующий пост: дописывает его новую версию в конец файла.
+        """
+        line = format_post_line(post)
+        appended = record_log.append_record(self.path, line, replaces=True)
+        meta = meta_from_post(post, appended.offset, len(line.encode("utf-8")))
+        self._apply(appended, lambda: self._index(meta))
+        post_index.append_entry(self.index_path, post_index.format_entry(meta))
+
+    def remove(self, post_id: str):
+        """
+        Удаляет пост: дописывает в конец файла строку-надгробие.
+        """
+        appended = record_log.append_tombstone(self.path, post_id)
+        self._apply(appended, lambda: self._unindex(post_id, appended.offset))
+        length = len(f"{post_id}|{record_log.TOMBSTONE}\n".encode("utf-8"))
+        post_index.append_entry(self.index_path, post_index.format_removal(post_id, appended.offset, length))
@@ -0,0 +1,290 @@
+import os
+import tempfile
+import threading
+from contextlib import nullcontext
+from dotenv import load_dotenv
+from typing import Callable, ContextManager, Dict, Iterator, List, NamedTuple, Optional, Tuple, TypeVar
+from repositories import instrumentation, write_coordinator
+from repositories.write_coordinator import Appended
+
+# Файлы данных (posts.txt, access.txt, access_requests.txt) ведутся как журнал:
+# - новая запись дописывается в конец файла;
+# - изменение дописывает полную новую версию записи с тем же ID (побеждает последняя);
+# - удаление дописывает строку-надгробие (tombstone) "<id>|__deleted__".
+# Запись сохраняет позицию своего первого появления в файле, поэтому порядок чтения
+# совпадает с порядком, который был бы после перезаписи файла на месте.
+# Мертвые строки убираются компактизацией в фоновом потоке: живые записи пишутся
+# во временный файл, который атомарно заменяет исходный.
+# Дописывание и замена файла выполняются под блокировкой файла (write_coordinator),
+# поэтому журнал могут вести несколько процессов одновременно.
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Компактизация запускается, когда мертвых строк не меньше LOG_COMPACTION_MIN_GARBAGE
+# и они составляют не меньше LOG_COMPACTION_RATIO от всех строк файла
+LOG_COMPACTION_MIN_GARBAGE = int(os.getenv("LOG_COMPACTION_MIN_GARBAGE", "1000"))
+LOG_COMPACTION_RATIO = float(os.getenv("LOG_COMPACTION_RATIO", "0.5"))
+
+TOMBSTONE = "__deleted__"
+
+# Обертка замены файла при компактизации. repositories.versions отмечает замену в журнале
+# изменений как запись без изменившихся ресурсов: содержимое не меняется, а новая метка
+# файла не должна считаться изменением в обход репозиториев (сдвигом эпохи)
+_replace_guard: Callable[[], ContextManager] = nullcontext
+
+def set_replace_guard(guard: Callable[[], ContextManager]):
+    global _replace_guard
+    _replace_guard = guard
+
+T = TypeVar("T")
+
+class _LogState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = 0  # Всего строк в файле
+        self.live = 0  # Из них живых записей
+        self.compacting = False
+        self.listeners: List[Callable[[os.stat_result, os.stat_result], None]] = []
+
+_states: Dict[str, _LogState] = {}
+_states_lock = threading.Lock()
+
+def _state(path: str) -> _LogState:
+    with _states_lock:
+        state = _states.get(path)
+        if state is None:
+            state = _states[path] = _LogState()
+        return state
+
+def add_compaction_listener(path: str, listener: Callable[[os.stat_result, os.stat_result], None]):
+    """
+    Регистрирует функцию, которая вызывается сразу после замены файла компактизацией
+    с результатами os.stat файла до и после замены.
+    Логическое содержимое файла при компактизации не меняется.
+    """
+    _state(path).listeners.append(listener)
+
+def is_tombstone(fields: List[str]) -> bool:
+    return len(fields) == 2 and fields[1] == TOMBSTONE
+
+def scan_records(path: str, parse: Callable[[List[str], int, int], Optional[T]]) -> List[T]:
+    """
+    Читает журнал и возвращает живые записи в порядке их первого появления.
+    Для последней версии каждой записи вызывается parse(поля, смещение строки, длина строки),
+    смещение и длина - в байтах, результат None пропускается. Позволяет не хранить поля всех записей при загрузке.
+    Незавершенная последняя строка (ее дописывает другой процесс) пропускается.
+    """
+    records = {}
+    lines = 0
+    offset = 0
+    with open(path, "rb") as file:
+        for raw_line in file:
+            if not raw_line.endswith(b"\n"):
+                break
+            line_offset = offset
+            offset += len(raw_line)
+            fields = raw_line.decode("utf-8").strip().split("|")
+            if fields == [""]:
+                continue
+            lines += 1
+            if is_tombstone(fields):
+                records.pop(fields[0], None)
+            else:
+                records[fields[0]] = parse(fields, line_offset, len(raw_line))
+    instrumentation.record_io(lines, offset)
+    state = _state(path)
+    state.records, state.live = lines, len(records)
+    return [record for record in records.values() if record is not None]
+
+class Tail(NamedTuple):
+    # Завершенные строки после начального смещения: поля, смещение и длина строки
+    records: List[Tuple[List[str], int, int]]
+    # Смещение конца последней завершенной строки
+    end: int
+    # Последние байты перед end (см. read_tail)
+    marker: bytes
+    stat: os.stat_result
+
+# Сколько байт перед позицией чтения сверяется, чтобы отличить дописывание от перезаписи файла
+_MARKER_SIZE = 64
+
+def read_marker(path: str, end: int) -> bytes:
+    """
+    Возвращает последние байты файла перед смещением end (метка для read_tail).
+    """
+    with open(path, "rb") as file:
+        return _read_marker(file, end)
+
+def _read_marker(file, end: int) -> bytes:
+    start = max(end - _MARKER_SIZE, 0)
+    file.seek(start)
+    return file.read(end - start)
+
+def read_tail(path: str, start: int, marker: bytes) -> Optional[Tail]:
+    """
+    Читает строки, дописанные в журнал после смещения start (в том числе надгробия).
+    marker - последние байты перед start при предыдущем чтении: если они изменились,
+    файл был переписан, а не дописан, и возвращается None (нужно прочитать файл целиком).
+    """
+    records = []
+    with open(path, "rb") as file:
+        stat = os.fstat(file.fileno())
+        if stat.st_size < start or _read_marker(file, start) != marker:
+            return None
+        end = start
+        for raw_line in file:
+            if not raw_line.endswith(b"\n"):
+                break
+            line_offset = end
+            end += len(raw_line)
+            fields = raw_line.decode("utf-8").strip().split("|")
+            if fields != [""]:
+                records.append((fields, line_offset, len(raw_line)))
+        instrumentation.record_io(len(records), end - start)
+        return Tail(records, end, _read_marker(file, end), stat)
+
+def read_records(path: str) -> List[List[str]]:
+    """
+    Читает журнал и возвращает живые записи (списки полей) в порядке их первого появления.
+    Для каждой записи возвращается ее последняя версия, удаленные записи пропускаются.
+    """
+    return scan_records(path, lambda fields, offset, length: fields)
+
+def iter_records(path: str) -> Iterator[List[str]]:
+    """
+    Живые записи журнала (списки полей) в том же порядке, что и read_records, но потоком.
+    Первый проход запоминает для каждой записи только смещение и длину ее последней строки,
+    второй читает эти строки по одной, поэтому поля всех записей в памяти не хранятся.
+    Оба прохода читают один открытый файл: замена файла компактизацией между ними не мешает.
+    """
+    positions: Dict[str, Tuple[int, int]] = {}
+    lines = 0
+    offset = 0
+    with open(path, "rb") as file:
+        for raw_line in file:
+            if not raw_line.endswith(b"\n"):
+                break
+            line_offset = offset
+            offset += len(raw_line)
+            fields = raw_line.decode("utf-8").strip().split("|")
+            if fields == [""]:
+                continue
+            lines += 1
+            if is_tombstone(fields):
+                positions.pop(fields[0], None)
+            else:
+                # Новая версия записи остается на месте ее первого появления (порядок ключей словаря)
+                positions[fields[0]] = (line_offset, len(raw_line))
+        instrumentation.record_io(lines, offset)
+        for line_offset, length in positions.values():
+            file.seek(line_offset)
+            yield file.read(length).decode("utf-8").strip().split("|")
+
+def record_counts(path: str) -> Tuple[int, int]:
+    """
+    Число строк и живых записей журнала, по которым решается, пора ли компактизация.
+    """
+    state = _state(path)
+    with state.lock:
+        return state.records, state.live
+
+def set_record_counts(path: str, records: int, live: int):
+    """
+    Задает счетчики журнала, прочитанного не через scan_records (например, по сохраненному индексу).
+    """
+    state = _state(path)
+    with state.lock:
+        state.records, state.live = records, live
+
+def append_record(path: str, line: str, replaces: bool = False) -> Appended:
+    """
+    Дописывает запись в конец журнала (группой с записями других потоков)
+    и возвращает смещение ее строки в байтах вместе с состоянием файла до и после записи.
+    replaces=True означает, что запись заменяет существующую с тем же ID.
+    """
+    appended = write_coordinator.append(path, line.encode("utf-8"))
+    state = _state(path)
+    with state.lock:
+        state.records += 1
+        if not replaces:
+            state.live += 1
+    _maybe_compact(path, state)
+    return appended
+
+def append_tombstone(path: str, record_id: str) -> Appended:
+    """
+    Дописывает строку-надгробие, помечающую запись как удаленную.
+    """
+    appended = write_coordinator.append(path, f"{record_id}|{TOMBSTONE}\n".encode("utf-8"))
+    state = _state(path)
+    with state.lock:
+        state.records += 1
+        state.live = max(state.live - 1, 0)
+    _maybe_compact(path, state)
+    return appended
+
+def _maybe_compact(path: str, state: _LogState):
+    garbage = state.records - state.live
+    if state.compacting or garbage < LOG_COMPACTION_MIN_GARBAGE or garbage < LOG_COMPACTION_RATIO * state.records:
+        return
+    threading.Thread(target=compact, args=(path,), name=f"compact:{path}", daemon=True).start()
+
+def compact(path: str):
+    """
+    Переписывает журнал, оставляя только живые записи.
+
+    Основная часть файла переписывается без блокировки, поэтому запись в журнал
+    во время компактизации не ждет. Под блокировкой файла во временный файл переносятся
+    только строки, дописанные за это время (в том числе другими процессами), после чего
+    он сбрасывается на диск (fsync) и атомарно заменяет исходный файл (rename).
+    """
+    state = _state(path)
+    with state.lock:
+        if state.compacting or not os.path.exists(path):
+            return
+        state.compacting = True
+        snapshot = os.stat(path)
+    directory, name = os.path.split(os.path.abspath(path))
+    descriptor, temp_path = tempfile.mkstemp(prefix=f"{name}.compact.", dir=directory)
+    try:
+        with os.fdopen(descriptor, "wb") as temp_file:
+            records = {}
+            remaining = snapshot.st_size
+            with open(path, "rb") as file:
+                for raw_line in file:
+                    if remaining <= 0:
+                        break
+                    remaining -= len(raw_line)
+                    line = raw_line.decode("utf-8").strip()
+                    if not line:
+                        continue
+                    fields = line.split("|")
+                    if is_tombstone(fields):
+                        records.pop(fields[0], None)
+                    else:
+                        records[fields[0]] = line
+            temp_file.writelines(f"{line}\n".encode("utf-8") for line in records.values())
+            with _replace_guard(), state.lock, write_coordinator.file_lock(path):
+                before = os.stat(path)
+                if before.st_ino != snapshot.st_ino or before.st_size < snapshot.st_size:
+                    # Файл уже заменен (например, компактизацией в другом процессе)
+                    return
+                # Строки, дописанные во время компактизации, переносим как есть
+                with open(path, "rb") as file:
+                    file.seek(snapshot.st_size)
+                    tail = file.read()
+                temp_file.write(tail)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+                os.replace(temp_path, path)
+                write_coordinator.fsync_directory(path)
+                after = os.stat(path)
+                state.records = len(records) + tail.count(b"\n")
+                state.live = min(state.live, state.records)
+                for listener in state.listeners:
+                    listener(before, after)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        state.compacting = False
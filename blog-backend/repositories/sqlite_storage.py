@@ -0,0 +1,542 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from dotenv import load_dotenv
+from models.post import Post, PostAccessRequest, PostAccess, Comment
+from models.user import UserInDB, Subscription, RefreshToken
+from repositories.pagination import PostKey
+from repositories.post_meta import PostMeta, tag_ids
+from repositories.storage import Storage
+from repositories import instrumentation
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Путь к файлу базы данных SQLite
+DATABASE_SQLITE_FILE = os.getenv("DATABASE_SQLITE_FILE", "database/blog.db")
+
+# Максимальное число параметров в одном запросе с IN (...)
+_IN_CHUNK_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    is_public INTEGER NOT NULL,
+    author TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS posts_author ON posts (author, seq);
+CREATE INDEX IF NOT EXISTS posts_is_public ON posts (is_public, seq);
+CREATE INDEX IF NOT EXISTS posts_created ON posts (created_at, id);
+CREATE INDEX IF NOT EXISTS posts_author_created ON posts (author, created_at, id);
+CREATE INDEX IF NOT EXISTS posts_is_public_created ON posts (is_public, created_at, id);
+
+CREATE TABLE IF NOT EXISTS access_requests (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    post_id TEXT NOT NULL,
+    requester_username TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS access_requests_post ON access_requests (post_id);
+CREATE INDEX IF NOT EXISTS access_requests_requester ON access_requests (requester_username);
+
+CREATE TABLE IF NOT EXISTS access (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    post_id TEXT NOT NULL,
+    viewer_username TEXT NOT NULL,
+    granted_by TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS access_post_viewer ON access (post_id, viewer_username);
+CREATE INDEX IF NOT EXISTS access_viewer ON access (viewer_username);
+
+CREATE TABLE IF NOT EXISTS comments (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    post_id TEXT NOT NULL,
+    author_username TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS comments_post_created ON comments (post_id, created_at);
+
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    hashed_password TEXT NOT NULL,
+    refresh_token TEXT
+);
+
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    token_hash TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    expires_at TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS refresh_tokens_username ON refresh_tokens (username);
+CREATE INDEX IF NOT EXISTS refresh_tokens_expires ON refresh_tokens (expires_at);
+
+CREATE TABLE IF NOT EXISTS subscriptions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    follower_username TEXT NOT NULL,
+    following_username TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS subscriptions_follower_following ON subscriptions (follower_username, following_username);
+CREATE INDEX IF NOT EXISTS subscriptions_following ON subscriptions (following_username);
+"""
+
+_POST_COLUMNS = "id, title, content, is_public, author, tags, created_at"
+_META_COLUMNS = "id, author, is_public, tags, created_at"
+_REQUEST_COLUMNS = "id, post_id, requester_username, status, created_at"
+_ACCESS_COLUMNS = "id, post_id, viewer_username, granted_by, created_at"
+_COMMENT_COLUMNS = "id, post_id, author_username, content, created_at"
+
+def _post(row) -> Post:
+    return Post(
+        id=row[0],
+        title=row[1],
+        content=row[2],
+        is_public=bool(row[3]),
+        tags=row[5].split(",") if row[5] else [],
+        author=row[4],
+        created_at=row[6]
+    )
+
+def _post_meta(row) -> PostMeta:
+    return PostMeta(row[0], row[1], bool(row[2]), tag_ids(row[3].split(",") if row[3] else []), row[4])
+
+def _access_request(row) -> PostAccessRequest:
+    return PostAccessRequest(id=row[0], post_id=row[1], requester_username=row[2], status=row[3], created_at=row[4])
+
+def _access(row) -> PostAccess:
+    return PostAccess(id=row[0], post_id=row[1], viewer_username=row[2], granted_by=row[3], created_at=row[4])
+
+def _comment(row) -> Comment:
+    return Comment(id=row[0], post_id=row[1], author_username=row[2], content=row[3], created_at=row[4])
+
+def _refresh_token(row) -> RefreshToken:
+    return RefreshToken(token_hash=row[0], username=row[1], expires_at=row[2], created_at=row[3])
+
+def _chunks(values: List[str]):
+    for start in range(0, len(values), _IN_CHUNK_SIZE):
+        yield values[start:start + _IN_CHUNK_SIZE]
+
+class SQLiteStorage(Storage):
+    """
+    Хранилище в базе SQLite в режиме WAL.
+
+    WAL позволяет читателям работать параллельно с записью, а индексы таблиц
+    заменяют полные просмотры файлов. Каждый поток использует собственное соединение.
+    Даты хранятся строками в том же формате, что и в текстовых файлах
+    ("YYYY-MM-DD HH:MM:SS[.ffffff]"), поэтому сравниваются лексикографически.
+    """
+
+    def __init__(self, path: str = DATABASE_SQLITE_FILE):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as connection:
+            connection.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _query(self, sql: str, params=()) -> list:
+        rows = self._connection().execute(sql, params).fetchall()
+        # Байты, прочитанные SQLite, не видны через sqlite3: учитываются только строки результата
+        instrumentation.record_io(len(rows))
+        return rows
+
+    def _execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        connection = self._connection()
+        if getattr(self._local, "batch", False):
+            return connection.execute(sql, params)
+        with connection:
+            return connection.execute(sql, params)
+
+    def _iterate(self, sql: str) -> Iterator[tuple]:
+        # Отдельный курсор читает строки порциями, не загружая таблицу целиком
+        cursor = self._connection().execute(sql)
+        try:
+            yield from cursor
+        finally:
+            cursor.close()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Выполняет все записи внутри блока одной транзакцией (для массового импорта).
+        """
+        connection = self._connection()
+        self._local.batch = True
+        try:
+            with connection:
+                yield
+        finally:
+            self._local.batch = False
+
+    def posts_version(self):
+        return self.data_version()
+
+    def data_version(self):
+        # Запись в режиме WAL меняет файл журнала, контрольная точка - файл базы
+        stamps = []
+        for path in [self.path, f"{self.path}-wal"]:
+            try:
+                stat = os.stat(path)
+                stamps.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def is_empty(self) -> bool:
+        tables = ["posts", "access_requests", "access", "comments", "users", "subscriptions", "refresh_tokens"]
+        return not any(self._query(f"SELECT 1 FROM {table} LIMIT 1") for table in tables)
+
+    def clear(self):
+        with self.transaction():
+            for table in ["posts", "access_requests", "access", "comments", "users", "subscriptions", "refresh_tokens"]:
+                self._execute(f"DELETE FROM {table}")
+
+    # Посты
+    def get_post(self, post_id: str) -> Optional[Post]:
+        rows = self._query(f"SELECT {_POST_COLUMNS} FROM posts WHERE id = ?", (post_id,))
+        return _post(rows[0]) if rows else None
+
+    def list_posts(self) -> List[Post]:
+        return [_post(row) for row in self._query(f"SELECT {_POST_COLUMNS} FROM posts ORDER BY seq")]
+
+    def list_posts_by_author(self, author: str) -> List[Post]:
+        rows = self._query(f"SELECT {_POST_COLUMNS} FROM posts WHERE author = ? ORDER BY seq", (author,))
+        return [_post(row) for row in rows]
+
+    def list_posts_by_authors(self, authors: Iterable[str]) -> List[Post]:
+        rows = []
+        for chunk in _chunks(list(set(authors))):
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(self._query(
+                f"SELECT seq, {_POST_COLUMNS} FROM posts WHERE author IN ({placeholders})", chunk
+            ))
+        rows.sort()
+        return [_post(row[1:]) for row in rows]
+
+    def list_public_posts(self) -> List[Post]:
+        rows = self._query(f"SELECT {_POST_COLUMNS} FROM posts WHERE is_public = 1 ORDER BY seq")
+        return [_post(row) for row in rows]
+
+    def list_private_posts(self) -> List[Post]:
+        rows = self._query(f"SELECT {_POST_COLUMNS} FROM posts WHERE is_public = 0 ORDER BY seq")
+        return [_post(row) for row in rows]
+
+    def get_post_ids_by_author(self, author: str) -> Set[str]:
+        return {row[0] for row in self._query("SELECT id FROM posts WHERE author = ?", (author,))}
+
+    def _page_rows(
+        self,
+        columns: str,
+        after: Optional[PostKey],
+        limit: Optional[int],
+        authors: Optional[Iterable[str]],
+        is_public: Optional[bool],
+    ) -> list:
+        """
+        Строки постов с указанными столбцами в порядке (created_at, id) после ключа after.
+        """
+        conditions, params = [], []
+        if after is not None:
+            conditions.append("(created_at, id) > (?, ?)")
+            params.extend(after)
+        if is_public is not None:
+            conditions.append("is_public = ?")
+            params.append(int(is_public))
+        select = f"SELECT created_at, id, {columns} FROM posts"
+        suffix = " ORDER BY created_at, id" + (f" LIMIT {int(limit)}" if limit is not None else "")
+        if authors is None:
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+            return [row[2:] for row in self._query(f"{select}{where}{suffix}", params)]
+        # Каждая порция авторов уже ограничена лимитом, остается слить результаты и обрезать
+        rows = []
+        for chunk in _chunks(list(set(authors))):
+            where = " AND ".join(conditions + [f"author IN ({','.join('?' * len(chunk))})"])
+            rows.extend(self._query(f"{select} WHERE {where}{suffix}", params + chunk))
+        rows.sort(key=lambda row: row[:2])
+        return [row[2:] for row in rows[:limit]]
+
+    def list_posts_page(
+        self,
+        after: Optional[PostKey],
+        limit: Optional[int],
+        authors: Optional[Iterable[str]] = None,
+        is_public: Optional[bool] = None,
+    ) -> List[Post]:
+        return [_post(row) for row in self._page_rows(_POST_COLUMNS, after, limit, authors, is_public)]
+
+    def get_post_meta(self, post_id: str) -> Optional[PostMeta]:
+        rows = self._query(f"SELECT {_META_COLUMNS} FROM posts WHERE id = ?", (post_id,))
+        return _post_meta(rows[0]) if rows else None
+
+    def list_post_meta(
+        self, authors: Optional[Iterable[str]] = None, is_public: Optional[bool] = None
+    ) -> List[PostMeta]:
+        conditions, params = [], []
+        if is_public is not None:
+            conditions.append("is_public = ?")
+            params.append(int(is_public))
+        if authors is None:
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+            rows = self._query(f"SELECT {_META_COLUMNS} FROM posts{where} ORDER BY seq", params)
+            return [_post_meta(row) for row in rows]
+        rows = []
+        for chunk in _chunks(list(set(authors))):
+            where = " AND ".join(conditions + [f"author IN ({','.join('?' * len(chunk))})"])
+            rows.extend(self._query(f"SELECT seq, {_META_COLUMNS} FROM posts WHERE {where}", params + chunk))
+        rows.sort()
+        return [_post_meta(row[1:]) for row in rows]
+
+    def list_post_meta_page(
+        self,
+        after: Optional[PostKey],
+        limit: Optional[int],
+        authors: Optional[Iterable[str]] = None,
+        is_public: Optional[bool] = None,
+    ) -> List[PostMeta]:
+        return [_post_meta(row) for row in self._page_rows(_META_COLUMNS, after, limit, authors, is_public)]
+
+    def get_posts(self, post_ids: Iterable[str]) -> List[Post]:
+        post_ids = list(post_ids)
+        posts = {}
+        for chunk in _chunks(list(set(post_ids))):
+            placeholders = ",".join("?" * len(chunk))
+            for row in self._query(f"SELECT {_POST_COLUMNS} FROM posts WHERE id IN ({placeholders})", chunk):
+                posts[row[0]] = _post(row)
+        return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+    def insert_post(self, post: Post):
+        self._execute(
+            f"INSERT INTO posts ({_POST_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (post.id, post.title, post.content, int(post.is_public), post.author, ",".join(post.tags), str(post.created_at))
+        )
+
+    def update_post(self, post: Post):
+        self._execute(
+            "UPDATE posts SET title = ?, content = ?, is_public = ?, author = ?, tags = ?, created_at = ? WHERE id = ?",
+            (post.title, post.content, int(post.is_public), post.author, ",".join(post.tags), str(post.created_at), post.id)
+        )
+
+    def delete_post(self, post_id: str):
+        self._execute("DELETE FROM posts WHERE id = ?", (post_id,))
+
+    # Запросы на доступ
+    def insert_access_request(self, request: PostAccessRequest):
+        self._execute(
+            f"INSERT INTO access_requests ({_REQUEST_COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+            (request.id, request.post_id, request.requester_username, request.status, str(request.created_at))
+        )
+
+    def get_access_request(self, request_id: str) -> Optional[PostAccessRequest]:
+        rows = self._query(f"SELECT {_REQUEST_COLUMNS} FROM access_requests WHERE id = ?", (request_id,))
+        return _access_request(rows[0]) if rows else None
+
+    def update_access_request(self, request: PostAccessRequest):
+        self._execute(
+            "UPDATE access_requests SET post_id = ?, requester_username = ?, status = ?, created_at = ? WHERE id = ?",
+            (request.post_id, request.requester_username, request.status, str(request.created_at), request.id)
+        )
+
+    def list_access_requests_by_post(self, post_id: str) -> List[PostAccessRequest]:
+        rows = self._query(
+            f"SELECT {_REQUEST_COLUMNS} FROM access_requests WHERE post_id = ? ORDER BY seq", (post_id,)
+        )
+        return [_access_request(row) for row in rows]
+
+    def list_access_requests_by_requester(self, requester_username: str) -> List[PostAccessRequest]:
+        rows = self._query(
+            f"SELECT {_REQUEST_COLUMNS} FROM access_requests WHERE requester_username = ? ORDER BY seq",
+            (requester_username,)
+        )
+        return [_access_request(row) for row in rows]
+
+    def list_access_requests_for_author(self, author_username: str) -> List[PostAccessRequest]:
+        rows = self._query(
+            "SELECT r.id, r.post_id, r.requester_username, r.status, r.created_at "
+            "FROM access_requests r JOIN posts p ON p.id = r.post_id "
+            "WHERE p.author = ? ORDER BY r.seq",
+            (author_username,)
+        )
+        return [_access_request(row) for row in rows]
+
+    # Разрешения на доступ
+    def insert_access(self, access: PostAccess):
+        self._execute(
+            f"INSERT INTO access ({_ACCESS_COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+            (access.id, access.post_id, access.viewer_username, access.granted_by, str(access.created_at))
+        )
+
+    def list_access_by_post(self, post_id: str) -> List[PostAccess]:
+        rows = self._query(f"SELECT {_ACCESS_COLUMNS} FROM access WHERE post_id = ? ORDER BY seq", (post_id,))
+        return [_access(row) for row in rows]
+
+    def get_granted_post_ids(self, viewer_username: str) -> Set[str]:
+        return {row[0] for row in self._query("SELECT post_id FROM access WHERE viewer_username = ?", (viewer_username,))}
+
+    def delete_access(self, access_id: str):
+        self._execute("DELETE FROM access WHERE id = ?", (access_id,))
+
+    # Комментарии
+    def insert_comment(self, comment: Comment):
+        self._execute(
+            f"INSERT INTO comments ({_COMMENT_COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+            (comment.id, comment.post_id, comment.author_username, comment.content, str(comment.created_at))
+        )
+
+    def list_comments_by_post(self, post_id: str) -> List[Comment]:
+        rows = self._query(f"SELECT {_COMMENT_COLUMNS} FROM comments WHERE post_id = ? ORDER BY seq", (post_id,))
+        return [_comment(row) for row in rows]
+
+    def get_latest_comments(self, post_ids: Iterable[str]) -> Dict[str, Comment]:
+        latest = {}
+        for chunk in _chunks(list(set(post_ids))):
+            placeholders = ",".join("?" * len(chunk))
+            # Для каждого поста берем комментарий с максимальной датой (при равенстве - более ранний)
+            rows = self._query(
+                f"SELECT {_COMMENT_COLUMNS} FROM comments c WHERE c.post_id IN ({placeholders}) AND c.seq = ("
+                "SELECT seq FROM comments WHERE post_id = c.post_id ORDER BY created_at DESC, seq LIMIT 1)",
+                chunk
+            )
+            latest.update((row[1], _comment(row)) for row in rows)
+        return latest
+
+    # Пользователи
+    def get_user(self, username: str) -> Optional[UserInDB]:
+        rows = self._query(
+            "SELECT username, email, hashed_password, refresh_token FROM users WHERE username = ?", (username,)
+        )
+        if not rows:
+            return None
+        username, email, hashed_password, refresh_token = rows[0]
+        return UserInDB(username=username, email=email, hashed_password=hashed_password, refresh_token=refresh_token or None)
+
+    def save_user(self, user: UserInDB):
+        self._execute(
+            "INSERT INTO users (username, email, hashed_password, refresh_token) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (username) DO UPDATE SET email = excluded.email, "
+            "hashed_password = excluded.hashed_password, refresh_token = excluded.refresh_token",
+            (user.username, user.email, user.hashed_password, user.refresh_token or "")
+        )
+
+    def insert_user(self, user: UserInDB) -> bool:
+        # Уникальность имени обеспечивает первичный ключ таблицы
+        cursor = self._execute(
+            "INSERT INTO users (username, email, hashed_password, refresh_token) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (username) DO NOTHING",
+            (user.username, user.email, user.hashed_password, user.refresh_token or "")
+        )
+        return cursor.rowcount == 1
+
+    # Refresh token
+    def insert_refresh_token(self, token: RefreshToken):
+        self._execute(
+            "INSERT OR REPLACE INTO refresh_tokens (token_hash, username, expires_at, created_at) VALUES (?, ?, ?, ?)",
+            (token.token_hash, token.username, str(token.expires_at), str(token.created_at))
+        )
+
+    def get_refresh_token(self, token_hash: str) -> Optional[RefreshToken]:
+        rows = self._query(
+            "SELECT token_hash, username, expires_at, created_at FROM refresh_tokens WHERE token_hash = ?", (token_hash,)
+        )
+        return _refresh_token(rows[0]) if rows else None
+
+    def delete_refresh_tokens(self, token_hashes: Iterable[str]):
+        for chunk in _chunks(list(token_hashes)):
+            placeholders = ",".join("?" * len(chunk))
+            self._execute(f"DELETE FROM refresh_tokens WHERE token_hash IN ({placeholders})", chunk)
+
+    def list_refresh_token_hashes(self, username: str) -> List[str]:
+        return [row[0] for row in self._query("SELECT token_hash FROM refresh_tokens WHERE username = ?", (username,))]
+
+    def list_expired_refresh_token_hashes(self, now: datetime) -> List[str]:
+        return [row[0] for row in self._query("SELECT token_hash FROM refresh_tokens WHERE expires_at <= ?", (str(now),))]
+
+    # Подписки
+    def insert_subscription(self, subscription: Subscription):
+        self._execute(
+            "INSERT INTO subscriptions (id, follower_username, following_username, created_at) VALUES (?, ?, ?, ?)",
+            (subscription.id, subscription.follower_username, subscription.following_username, str(subscription.created_at))
+        )
+
+    def list_subscriptions_by_follower(self, follower_username: str) -> List[Subscription]:
+        rows = self._query(
+            "SELECT id, follower_username, following_username, created_at FROM subscriptions "
+            "WHERE follower_username = ? ORDER BY seq",
+            (follower_username,)
+        )
+        return [
+            Subscription(id=row[0], follower_username=row[1], following_username=row[2], created_at=row[3])
+            for row in rows
+        ]
+
+    def is_subscribed(self, follower_username: str, following_username: str) -> bool:
+        rows = self._query(
+            "SELECT 1 FROM subscriptions WHERE follower_username = ? AND following_username = ? LIMIT 1",
+            (follower_username, following_username)
+        )
+        return bool(rows)
+
+    def get_followed_usernames(self, follower_username: str) -> Set[str]:
+        rows = self._query(
+            "SELECT following_username FROM subscriptions WHERE follower_username = ?", (follower_username,)
+        )
+        return {row[0] for row in rows}
+
+    def get_follower_usernames(self, following_username: str) -> Set[str]:
+        rows = self._query(
+            "SELECT follower_username FROM subscriptions WHERE following_username = ?", (following_username,)
+        )
+        return {row[0] for row in rows}
+
+    # Полный просмотр данных (миграция, экспорт)
+    def iter_access_requests(self) -> Iterator[PostAccessRequest]:
+        for row in self._iterate(f"SELECT {_REQUEST_COLUMNS} FROM access_requests ORDER BY seq"):
+            yield _access_request(row)
+
+    def iter_access(self) -> Iterator[PostAccess]:
+        for row in self._iterate(f"SELECT {_ACCESS_COLUMNS} FROM access ORDER BY seq"):
+            yield _access(row)
+
+    def iter_comments(self) -> Iterator[Comment]:
+        for row in self._iterate(f"SELECT {_COMMENT_COLUMNS} FROM comments ORDER BY seq"):
+            yield _comment(row)
+
+    def iter_users(self) -> Iterator[UserInDB]:
+        for row in self._iterate("SELECT username, email, hashed_password, refresh_token FROM users ORDER BY rowid"):
+            yield UserInDB(username=row[0], email=row[1], hashed_password=row[2], refresh_token=row[3] or None)
+
+    def iter_subscriptions(self) -> Iterator[Subscription]:
+        for row in self._iterate(
+            "SELECT id, follower_username, following_username, created_at FROM subscriptions ORDER BY seq"
+        ):
+            yield Subscription(id=row[0], follower_username=row[1], following_username=row[2], created_at=row[3])
+
+    def iter_refresh_tokens(self) -> Iterator[RefreshToken]:
+        for row in self._iterate("SELECT token_hash, username, expires_at, created_at FROM refresh_tokens ORDER BY rowid"):
+            yield _refresh_token(row)
@@ -0,0 +1,256 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from dotenv import load_dotenv
+from models.post import Post, PostAccessRequest, PostAccess, Comment
+from models.user import UserInDB, Subscription, RefreshToken
+from repositories.pagination import PostKey
+from repositories.post_meta import PostMeta
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Set
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Движок хранения данных: "text" (файлы database/*.txt) или "sqlite"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "text")
+
+class Storage(ABC):
+    """
+    Интерфейс хранилища данных блога.
+
+    Репозитории (post_repository, user_repository) содержат правила доступа и
+    обращаются к данным только через этот интерфейс. Методы хранилища - простые
+    операции чтения и записи, каждый движок реализует их своими структурами
+    (индексы в памяти для текстовых файлов, индексы таблиц для SQLite).
+    Все списки возвращаются в порядке добавления записей.
+    """
+
+    def load(self):
+        """
+        Подготавливает хранилище к работе (например, загружает индексы в память).
+        """
+
+    @abstractmethod
+    def posts_version(self) -> Hashable:
+        """
+        Метка состояния постов и комментариев: меняется при любом их изменении,
+        в том числе другим процессом. Используется для проверки кэшей, построенных по этим данным.
+        """
+
+    @abstractmethod
+    def data_version(self) -> Hashable:
+        """
+        Метка состояния всех данных блога, меняется при любой записи (в том числе другим процессом).
+        """
+
+    # Посты
+    @abstractmethod
+    def get_post(self, post_id: str) -> Optional[Post]: ...
+
+    @abstractmethod
+    def list_posts(self) -> List[Post]: ...
+
+    @abstractmethod
+    def list_posts_by_author(self, author: str) -> List[Post]: ...
+
+    @abstractmethod
+    def list_posts_by_authors(self, authors: Iterable[str]) -> List[Post]: ...
+
+    @abstractmethod
+    def list_public_posts(self) -> List[Post]: ...
+
+    @abstractmethod
+    def list_private_posts(self) -> List[Post]: ...
+
+    @abstractmethod
+    def get_post_ids_by_author(self, author: str) -> Set[str]: ...
+
+    @abstractmethod
+    def list_posts_page(
+        self,
+        after: Optional[PostKey],
+        limit: Optional[int],
+        authors: Optional[Iterable[str]] = None,
+        is_public: Optional[bool] = None,
+    ) -> List[Post]:
+        """
+        Страница постов в порядке (created_at, id), начиная со следующего после ключа after.
+        Фильтры: authors - посты указанных авторов, is_public - по видимости.
+        """
+
+    # Метаданные постов (без заголовка и текста) для фильтрации и проверок доступа
+    @abstractmethod
+    def get_post_meta(self, post_id: str) -> Optional[PostMeta]: ...
+
+    @abstractmethod
+    def list_post_meta(
+        self, authors: Optional[Iterable[str]] = None, is_public: Optional[bool] = None
+    ) -> List[PostMeta]: ...
+
+    @abstractmethod
+    def list_post_meta_page(
+        self,
+        after: Optional[PostKey],
+        limit: Optional[int],
+        authors: Optional[Iterable[str]] = None,
+        is_public: Optional[bool] = None,
+    ) -> List[PostMeta]:
+        """
+        То же, что list_posts_page, но без чтения заголовков и текстов.
+        """
+
+    @abstractmethod
+    def get_posts(self, post_ids: Iterable[str]) -> List[Post]:
+        """
+        Полные посты по списку ID в том же порядке, отсутствующие посты пропускаются.
+        """
+
+    @abstractmethod
+    def insert_post(self, post: Post): ...
+
+    @abstractmethod
+    def update_post(self, post: Post): ...
+
+    @abstractmethod
+    def delete_post(self, post_id: str): ...
+
+    # Запросы на доступ
+    @abstractmethod
+    def insert_access_request(self, request: PostAccessRequest): ...
+
+    @abstractmethod
+    def get_access_request(self, request_id: str) -> Optional[PostAccessRequest]: ...
+
+    @abstractmethod
+    def update_access_request(self, request: PostAccessRequest): ...
+
+    @abstractmethod
+    def list_access_requests_by_post(self, post_id: str) -> List[PostAccessRequest]: ...
+
+    @abstractmethod
+    def list_access_requests_by_requester(self, requester_username: str) -> List[PostAccessRequest]: ...
+
+    @abstractmethod
+    def list_access_requests_for_author(self, author_username: str) -> List[PostAccessRequest]: ...
+
+    # Разрешения на доступ
+    @abstractmethod
+    def insert_access(self, access: PostAccess): ...
+
+    @abstractmethod
+    def list_access_by_post(self, post_id: str) -> List[PostAccess]: ...
+
+    @abstractmethod
+    def get_granted_post_ids(self, viewer_username: str) -> Set[str]: ...
+
+    @abstractmethod
+    def delete_access(self, access_id: str): ...
+
+    # Комментарии
+    @abstractmethod
+    def insert_comment(self, comment: Comment): ...
+
+    @abstractmethod
+    def list_comments_by_post(self, post_id: str) -> List[Comment]: ...
+
+    @abstractmethod
+    def get_latest_comments(self, post_ids: Iterable[str]) -> Dict[str, Comment]: ...
+
+    # Пользователи
+    @abstractmethod
+    def get_user(self, username: str) -> Optional[UserInDB]: ...
+
+    @abstractmethod
+    def save_user(self, user: UserInDB): ...
+
+    @abstractmethod
+    def insert_user(self, user: UserInDB) -> bool:
+        """
+        Добавляет пользователя, если пользователя с таким именем еще нет.
+        Проверка и запись атомарны. Возвращает False, если имя уже занято.
+        """
+
+    def save_users(self, users: Iterable[UserInDB]):
+        """
+        Сохраняет набор пользователей (массовая загрузка).
+        """
+        for user in users:
+            self.save_user(user)
+
+    # Refresh token (хранятся отдельно от пользователей, по хешу токена)
+    @abstractmethod
+    def insert_refresh_token(self, token: RefreshToken): ...
+
+    @abstractmethod
+    def get_refresh_token(self, token_hash: str) -> Optional[RefreshToken]: ...
+
+    @abstractmethod
+    def delete_refresh_tokens(self, token_hashes: Iterable[str]): ...
+
+    @abstractmethod
+    def list_refresh_token_hashes(self, username: str) -> List[str]: ...
+
+    @abstractmethod
+    def list_expired_refresh_token_hashes(self, now: datetime) -> List[str]: ...
+
+    # Подписки
+    @abstractmethod
+    def insert_subscription(self, subscription: Subscription): ...
+
+    @abstractmethod
+    def list_subscriptions_by_follower(self, follower_username: str) -> List[Subscription]: ...
+
+    @abstractmethod
+    def is_subscribed(self, follower_username: str, following_username: str) -> bool: ...
+
+    @abstractmethod
+    def get_followed_usernames(self, follower_username: str) -> Set[str]: ...
+
+    @abstractmethod
+    def get_follower_usernames(self, following_username: str) -> Set[str]: ...
+
+    # Полный просмотр данных (миграция, экспорт)
+    @abstractmethod
+    def iter_access_requests(self) -> Iterator[PostAccessRequest]: ...
+
+    @abstractmethod
+    def iter_access(self) -> Iterator[PostAccess]: ...
+
+    @abstractmethod
+    def iter_comments(self) -> Iterator[Comment]: ...
+
+    @abstractmethod
+    def iter_users(self) -> Iterator[UserInDB]: ...
+
+    @abstractmethod
+    def iter_subscriptions(self) -> Iterator[Subscription]: ...
+
+    @abstractmethod
+    def iter_refresh_tokens(self) -> Iterator[RefreshToken]: ...
+
+_storage: Optional[Storage] = None
+_storage_lock = threading.Lock()
+
+def create_storage(backend: str = STORAGE_BACKEND) -> Storage:
+    """
+    Создает хранилище выбранного движка с путями из переменных окружения.
+    """
+    if backend == "text":
+        from repositories.text_storage import TextStorage
+        return TextStorage()
+    if backend == "sqlite":
+        from repositories.sqlite_storage import SQLiteStorage
+        return SQLiteStorage()
+    raise ValueError(f"Неизвестный движок хранения STORAGE_BACKEND={backend}")
+
+def get_storage() -> Storage:
+    """
+    Возвращает хранилище процесса (создается при первом обращении).
+    """
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+    return _storage
@@ -0,0 +1,445 @@
+import os
+from dotenv import load_dotenv
+from models.post import Post, PostAccessRequest, PostAccess, Comment
+from models.user import UserInDB, Subscription, RefreshToken
+from repositories.storage import Storage
+from repositories.post_store import PostStore
+from repositories.comment_index import CommentIndex, parse_comment_fields
+from repositories.token_store import RefreshTokenStore, parse_refresh_token
+from repositories.pagination import PostKey
+from repositories.post_meta import PostMeta
+from repositories import instrumentation, record_log, write_coordinator
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Получаем пути к файлам базы данных
+DATABASE_USERS_FILE = os.getenv("DATABASE_USERS_FILE")
+DATABASE_POSTS_FILE = os.getenv("DATABASE_POSTS_FILE", "database/posts.txt")
+# По умолчанию индекс постов лежит рядом с файлом постов: posts.txt.idx
+DATABASE_POSTS_INDEX_FILE = os.getenv("DATABASE_POSTS_INDEX_FILE")
+DATABASE_ACCESS_REQUESTS_FILE = os.getenv("DATABASE_ACCESS_REQUESTS_FILE", "database/access_requests.txt")
+DATABASE_ACCESS_FILE = os.getenv("DATABASE_ACCESS_FILE", "database/access.txt")
+DATABASE_COMMENTS_FILE = os.getenv("DATABASE_COMMENTS_FILE", "database/comments.txt")
+# По умолчанию индекс комментариев лежит рядом с файлом комментариев: comments.txt.idx
+DATABASE_COMMENTS_INDEX_FILE = os.getenv("DATABASE_COMMENTS_INDEX_FILE")
+DATABASE_SUBSCRIPTIONS_FILE = os.getenv("DATABASE_SUBSCRIPTIONS_FILE", "database/subscriptions.txt")
+DATABASE_REFRESH_TOKENS_FILE = os.getenv("DATABASE_REFRESH_TOKENS_FILE", "database/refresh_tokens.txt")
+
+def _file_stamp(path: str):
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+def _scan_lines(path: str, encoding: Optional[str] = None) -> Iterator[str]:
+    """
+    Построчное чтение файла с учетом прочитанных строк и байт (repositories.instrumentation).
+    """
+    rows, size = 0, 0
+    try:
+        with open(path, "r", encoding=encoding) as file:
+            for line in file:
+                rows += 1
+                size += len(line)
+                yield line
+    finally:
+        instrumentation.record_io(rows, size)
+
+def _access_request(request_data: List[str]) -> PostAccessRequest:
+    return PostAccessRequest(
+        id=request_data[0],
+        post_id=request_data[1],
+        requester_username=request_data[2],
+        status=request_data[3],
+        created_at=request_data[4]
+    )
+
+def _user(user_data: List[str]) -> UserInDB:
+    return UserInDB(
+        username=user_data[0],
+        email=user_data[1],
+        hashed_password=user_data[2],
+        refresh_token=user_data[3] if len(user_data) > 3 and user_data[3] else None
+    )
+
+def _subscription(subscription_data: List[str]) -> Subscription:
+    return Subscription(
+        id=subscription_data[0],
+        follower_username=subscription_data[1],
+        following_username=subscription_data[2],
+        created_at=subscription_data[3]
+    )
+
+def _access(access_data: List[str]) -> PostAccess:
+    return PostAccess(
+        id=access_data[0],
+        post_id=access_data[1],
+        viewer_username=access_data[2],
+        granted_by=access_data[3],
+        created_at=access_data[4]
+    )
+
+class TextStorage(Storage):
+    """
+    Хранилище на текстовых файлах с полями, разделенными "|" (пользователи - ":").
+
+    Посты обслуживаются из PostStore в памяти, комментарии - через CommentIndex,
+    refresh token - через RefreshTokenStore; posts.txt, access.txt, access_requests.txt
+    и refresh_tokens.txt ведутся как журналы (record_log).
+    """
+
+    def __init__(
+        self,
+        users_file: str = DATABASE_USERS_FILE,
+        posts_file: str = DATABASE_POSTS_FILE,
+        access_requests_file: str = DATABASE_ACCESS_REQUESTS_FILE,
+        access_file: str = DATABASE_ACCESS_FILE,
+        comments_file: str = DATABASE_COMMENTS_FILE,
+        comments_index_file: str = DATABASE_COMMENTS_INDEX_FILE,
+        subscriptions_file: str = DATABASE_SUBSCRIPTIONS_FILE,
+        refresh_tokens_file: str = DATABASE_REFRESH_TOKENS_FILE,
+        posts_index_file: str = DATABASE_POSTS_INDEX_FILE,
+    ):
+        self.users_file = users_file
+        self.posts_file = posts_file
+        self.access_requests_file = access_requests_file
+        self.access_file = access_file
+        self.comments_file = comments_file
+        self.subscriptions_file = subscriptions_file
+        # Хранилище постов в памяти процесса, изменения записываются в posts.txt,
+        # метаданные постов сохраняются в индекс posts.txt.idx
+        self.post_store = PostStore(posts_file, posts_index_file)
+        # Индекс комментариев по post_id (смещения строк в comments.txt и последний комментарий)
+        self.comment_index = CommentIndex(comments_file, comments_index_file or f"{comments_file}.idx")
+        # Refresh token: хеш -> владелец и срок действия (журнал refresh_tokens.txt)
+        self.refresh_token_store = RefreshTokenStore(refresh_tokens_file)
+        # Разрешения viewer_username -> ID постов и отметка access.txt, по которой они прочитаны
+        self._granted: Tuple[object, Dict[str, Set[str]]] = (None, {})
+
+    def load(self):
+        # Загружаем посты в память один раз при старте приложения
+        self.post_store.load()
+
+    def posts_version(self):
+        return (_file_stamp(self.posts_file), _file_stamp(self.comments_file))
+
+    def data_version(self):
+        return tuple(_file_stamp(path) for path in [
+            self.users_file, self.posts_file, self.access_requests_file,
+            self.access_file, self.comments_file, self.subscriptions_file,
+        ])
+
+    # Посты
+    def get_post(self, post_id: str) -> Optional[Post]:
+        return self.post_store.get(post_id)
+
+    def list_posts(self) -> List[Post]:
+        return self.post_store.all()
+
+    def list_posts_by_author(self, author: str) -> List[Post]:
+        return self.post_store.by_author(author)
+
+    def list_posts_by_authors(self, authors: Iterable[str]) -> List[Post]:
+        return self.post_store.by_authors(authors)
+
+    def list_public_posts(self) -> List[Post]:
+        return self.post_store.public()
+
+    def list_private_posts(self) -> List[Post]:
+        return self.post_store.private()
+
+    def get_post_ids_by_author(self, author: str) -> Set[str]:
+        return self.post_store.ids_by_author(author)
+
+    def list_posts_page(
+        self,
+        after: Optional[PostKey],
+        limit: Optional[int],
+        authors: Optional[Iterable[str]] = None,
+        is_public: Optional[bool] = None,
+    ) -> List[Post]:
+        return self.post_store.page(after, limit, authors, is_public)
+
+    def get_post_meta(self, post_id: str) -> Optional[PostMeta]:
+        return self.post_store.get_meta(post_id)
+
+    def list_post_meta(
+        self, authors: Optional[Iterable[str]] = None, is_public: Optional[bool] = None
+    ) -> List[PostMeta]:
+        return self.post_store.metas(authors, is_public)
+
+    def list_post_meta_page(
+        self,
+        after: Optional[PostKey],
+        limit: Optional[int],
+        authors: Optional[Iterable[str]] = None,
+        is_public: Optional[bool] = None,
+    ) -> List[PostMeta]:
+        return self.post_store.meta_page(after, limit, authors, is_public)
+
+    def get_posts(self, post_ids: Iterable[str]) -> List[Post]:
+        return self.post_store.posts(post_ids)
+
+    def insert_post(self, post: Post):
+        self.post_store.add(post)
+
+    def update_post(self, post: Post):
+        self.post_store.update(post)
+
+    def delete_post(self, post_id: str):
+        self.post_store.remove(post_id)
+
+    # Запросы на доступ
+    def insert_access_request(self, request: PostAccessRequest):
+        record_log.append_record(
+            self.access_requests_file,
+            f"{request.id}|{request.post_id}|{request.requester_username}|{request.status}|{request.created_at}\n"
+        )
+
+    def get_access_request(self, request_id: str) -> Optional[PostAccessRequest]:
+        for request_data in record_log.read_records(self.access_requests_file):
+            if request_data[0] == request_id:
+                return _access_request(request_data)
+        return None
+
+    def update_access_request(self, request: PostAccessRequest):
+        # Дописываем новую версию запроса вместо перезаписи всего файла
+        record_log.append_record(
+            self.access_requests_file,
+            f"{request.id}|{request.post_id}|{request.requester_username}|{request.status}|{request.created_at}\n",
+            replaces=True
+        )
+
+    def list_access_requests_by_post(self, post_id: str) -> List[PostAccessRequest]:
+        return [
+            _access_request(request_data)
+            for request_data in record_log.read_records(self.access_requests_file)
+            if request_data[1] == post_id
+        ]
+
+    def list_access_requests_by_requester(self, requester_username: str) -> List[PostAccessRequest]:
+        return [
+            _access_request(request_data)
+            for request_data in record_log.read_records(self.access_requests_file)
+            if request_data[2] == requester_username
+        ]
+
+    def list_access_requests_for_author(self, author_username: str) -> List[PostAccessRequest]:
+        # ID постов автора собираем один раз, затем один раз читаем запросы
+        post_ids = self.post_store.ids_by_author(author_username)
+        return [
+            _access_request(request_data)
+            for request_data in record_log.read_records(self.access_requests_file)
+            if request_data[1] in post_ids
+        ]
+
+    # Разрешения на доступ
+    def insert_access(self, access: PostAccess):
+        record_log.append_record(
+            self.access_file,
+            f"{access.id}|{access.post_id}|{access.viewer_username}|{access.granted_by}|{access.created_at}\n"
+        )
+
+    def list_access_by_post(self, post_id: str) -> List[PostAccess]:
+        return [
+            _access(access_data)
+            for access_data in record_log.read_records(self.access_file)
+            if access_data[1] == post_id
+        ]
+
+    def get_granted_post_ids(self, viewer_username: str) -> Set[str]:
+        # Разрешения проверяются при каждом чтении ленты и поиске: access.txt перечитывается
+        # целиком, только если файл изменился (в том числе другим процессом)
+        stamp = _file_stamp(self.access_file)
+        cached_stamp, granted = self._granted
+        if stamp is None or stamp != cached_stamp:
+            granted = {}
+            for access_data in record_log.read_records(self.access_file):
+                granted.setdefault(access_data[2], set()).add(access_data[1])
+            self._granted = (stamp, granted)
+        return set(granted.get(viewer_username, ()))
+
+    def delete_access(self, access_id: str):
+        # Дописываем строку-надгробие вместо перезаписи всего файла
+        record_log.append_tombstone(self.access_file, access_id)
+
+    # Комментарии
+    def insert_comment(self, comment: Comment):
+        self.comment_index.append(
+            f"{comment.id}|{comment.post_id}|{comment.author_username}|{comment.content}|{comment.created_at}\n"
+        )
+
+    def list_comments_by_post(self, post_id: str) -> List[Comment]:
+        return self.comment_index.get_comments(post_id)
+
+    def get_latest_comments(self, post_ids: Iterable[str]) -> Dict[str, Comment]:
+        return self.comment_index.get_latest(post_ids)
+
+    # Пользователи
+    def get_user(self, username: str) -> Optional[UserInDB]:
+        if not self.users_file:
+            raise ValueError("Не задана переменная окружения DATABASE_USERS_FILE")
+        if not os.path.exists(self.users_file):
+            return None
+        for line in _scan_lines(self.users_file):
+            user_data = line.strip().split(":")
+            if user_data[0] == username:
+                # Возвращаем объект UserInDB с refresh_token
+                return UserInDB(
+                    username=user_data[0],
+                    email=user_data[1],
+                    hashed_password=user_data[2],
+                    refresh_token=user_data[3] if len(user_data) > 3 else None
+                )
+        return None
+
+    def save_user(self, user: UserInDB):
+        self.save_users([user])
+
+    def save_users(self, users: Iterable[UserInDB]):
+        if not self.users_file:
+            raise ValueError("Не задана переменная окружения DATABASE_USERS_FILE")
+        # Чтение, изменение и замена файла выполняются под блокировкой файла:
+        # иначе параллельные изменения в разных процессах теряются
+        with write_coordinator.file_lock(self.users_file):
+            self._save_users(users)
+
+    def insert_user(self, user: UserInDB) -> bool:
+        if not self.users_file:
+            raise ValueError("Не задана переменная окружения DATABASE_USERS_FILE")
+        # Проверка имени и запись под одной блокировкой файла: параллельные регистрации
+        # одного имени (в том числе в разных процессах) не перезаписывают друг друга
+        with write_coordinator.file_lock(self.users_file):
+            if self.get_user(user.username) is not None:
+                return False
+            self._save_users([user])
+            return True
+
+    def _save_users(self, new_users: Iterable[UserInDB]):
+        # Новые данные пользователей по имени: существующие строки заменяются, остальные дописываются
+        updates = {
+            user.username: [user.username, user.email, user.hashed_password, user.refresh_token or ""]
+            for user in new_users
+        }
+        # Читаем все строки из файла
+        users = []
+        if os.path.exists(self.users_file):
+            with open(self.users_file, "r") as file:
+                for line in file:
+                    user_data = line.strip().split(":")
+                    if user_data != [""]:
+                        # Обновляем данные пользователя
+                        users.append(updates.pop(user_data[0], user_data))
+        # Пользователи, которых не было в файле, добавляются в конец
+        users.extend(updates.values())
+        # Атомарно заменяем файл обновленными данными
+        write_coordinator.replace_file(
+            self.users_file, ((":".join(user_data) + "\n").encode("utf-8") for user_data in users)
+        )
+
+    # Refresh token
+    def insert_refresh_token(self, token: RefreshToken):
+        self.refresh_token_store.add(token)
+
+    def get_refresh_token(self, token_hash: str) -> Optional[RefreshToken]:
+        return self.refresh_token_store.get(token_hash)
+
+    def delete_refresh_tokens(self, token_hashes: Iterable[str]):
+        self.refresh_token_store.remove(list(token_hashes))
+
+    def list_refresh_token_hashes(self, username: str) -> List[str]:
+        return self.refresh_token_store.hashes_by_user(username)
+
+    def list_expired_refresh_token_hashes(self, now: datetime) -> List[str]:
+        return self.refresh_token_store.expired(now)
+
+    # Подписки
+    def insert_subscription(self, subscription: Subscription):
+        write_coordinator.append(
+            self.subscriptions_file,
+            f"{subscription.id}|{subscription.follower_username}|{subscription.following_username}|{subscription.created_at}\n".encode("utf-8")
+        )
+
+    def list_subscriptions_by_follower(self, follower_username: str) -> List[Subscription]:
+        subscriptions = []
+        for line in _scan_lines(self.subscriptions_file):
+            subscription_data = line.strip().split("|")
+            if subscription_data[1] == follower_username:
+                subscriptions.append(Subscription(
+                    id=subscription_data[0],
+                    follower_username=subscription_data[1],
+                    following_username=subscription_data[2],
+                    created_at=subscription_data[3]
+                ))
+        return subscriptions
+
+    def is_subscribed(self, follower_username: str, following_username: str) -> bool:
+        for line in _scan_lines(self.subscriptions_file, "utf-8"):
+            parts = line.strip().split("|")
+            if len(parts) == 4:
+                follower, following = parts[1], parts[2]
+                if follower == follower_username and following == following_username:
+                    return True
+        return False
+
+    def get_followed_usernames(self, follower_username: str) -> Set[str]:
+        followed = set()
+        for line in _scan_lines(self.subscriptions_file, "utf-8"):
+            parts = line.strip().split("|")
+            if len(parts) == 4 and parts[1] == follower_username:
+                followed.add(parts[2])
+        return followed
+
+    def get_follower_usernames(self, following_username: str) -> Set[str]:
+        followers = set()
+        for line in _scan_lines(self.subscriptions_file, "utf-8"):
+            parts = line.strip().split("|")
+            if len(parts) == 4 and parts[2] == following_username:
+                followers.add(parts[1])
+        return followers
+
+    # Полный просмотр данных (миграция, экспорт)
+    def iter_access_requests(self) -> Iterator[PostAccessRequest]:
+        for request_data in record_log.iter_records(self.access_requests_file):
+            yield _access_request(request_data)
+
+    def iter_access(self) -> Iterator[PostAccess]:
+        for access_data in record_log.iter_records(self.access_file):
+            yield _access(access_data)
+
+    def iter_comments(self) -> Iterator[Comment]:
+        with open(self.comments_file, "r", encoding="utf-8") as file:
+            for line in file:
+                parts = line.strip().split("|")
+                if len(parts) == 5:
+                    yield parse_comment_fields(parts)
+
+    def iter_users(self) -> Iterator[UserInDB]:
+        if not self.users_file or not os.path.exists(self.users_file):
+            return
+        with open(self.users_file, "r") as file:
+            for line in file:
+                user_data = line.strip().split(":")
+                if len(user_data) >= 3:
+                    yield _user(user_data)
+
+    def iter_subscriptions(self) -> Iterator[Subscription]:
+        with open(self.subscriptions_file, "r", encoding="utf-8") as file:
+            for line in file:
+                subscription_data = line.strip().split("|")
+                if len(subscription_data) == 4:
+                    yield _subscription(subscription_data)
+
+    def iter_refresh_tokens(self) -> Iterator[RefreshToken]:
+        if not os.path.exists(self.refresh_token_store.path):
+            return
+        for token_data in record_log.iter_records(self.refresh_token_store.path):
+            token = parse_refresh_token(token_data)
+            if token is not None:
+                yield token
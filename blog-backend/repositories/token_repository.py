@@ -0,0 +1,111 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+from dotenv import load_dotenv
+from jose import JWTError, jwt
+from models.user import RefreshToken
+from repositories.storage import get_storage
+from repositories import instrumentation, versions
+from typing import Optional
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Как часто (секунды) удаляются просроченные refresh token: проверка выполняется при входе
+REFRESH_TOKEN_SWEEP_INTERVAL = float(os.getenv("REFRESH_TOKEN_SWEEP_INTERVAL", "3600"))
+
+_sweep_lock = threading.Lock()
+_next_sweep = 0.0
+
+def hash_refresh_token(token: str) -> str:
+    # Хранится только хеш: утечка файла токенов не дает войти от имени пользователя
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def save_refresh_token(username: str, token: str, expires_at: datetime):
+    """
+    Сохраняет refresh token пользователя. Токены разных входов (устройств) действуют одновременно.
+    """
+    refresh_token = RefreshToken(
+        token_hash=hash_refresh_token(token), username=username, expires_at=expires_at, created_at=datetime.utcnow()
+    )
+    # Запись отмечается в журнале изменений: для SQLite она меняет метку всей базы
+    with versions.write():
+        get_storage().insert_refresh_token(refresh_token)
+    sweep_expired_refresh_tokens()
+
+def get_refresh_token_owner(token: str) -> Optional[str]:
+    """
+    Возвращает владельца действующего refresh token или None, если токен отозван или истек.
+    """
+    refresh_token = get_storage().get_refresh_token(hash_refresh_token(token))
+    if refresh_token is None or refresh_token.expires_at <= datetime.utcnow():
+        return None
+    return refresh_token.username
+
+def revoke_refresh_token(token: str):
+    with versions.write():
+        get_storage().delete_refresh_tokens([hash_refresh_token(token)])
+
+def revoke_user_refresh_tokens(username: str):
+    """
+    Отзывает все refresh token пользователя (выход на всех устройствах).
+    """
+    storage = get_storage()
+    with versions.write():
+        storage.delete_refresh_tokens(storage.list_refresh_token_hashes(username))
+
+def sweep_expired_refresh_tokens(force: bool = False) -> bool:
+    """
+    Удаляет просроченные refresh token не чаще раза в REFRESH_TOKEN_SWEEP_INTERVAL секунд.
+    Возвращает True, если удаление выполнялось.
+    """
+    global _next_sweep
+    with _sweep_lock:
+        now = time.monotonic()
+        if not force and now < _next_sweep:
+            return False
+        _next_sweep = now + REFRESH_TOKEN_SWEEP_INTERVAL
+    storage = get_storage()
+    expired = storage.list_expired_refresh_token_hashes(datetime.utcnow())
+    if expired:
+        with versions.write():
+            storage.delete_refresh_tokens(expired)
+    return True
+
+def migrate_legacy_refresh_tokens() -> int:
+    """
+    Переносит refresh token, сохраненные в файле пользователей до появления хранилища
+    токенов, в хранилище токенов и очищает их в файле пользователей, чтобы выданные
+    ранее токены продолжали действовать. Вызывается при старте приложения.
+    Возвращает число перенесенных токенов.
+    """
+    storage = get_storage()
+    users = [user for user in storage.iter_users() if user.refresh_token]
+    if not users:
+        return 0
+    now = datetime.utcnow()
+    migrated = 0
+    with versions.write("users"):
+        for user in users:
+            try:
+                # Подпись проверяется при обновлении токена, здесь нужен только срок действия
+                expires_at = datetime.utcfromtimestamp(jwt.get_unverified_claims(user.refresh_token)["exp"])
+            except (JWTError, KeyError, TypeError, ValueError):
+                expires_at = None
+            if expires_at is not None and expires_at > now:
+                storage.insert_refresh_token(RefreshToken(
+                    token_hash=hash_refresh_token(user.refresh_token), username=user.username,
+                    expires_at=expires_at, created_at=now
+                ))
+                migrated += 1
+            user.refresh_token = None
+        storage.save_users(users)
+    return migrated
+
+# Учет вызовов (число, время, прочитанные строки и байты) для /metrics и журнала медленных запросов
+instrumentation.instrument_module(__name__, [
+    "save_refresh_token", "get_refresh_token_owner", "revoke_refresh_token",
+    "revoke_user_refresh_tokens", "sweep_expired_refresh_tokens", "migrate_legacy_refresh_tokens",
+])
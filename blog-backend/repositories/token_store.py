@@ -0,0 +1,125 @@
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from models.user import RefreshToken
+from repositories import record_log
+
+def _stamp(stat: os.stat_result):
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+def parse_refresh_token(fields: List[str]) -> Optional[RefreshToken]:
+    if len(fields) != 4:
+        return None
+    return RefreshToken(token_hash=fields[0], username=fields[1], expires_at=fields[2], created_at=fields[3])
+
+def format_refresh_token_line(token: RefreshToken) -> str:
+    return f"{token.token_hash}|{token.username}|{token.expires_at}|{token.created_at}\n"
+
+class RefreshTokenStore:
+    """
+    Refresh token пользователей: хеш токена -> владелец и срок действия.
+
+    Файл ведется как журнал (record_log): вход дописывает строку токена, отзыв и удаление
+    просроченного токена - строку-надгробие, мертвые строки убирает компактизация.
+    В памяти хранятся все действующие записи с индексом по пользователю, поэтому
+    проверка токена не читает файл. Строки, дописанные другими процессами,
+    дочитываются при следующем обращении.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._tokens: Dict[str, RefreshToken] = {}
+        self._by_user: Dict[str, Set[str]] = {}
+        self._stamp = None
+        self._marker = b""
+
+    def _file_stamp(self):
+        try:
+            return _stamp(os.stat(self.path))
+        except FileNotFoundError:
+            return None
+
+    def load(self):
+        with self._lock:
+            self._tokens = {}
+            self._by_user = {}
+            # Метка берется до чтения: строки, дописанные во время чтения, дочитаются позже
+            stamp = self._file_stamp()
+            try:
+                for token in record_log.scan_records(self.path, lambda fields, offset, length: parse_refresh_token(fields)):
+                    self._add(token)
+                self._marker = record_log.read_marker(self.path, stamp[1]) if stamp else b""
+            except FileNotFoundError:
+                stamp = None
+            self._stamp = stamp
+
+    def _refresh(self):
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+        if self._stamp is None or stamp is None or stamp[0] != self._stamp[0] or stamp[1] == self._stamp[1]:
+            self.load()
+            return
+        try:
+            tail = record_log.read_tail(self.path, self._stamp[1], self._marker)
+        except FileNotFoundError:
+            tail = None
+        if tail is None or tail.stat.st_ino != self._stamp[0]:
+            self.load()
+            return
+        for fields, _, _ in tail.records:
+            if record_log.is_tombstone(fields):
+                self._remove(fields[0])
+            else:
+                token = parse_refresh_token(fields)
+                if token is not None:
+                    self._add(token)
+        self._marker = tail.marker
+        # Незавершенная последняя строка будет прочитана при следующем обращении
+        self._stamp = _stamp(tail.stat) if tail.end == tail.stat.st_size else (tail.stat.st_ino, tail.end, None)
+
+    def _add(self, token: RefreshToken):
+        self._tokens[token.token_hash] = token
+        self._by_user.setdefault(token.username, set()).add(token.token_hash)
+
+    def _remove(self, token_hash: str):
+        token = self._tokens.pop(token_hash, None)
+        if token is None:
+            return
+        hashes = self._by_user[token.username]
+        hashes.discard(token_hash)
+        if not hashes:
+            del self._by_user[token.username]
+
+    def add(self, token: RefreshToken):
+        record_log.append_record(self.path, format_refresh_token_line(token))
+        with self._lock:
+            # Новая строка (и строки других процессов перед ней) дочитывается из файла
+            self._refresh()
+
+    def get(self, token_hash: str) -> Optional[RefreshToken]:
+        with self._lock:
+            self._refresh()
+            return self._tokens.get(token_hash)
+
+    def remove(self, token_hashes: List[str]):
+        # Для удаления токен должен быть в файле, иначе надгробие останется без записи
+        with self._lock:
+            self._refresh()
+            token_hashes = [token_hash for token_hash in token_hashes if token_hash in self._tokens]
+        for token_hash in token_hashes:
+            record_log.append_tombstone(self.path, token_hash)
+        with self._lock:
+            self._refresh()
+
+    def hashes_by_user(self, username: str) -> List[str]:
+        with self._lock:
+            self._refresh()
+            return list(self._by_user.get(username, ()))
+
+    def expired(self, now: datetime) -> List[str]:
+        with self._lock:
+            self._refresh()
+            return [token.token_hash for token in self._tokens.values() if token.expires_at <= now]
@@ -1,97 +1,157 @@
 import os
+import threading
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
 from models.user import UserInDB, Subscription
-from typing import List, Optional
-import uuid
-from datetime import datetime
+from repositories.storage import get_storage
+from repositories import instrumentation, versions
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 # Загружаем переменные окружения
 load_dotenv()
 
-# Получаем путь к файлу базы данных
-DATABASE_USERS_FILE = os.getenv("DATABASE_USERS_FILE")
-DATABASE_SUBSCRIPTIONS_FILE = os.getenv("DATABASE_SUBSCRIPTIONS_FILE", "database/subscriptions.txt")
+# Время жизни записи в кэше пользователей (секунды) и максимальное число записей
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+# Кэш username -> (момент устаревания, пользователь) для проверки токенов
+_user_cache: "OrderedDict[str, Tuple[float, UserInDB]]" = OrderedDict()
+_user_cache_lock = threading.Lock()
+# Поколения записей кэша: сброс пользователя (или всего кэша) увеличивает счетчик,
+# и пользователь, прочитанный из хранилища до сброса, в кэш уже не попадает
+_user_generations: Dict[str, int] = {}
+_cache_generation = 0
+
+# Подписчики на изменения подписок: вызываются после записи в хранилище
+# с именем события ("subscription_saved") и данными
+_change_listeners: List[Callable[[str, object], None]] = []
+
+def add_change_listener(listener: Callable[[str, object], None]):
+    _change_listeners.append(listener)
+
+def _notify(event: str, payload: object):
+    for listener in _change_listeners:
+        listener(event, payload)
+
+def _on_remote_change(event: str, subject):
+    """
+    Изменение, записанное другим процессом: сбрасывается кэш пользователя,
+    о новой подписке оповещаются подписчики, как после собственной записи.
+    """
+    if event == "user_saved":
+        invalidate_cached_user(subject[0])
+    elif event == "subscription_saved":
+        follower, following = subject
+        for subscription in get_storage().list_subscriptions_by_follower(follower):
+            if subscription.following_username == following:
+                _notify(event, subscription)
+                break
+
+versions.add_remote_listener(_on_remote_change)
 
 def get_user(username: str) -> Optional[UserInDB]:
-    if not DATABASE_USERS_FILE:
-        raise ValueError("Не задана переменная окружения DATABASE_USERS_FILE")
-    if not os.path.exists(DATABASE_USERS_FILE):
-        return None
-    with open(DATABASE_USERS_FILE, "r") as file:
-        for line in file:
-            user_data = line.strip().split(":")
-            if user_data[0] == username:
-                # Возвращаем объект UserInDB с refresh_token
-                return UserInDB(
-                    username=user_data[0],
-                    email=user_data[1],
-                    hashed_password=user_data[2],
-                    refresh_token=user_data[3] if len(user_data) > 3 else None
-                )
-    return None
+    return get_storage().get_user(username)
+
+def lookup_cached_user(username: str) -> Optional[UserInDB]:
+    """
+    Возвращает пользователя только из кэша, не обращаясь к хранилищу.
+    """
+    with _user_cache_lock:
+        entry = _user_cache.get(username)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        _user_cache.move_to_end(username)
+        return entry[1].copy()
+
+def get_cached_user(username: str) -> Optional[UserInDB]:
+    """
+    Возвращает пользователя из кэша, а при промахе или устаревании записи - из хранилища.
+    Используется при проверке токена на каждом запросе; вход, регистрация и проверка
+    refresh token читают пользователя из хранилища напрямую.
+    Отсутствующие пользователи не кэшируются: пользователь, зарегистрированный
+    другим процессом, становится виден сразу.
+    """
+    user = lookup_cached_user(username)
+    if user is not None:
+        return user
+    now = time.monotonic()
+    with _user_cache_lock:
+        generation = (_cache_generation, _user_generations.get(username, 0))
+    user = get_storage().get_user(username)
+    if user is not None:
+        with _user_cache_lock:
+            if generation != (_cache_generation, _user_generations.get(username, 0)):
+                # Пока пользователь читался, его изменили: прочитанная версия могла устареть
+                return user
+            _user_cache[username] = (now + USER_CACHE_TTL, user.copy())
+            _user_cache.move_to_end(username)
+            while len(_user_cache) > USER_CACHE_SIZE:
+                _user_cache.popitem(last=False)
+    return user
+
+def invalidate_cached_user(username: str):
+    with _user_cache_lock:
+        _user_cache.pop(username, None)
+        _user_generations[username] = _user_generations.get(username, 0) + 1
+
+def clear_user_cache():
+    global _cache_generation
+    with _user_cache_lock:
+        _user_cache.clear()
+        _user_generations.clear()
+        _cache_generation += 1
 
 def save_user(user: UserInDB):
-    if not DATABASE_USERS_FILE:
-        raise ValueError("Не задана переменная окружения DATABASE_USERS_FILE")
-    # Читаем все строки из файла
-    users = []
-    with open(DATABASE_USERS_FILE, "r") as file:
-        for line in file:
-            user_data = line.strip().split(":")
-            users.append(user_data)
-    # Ищем пользователя для обновления
-    user_found = False
-    for i, user_data in enumerate(users):
-        if user_data[0] == user.username:
-            # Обновляем данные пользователя
-            users[i] = [
-                user.username,
-                user.email,
-                user.hashed_password,
-                user.refresh_token if user.refresh_token else ""
-            ]
-            user_found = True
-            break
-    # Если пользователь не найден, добавляем нового
-    if not user_found:
-        users.append([
-            user.username,
-            user.email,
-            user.hashed_password,
-            user.refresh_token if user.refresh_token else ""
-        ])
-    # Перезаписываем файл с обновленными данными
-    with open(DATABASE_USERS_FILE, "w") as file:
-        for user_data in users:
-            file.write(":".join(user_data) + "\n")
+    with versions.write("users", event="user_saved", subject=(user.username,)):
+        get_storage().save_user(user)
+    # Сбрасываем запись после записи. Параллельный запрос, прочитавший старую версию,
+    # не закэширует ее: сброс увеличивает поколение пользователя
+    invalidate_cached_user(user.username)
+
+def create_user(user: UserInDB):
+    """
+    Регистрирует нового пользователя. Если имя уже занято (в том числе параллельной
+    регистрацией), вызывает ValueError.
+    """
+    with versions.write("users", event="user_saved", subject=(user.username,)):
+        created = get_storage().insert_user(user)
+    if not created:
+        raise ValueError("Username already registered")
+    invalidate_cached_user(user.username)
 
 def save_subscription(subscription: Subscription):
-    with open(DATABASE_SUBSCRIPTIONS_FILE, "a") as file:
-        file.write(f"{subscription.id}|{subscription.follower_username}|{subscription.following_username}|{subscription.created_at}\n")
+    with versions.write(
+        "subscriptions", event="subscription_saved",
+        subject=(subscription.follower_username, subscription.following_username)
+    ):
+        get_storage().insert_subscription(subscription)
+    _notify("subscription_saved", subscription)
 
 def get_subscriptions_by_follower(follower_username: str) -> List[Subscription]:
-    subscriptions = []
-    with open(DATABASE_SUBSCRIPTIONS_FILE, "r") as file:
-        for line in file:
-            subscription_data = line.strip().split("|")
-            if subscription_data[1] == follower_username:
-                subscriptions.append(Subscription(
-                    id=subscription_data[0],
-                    follower_username=subscription_data[1],
-                    following_username=subscription_data[2],
-                    created_at=subscription_data[3]
-                ))
-    return subscriptions
+    return get_storage().list_subscriptions_by_follower(follower_username)
 
 def is_user_subscribed(follower_username: str, following_username: str) -> bool:
     """
     Проверяет, подписан ли пользователь на автора поста.
     """
-    with open(DATABASE_SUBSCRIPTIONS_FILE, "r", encoding="utf-8") as file:
-        for line in file:
-            parts = line.strip().split("|")
-            if len(parts) == 4:
-                follower, following = parts[1], parts[2]
-                if follower == follower_username and following == following_username:
-                    return True
-    return False
\ No newline at end of file
+    return get_storage().is_subscribed(follower_username, following_username)
+
+def get_followed_usernames(follower_username: str) -> Set[str]:
+    """
+    Возвращает множество пользователей, на которых подписан пользователь.
+    """
+    return get_storage().get_followed_usernames(follower_username)
+
+def get_follower_usernames(following_username: str) -> Set[str]:
+    """
+    Возвращает множество подписчиков пользователя.
+    """
+    return get_storage().get_follower_usernames(following_username)
+
+# Учет вызовов (число, время, прочитанные строки и байты) для /metrics и журнала медленных запросов
+instrumentation.instrument_module(__name__, [
+    "get_user", "get_cached_user", "save_user", "create_user", "save_subscription",
+    "get_subscriptions_by_follower", "is_user_subscribed", "get_followed_usernames",
+    "get_follower_usernames",
+])
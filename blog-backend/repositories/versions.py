@@ -0,0 +1,145 @@
+"""
+Версии ресурсов для условных HTTP-запросов (ETag) и согласование кэшей в памяти между процессами.
+
+Репозитории выполняют каждую запись внутри write(...): после записи в общий журнал изменений
+(repositories.change_journal) дописывается строка с изменившимися ресурсами: общим видом
+данных ("posts", "comments", "access", "subscriptions", "users") и конкретными ресурсами
+("post:<id>", "comments:<post_id>"). Версия ресурса - смещение последней записи журнала,
+которая его затрагивает, поэтому ETag одинаковы во всех воркерах, а изменение одного поста
+не сбрасывает кэш других.
+
+check() дочитывает журнал: записи других процессов сдвигают версии ресурсов, а их события
+передаются подписчикам add_remote_listener (репозитории восстанавливают по ним данные и
+оповещают кэши так же, как после собственной записи). Изменения в обход репозиториев
+(замена файлов, ручная правка) определяются по метке хранилища data_version(): если она
+не совпадает с меткой последней записи журнала и ни одна запись сейчас не идет, в журнал
+добавляется событие "external", и каждый процесс, прочитав его, увеличивает эпоху.
+Эпоха входит во все версии, при ее смене кэши в памяти строятся заново.
+Компактизация журналов данных (record_log.compact) меняет метку, но не содержимое,
+поэтому замена файла выполняется внутри write() без ресурсов и событий.
+"""
+import hashlib
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple
+from repositories import record_log
+from repositories.change_journal import EXTERNAL, Change, ChangeJournal
+from repositories.storage import get_storage
+
+_lock = threading.Lock()
+# Чтение журнала и доставка событий выполняются по порядку одним потоком
+_poll_lock = threading.RLock()
+_counters: Dict[str, int] = {}
+# Метка процесса: свои записи журнала не доставляются повторно
+_instance = uuid.uuid4().hex[:8]
+_epoch = 0
+# Смещение последнего события "external": входит в ETag всех процессов
+_external = 0
+# Метка хранилища из последней прочитанной записи журнала
+_journal_storage_version = None
+# Прочитанные, но еще не доставленные события других процессов
+_pending: List[Change] = []
+# Записи этого процесса, которые идут прямо сейчас
+_in_flight = 0
+_journal = ChangeJournal()
+
+# Подписчики на события других процессов: вызываются с именем события и его предметом
+_remote_listeners: List[Callable[[str, Tuple[str, ...]], None]] = []
+
+def add_remote_listener(listener: Callable[[str, Tuple[str, ...]], None]):
+    _remote_listeners.append(listener)
+
+def _storage_version() -> str:
+    return hashlib.md5(repr(get_storage().data_version()).encode("utf-8")).hexdigest()[:16]
+
+def _read_journal():
+    global _epoch, _external, _journal_storage_version
+    restarted, changes = _journal.read()
+    with _lock:
+        if restarted:
+            # Первое чтение или новое поколение журнала: пропущенные события не восстановить
+            _counters.clear()
+            _pending.clear()
+            _external = 0
+            _epoch += 1
+        for change in changes:
+            for key in change.keys:
+                _counters[key] = change.offset
+            if change.event == EXTERNAL:
+                _external = change.offset
+                _epoch += 1
+            _journal_storage_version = change.storage_version
+        if not restarted:
+            _pending.extend(
+                change for change in changes
+                if change.instance != _instance and change.event and change.event != EXTERNAL
+            )
+
+def check(dispatch: bool = True) -> int:
+    """
+    Дочитывает журнал изменений, проверяет метку хранилища и возвращает текущую эпоху.
+    С dispatch=False события других процессов только накапливаются, их доставит
+    следующий вызов check() с доставкой (там, где подписчики могут перестраивать кэши).
+    Читает файлы и может ждать блокировку журнала: из async-кода вызывается через run_blocking.
+    """
+    with _poll_lock:
+        _read_journal()
+        if _storage_version() != _journal_storage_version and not _in_flight:
+            # Метка могла сдвинуться из-за записи, которая еще не попала в журнал:
+            # изменение считается внешним, только если ни одна запись сейчас не идет
+            with _journal.quiescent() as quiescent:
+                if quiescent:
+                    _read_journal()
+                    if _storage_version() != _journal_storage_version:
+                        _journal.append(_instance, EXTERNAL, (), (), _storage_version)
+                        _read_journal()
+        if dispatch and _pending:
+            with _lock:
+                changes = list(_pending)
+                _pending.clear()
+            for change in changes:
+                for listener in _remote_listeners:
+                    listener(change.event, change.subject)
+        return _epoch
+
+def epoch() -> int:
+    return _epoch
+
+def has_pending() -> bool:
+    """
+    Есть ли прочитанные, но еще не доставленные события других процессов.
+    """
+    return bool(_pending)
+
+@contextmanager
+def write(*keys: str, event: str = "", subject: Sequence[str] = ()):
+    """
+    Оборачивает запись в хранилище и отмечает изменение ресурсов keys.
+    event и subject передаются другим процессам (см. add_remote_listener).
+    """
+    global _in_flight
+    check()
+    with _lock:
+        _in_flight += 1
+    try:
+        with _journal.writing():
+            yield
+            offset = _journal.append(_instance, event, subject, keys, _storage_version)
+    finally:
+        with _lock:
+            _in_flight -= 1
+    with _lock:
+        for key in keys:
+            _counters[key] = max(_counters.get(key, 0), offset)
+
+def current(*keys: str) -> Tuple:
+    """
+    Возвращает текущую версию набора ресурсов (блокирующий вызов, см. check).
+    """
+    check(dispatch=False)
+    with _lock:
+        return (_journal.generation, _external) + tuple(_counters.get(key, 0) for key in keys)
+
+# Замена файла при компактизации записывается в журнал с новой меткой хранилища
+record_log.set_replace_guard(write)
@@ -0,0 +1,173 @@
+"""
+Согласованная запись файлов данных несколькими потоками и процессами (воркерами uvicorn).
+
+- file_lock(path): блокировка файла. Внутри процесса - threading.Lock, между процессами -
+  рекомендательная блокировка flock на соседнем файле "<path>.lock" (сам файл данных
+  может быть заменен переименованием, а блокировка должна пережить замену).
+- replace_file(path, chunks): атомарная замена содержимого: временный файл в той же
+  директории, fsync, rename, fsync директории. Читатель видит либо старый, либо новый файл.
+- append(path, data): дописывание в конец файла с групповой фиксацией (group commit):
+  записи, поступившие от нескольких потоков, пока идет запись предыдущей группы,
+  пишутся одной операцией под блокировкой файла и сбрасываются на диск одним fsync.
+
+Чтение файлов блокировок не требует: дописанные строки появляются целиком в конце
+файла (незавершенную последнюю строку читатели пропускают), а замена атомарна.
+"""
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: блокировки работают только между потоками одного процесса
+    fcntl = None
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Сбрасывать ли записанные данные на диск (fsync) перед подтверждением записи
+WRITE_FSYNC = os.getenv("WRITE_FSYNC", "true").lower() in ("1", "true", "yes")
+
+class Appended(NamedTuple):
+    """
+    Результат дописывания: смещение записи в файле и os.stat файла до и после
+    записи группы, в которую она попала (под блокировкой файла).
+    Если before не совпадает с состоянием файла, известным вызывающему,
+    то файл изменялся в обход него (например, другим процессом).
+    """
+    offset: int
+    before: os.stat_result
+    after: os.stat_result
+
+class _Append:
+    __slots__ = ("data", "event", "leader", "done", "result", "error")
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.event = threading.Event()
+        self.leader = False
+        self.done = False
+        self.result: Optional[Appended] = None
+        self.error: Optional[BaseException] = None
+
+class _FileState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Очередь дописываний и признак того, что группа сейчас записывается
+        self.queue_lock = threading.Lock()
+        self.pending: List[_Append] = []
+        self.writing = False
+
+_states: Dict[str, _FileState] = {}
+_states_lock = threading.Lock()
+
+def _state(path: str) -> _FileState:
+    path = os.path.abspath(path)
+    with _states_lock:
+        state = _states.get(path)
+        if state is None:
+            state = _states[path] = _FileState()
+        return state
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Монопольная блокировка файла на время чтения-изменения-записи.
+    """
+    state = _state(path)
+    with state.lock:
+        if fcntl is None:
+            yield
+            return
+        with open(f"{path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def fsync_directory(path: str):
+    if not WRITE_FSYNC or os.name != "posix":
+        return
+    descriptor = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+def replace_file(path: str, chunks: Iterable[bytes]):
+    """
+    Атомарно заменяет содержимое файла. Для чтения-изменения-записи вызывается
+    под file_lock(path), иначе параллельная замена может потерять изменения.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    descriptor, temp_path = tempfile.mkstemp(prefix=f"{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(descriptor, "wb") as temp_file:
+            temp_file.writelines(chunks)
+            temp_file.flush()
+            if WRITE_FSYNC:
+                os.fsync(temp_file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    fsync_directory(path)
+
+def append(path: str, data: bytes) -> Appended:
+    """
+    Дописывает данные в конец файла и возвращает результат после их фиксации.
+
+    Первый поток, заставший очередь пустой, становится ведущим: забирает все
+    накопившиеся записи и пишет их одной группой. Записи, поступившие во время
+    этого, ждут следующей группы, ее пишет первый из ожидающих потоков.
+    """
+    state = _state(path)
+    entry = _Append(data)
+    with state.queue_lock:
+        state.pending.append(entry)
+        if not state.writing:
+            state.writing = True
+            entry.leader = True
+    if not entry.leader:
+        # Ждем, пока запись зафиксирует ведущий поток или пока нас не сделают ведущим
+        entry.event.wait()
+    if not entry.done:
+        _write_group(path, state)
+    if entry.error is not None:
+        raise entry.error
+    return entry.result
+
+def _write_group(path: str, state: _FileState):
+    with state.queue_lock:
+        group, state.pending = state.pending, []
+    try:
+        with file_lock(path):
+            with open(path, "ab") as file:
+                before = os.fstat(file.fileno())
+                offset = before.st_size
+                file.write(b"".join(entry.data for entry in group))
+                file.flush()
+                if WRITE_FSYNC:
+                    os.fsync(file.fileno())
+                after = os.fstat(file.fileno())
+        for entry in group:
+            entry.result = Appended(offset, before, after)
+            offset += len(entry.data)
+    except BaseException as error:
+        for entry in group:
+            entry.error = error
+    for entry in group:
+        entry.done = True
+    with state.queue_lock:
+        if state.pending:
+            state.pending[0].leader = True
+            state.pending[0].event.set()
+        else:
+            state.writing = False
+    for entry in group:
+        entry.event.set()
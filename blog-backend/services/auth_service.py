@@ -1,6 +1,13 @@
-from repositories.user_repository import get_user, save_user  # Импортируем save_user
+from repositories.user_repository import get_user, get_cached_user, lookup_cached_user, create_user
+from repositories.token_repository import get_refresh_token_owner
+from services.executor import run_blocking
+from services.password_hashing import verify_password_async, get_password_hash_async
+from services.rate_limit import AttemptLimiter
 from models.user import UserInDB
-from passlib.context import CryptContext
+import math
+import os
+import uuid
+from typing import Optional
 from datetime import datetime, timedelta
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
@@ -12,27 +19,49 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
-# Конфигурация для хеширования паролей
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Доверять данным подписанного access token на эндпоинтах только для чтения
+# (без обращения к хранилищу пользователей). Изменения пользователя, в том числе
+# удаление, в этом режиме вступают в силу только после истечения токена.
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() == "true"
+
+# Ограничения числа попыток входа и регистрации за окно AUTH_ATTEMPTS_WINDOW секунд.
+# Проверяются до bcrypt, поэтому перебор паролей не занимает процессор.
+# Счетчики хранятся в памяти процесса: лимиты задаются на весь сервер и делятся
+# между WEB_CONCURRENCY воркерами uvicorn (запросы распределяются между ними)
+AUTH_ATTEMPTS_WINDOW = float(os.getenv("AUTH_ATTEMPTS_WINDOW", "60"))
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+def _per_worker(name: str, default: str) -> int:
+    return max(1, int(os.getenv(name, default)) // WEB_CONCURRENCY)
+
+login_username_limiter = AttemptLimiter(_per_worker("LOGIN_ATTEMPTS_PER_USERNAME", "10"), AUTH_ATTEMPTS_WINDOW)
+login_ip_limiter = AttemptLimiter(_per_worker("LOGIN_ATTEMPTS_PER_IP", "30"), AUTH_ATTEMPTS_WINDOW)
+register_ip_limiter = AttemptLimiter(_per_worker("REGISTER_ATTEMPTS_PER_IP", "10"), AUTH_ATTEMPTS_WINDOW)
 
 # OAuth2 схема для аутентификации
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Функция для проверки пароля
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-# Функция для хеширования пароля
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+def _check_attempt(limiter: AttemptLimiter, key: str):
+    retry_after = limiter.hit(key)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
 
 # Функция для аутентификации пользователя
-def authenticate_user(username: str, password: str):
-    user = get_user(username)
+async def authenticate_user(username: str, password: str, client_ip: Optional[str] = None):
+    if client_ip:
+        _check_attempt(login_ip_limiter, client_ip)
+    _check_attempt(login_username_limiter, username)
+    user = await run_blocking(get_user, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    # Проверка пароля выполняется в отдельном процессе (services.password_hashing)
+    if not await verify_password_async(password, user.hashed_password):
         return False
+    login_username_limiter.reset(username)
     return user
 
 # Функция для создания JWT токена
@@ -53,43 +82,68 @@ def create_refresh_token(data: dict, expires_delta: timedelta = None) -> str:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
+    # Уникальный ID: токены двух входов в одну секунду (с разных устройств) различаются
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-# Функция для получения текущего пользователя из JWT токена
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+# Проверяет подпись и срок действия access token и возвращает его данные
+def decode_access_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-    user = get_user(username)
+        raise _credentials_exception()
+    if payload.get("sub") is None:
+        raise _credentials_exception()
+    return payload
+
+async def _load_current_user(username: str) -> UserInDB:
+    # Пользователь берется из кэша, файл пользователей читается только при промахе (в пуле потоков)
+    user = lookup_cached_user(username) or await run_blocking(get_cached_user, username)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
+# Функция для получения текущего пользователя из JWT токена
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    payload = decode_access_token(token)
+    return await _load_current_user(payload["sub"])
+
+# Текущий пользователь для эндпоинтов только для чтения
+async def get_current_user_readonly(token: str = Depends(oauth2_scheme)):
+    payload = decode_access_token(token)
+    if AUTH_TRUST_TOKEN_CLAIMS:
+        # Пользователь восстанавливается из подписанного токена; хеш пароля при этом недоступен
+        return UserInDB(username=payload["sub"], email=payload.get("email", ""), hashed_password="")
+    return await _load_current_user(payload["sub"])
+
 # Функция для регистрации пользователя
-def register_user(username: str, email: str, password: str):
+async def register_user(username: str, email: str, password: str, client_ip: Optional[str] = None):
+    if client_ip:
+        _check_attempt(register_ip_limiter, client_ip)
     # Проверяем, существует ли пользователь с таким именем
-    existing_user = get_user(username)
+    existing_user = await run_blocking(get_user, username)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
 
-    # Хешируем пароль и сохраняем пользователя
-    hashed_password = get_password_hash(password)
+    # Хешируем пароль и сохраняем пользователя. Пока идет хеширование, то же имя может
+    # зарегистрировать параллельный запрос, поэтому запись повторно проверяет имя атомарно
+    hashed_password = await get_password_hash_async(password)
     user = UserInDB(username=username, email=email, hashed_password=hashed_password)
-    save_user(user)
+    try:
+        await run_blocking(create_user, user)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     return user
 
 async def validate_refresh_token(refresh_token: str):
@@ -105,8 +159,10 @@ async def validate_refresh_token(refresh_token: str):
         if username is None:
             raise credentials_exception
 
+        if get_refresh_token_owner(refresh_token) != username:
+            raise credentials_exception
         user = get_user(username)
-        if user is None or user.refresh_token != refresh_token:
+        if user is None:
             raise credentials_exception
 
         return user
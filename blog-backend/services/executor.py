@@ -0,0 +1,72 @@
+import asyncio
+import contextvars
+import functools
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from typing import Callable, Dict, Optional, TypeVar
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Размер пула потоков для блокирующих операций (чтение файлов, SQLite)
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "16"))
+
+# Сколько потоков пула всегда остается для легких запросов (без группы): задачи всех групп
+# вместе занимают не больше BLOCKING_POOL_SIZE - LIGHT_RESERVED_THREADS потоков
+LIGHT_RESERVED_THREADS = int(os.getenv("LIGHT_RESERVED_THREADS", str(max(1, BLOCKING_POOL_SIZE // 4))))
+GROUPS_CONCURRENCY = max(1, BLOCKING_POOL_SIZE - LIGHT_RESERVED_THREADS)
+# По умолчанию каждая группа может занять четверть пула
+DEFAULT_GROUP_CONCURRENCY = max(2, BLOCKING_POOL_SIZE // 4)
+
+def _group_limit(group: str) -> int:
+    return int(os.getenv(f"{group.upper()}_CONCURRENCY", str(DEFAULT_GROUP_CONCURRENCY)))
+
+# Сколько запросов каждой группы может одновременно выполняться в пуле (переменные
+# окружения FEED_CONCURRENCY, POSTS_CONCURRENCY, ...). Группы у разных тяжелых эндпоинтов
+# свои, поэтому медленный поиск или перестроение ленты не задерживают остальные списки.
+# Сборка списков - работа на чистом Python под GIL: ограничение не дает тяжелым запросам
+# занять весь пул и замедлить остальные запросы
+CONCURRENCY_LIMITS = {group: _group_limit(group) for group in [
+    "feed",         # Лента пользователя (/posts/feed)
+    "posts",        # Страницы постов: свои, публичные, по тегу, авторов из подписок
+    "search",       # Поиск постов
+    "tags",         # Популярные теги
+    "public_feed",  # Перестроение снимка публичной ленты
+    "stream",       # Порции потоковой выдачи NDJSON
+]}
+
+# Общее ограничение всех групп
+_GROUPS = "*"
+
+T = TypeVar("T")
+
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_POOL_SIZE, thread_name_prefix="blocking")
+# Семафоры групп привязаны к циклу событий, поэтому создаются для каждого цикла отдельно
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+def _semaphore(group: str) -> asyncio.Semaphore:
+    semaphores = _semaphores.setdefault(asyncio.get_running_loop(), {})
+    semaphore = semaphores.get(group)
+    if semaphore is None:
+        limit = GROUPS_CONCURRENCY if group == _GROUPS else CONCURRENCY_LIMITS[group]
+        semaphore = semaphores[group] = asyncio.Semaphore(limit)
+    return semaphore
+
+async def run_blocking(func: Callable[..., T], *args, group: Optional[str] = None, **kwargs) -> T:
+    """
+    Выполняет блокирующую функцию в пуле потоков, не останавливая цикл событий.
+    Если указана группа, запрос ждет свободного места в ней и в общем ограничении групп
+    до того, как занять поток пула.
+    """
+    loop = asyncio.get_running_loop()
+    # Поток пула выполняет функцию в копии контекста запроса, как asyncio.to_thread:
+    # так вызовы репозиториев попадают в разбивку запроса (repositories.instrumentation)
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    if group is None:
+        return await loop.run_in_executor(_executor, call)
+    async with _semaphore(group), _semaphore(_GROUPS):
+        return await loop.run_in_executor(_executor, call)
@@ -0,0 +1,99 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Число процессов для bcrypt и максимальное число операций в работе и в очереди.
+# Каждый воркер uvicorn запускает свой пул, поэтому PASSWORD_POOL_SIZE задается
+# на весь сервер и делится между WEB_CONCURRENCY воркерами (не меньше процесса на воркер)
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+PASSWORD_POOL_SIZE = max(1, int(os.getenv("PASSWORD_POOL_SIZE", "2")) // WEB_CONCURRENCY)
+PASSWORD_QUEUE_SIZE = int(os.getenv("PASSWORD_QUEUE_SIZE", "32"))
+
+# Конфигурация для хеширования паролей
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Функция для проверки пароля
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+# Функция для хеширования пароля
+def get_password_hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = 0
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: дочерние процессы не наследуют потоки и блокировки веб-сервера
+                _pool = ProcessPoolExecutor(
+                    max_workers=PASSWORD_POOL_SIZE,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, try again later",
+        headers={"Retry-After": "1"},
+    )
+
+def _reset_pool(broken: ProcessPoolExecutor):
+    # Пул с аварийно завершившимся процессом больше не принимает задачи: создается новый
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False)
+
+async def _run(func, *args):
+    pool = _get_pool()
+    try:
+        return await asyncio.wrap_future(pool.submit(func, *args))
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        raise
+
+async def _submit(func, *args):
+    """
+    Выполняет функцию bcrypt в отдельном процессе.
+    Если очередь заполнена, запрос сразу отклоняется с 503, а не ждет,
+    занимая память и соединение: так всплеск входов не вытесняет остальной трафик.
+    Если процесс пула аварийно завершился, пул пересоздается и операция повторяется
+    один раз; при повторном сбое запрос получает 503.
+    """
+    global _pending
+    with _pool_lock:
+        if _pending >= PASSWORD_QUEUE_SIZE:
+            raise _busy()
+        _pending += 1
+    try:
+        for attempt in range(2):
+            try:
+                return await _run(func, *args)
+            except BrokenProcessPool:
+                if attempt:
+                    raise _busy()
+    finally:
+        with _pool_lock:
+            _pending -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _submit(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _submit(get_password_hash, password)
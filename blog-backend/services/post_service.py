@@ -3,29 +3,29 @@ from repositories.post_repository import (
     get_comments_by_post,
     get_my_post_access_requests,
     get_access_requests_for_my_posts,
-    get_posts_by_author,
-    get_public_posts,
     save_post,
     update_post,
     delete_post,
     get_post_by_id,
     save_access_request,
     get_access_requests_by_post,
-    get_access_requests_by_requester,
+    get_access_request_statuses,
     update_access_request_status,
     save_access,
     get_access_by_post,
     delete_access,
-    get_inaccessible_private_posts,
-    get_accessible_private_posts,
-    read_posts_from_file,
-    get_latest_comment
+    get_granted_post_ids,
+    get_posts_page,
+    get_posts_by_author_page,
+    get_public_posts_page,
+    get_latest_comments
 )
-from repositories.user_repository import is_user_subscribed
+from repositories.user_repository import get_followed_usernames
+from repositories.pagination import resolve_page, fetch_limit, split_page, decode_cursor, iter_chunks
 from models.post import PostWithDetails, Post, PostCreate, PostAccessRequest, PostAccess, Comment
 from datetime import datetime
 import uuid
-from typing import List
+from typing import Iterator, List, Optional, Tuple
 
 def create_post(post: PostCreate, author: str) -> Post:
     post_data = Post(
@@ -40,11 +40,34 @@ def create_post(post: PostCreate, author: str) -> Post:
     save_post(post_data)
     return post_data
 
-def get_user_posts(author: str) -> list[Post]:
-    return get_posts_by_author(author)
+def get_user_posts(author: str, cursor: Optional[str] = None, limit: Optional[int] = None) -> Tuple[List[Post], Optional[str]]:
+    """
+    Возвращает страницу постов автора и курсор следующей страницы.
+    """
+    after, limit = resolve_page(cursor, limit)
+    return split_page(get_posts_by_author_page(author, after, fetch_limit(limit)), limit)
 
-def get_all_public_posts() -> list[Post]:
-    return get_public_posts()
+def get_all_public_posts(cursor: Optional[str] = None, limit: Optional[int] = None) -> Tuple[List[Post], Optional[str]]:
+    """
+    Возвращает страницу публичных постов и курсор следующей страницы.
+    """
+    after, limit = resolve_page(cursor, limit)
+    return split_page(get_public_posts_page(after, fetch_limit(limit)), limit)
+
+def iter_user_posts(author: str, cursor: Optional[str] = None, limit: Optional[int] = None) -> Iterator[List[Post]]:
+    """
+    Посты автора порциями для потоковой выдачи: все посты после курсора (не больше limit).
+    Некорректный курсор вызывает ValueError сразу, до чтения первой порции.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    return iter_chunks(lambda after, size: get_posts_by_author_page(author, after, size), after, limit)
+
+def iter_public_posts(cursor: Optional[str] = None, limit: Optional[int] = None) -> Iterator[List[Post]]:
+    """
+    Публичные посты порциями для потоковой выдачи, как iter_user_posts.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    return iter_chunks(get_public_posts_page, after, limit)
 
 def update_user_post(post_id: str, updated_post: PostCreate, author: str) -> Post:
     # Получаем текущий пост
@@ -148,83 +171,77 @@ def get_comments_for_post(post_id: str, current_username: str) -> List[Comment]:
     # Получаем комментарии
     return get_comments_by_post(post_id)
 
-def get_user_feed(current_username: str) -> List[PostWithDetails]:
+def get_user_feed(
+    current_username: str, cursor: Optional[str] = None, limit: Optional[int] = None
+) -> Tuple[List[PostWithDetails], Optional[str]]:
     """
-    Возвращает ленту постов для авторизованного пользователя.
+    Возвращает страницу ленты авторизованного пользователя и курсор следующей страницы.
+    В ленту входят все посты в порядке (created_at, id): собственные, публичные,
+    приватные с доступом и приватные без доступа (только заголовок и автор).
     Для каждого поста добавляет информацию о подписке и последнем комментарии.
+    Дополнительные данные собираются только для постов текущей страницы.
     """
-    # Получаем все посты текущего пользователя
-    user_posts = get_posts_by_author(current_username)
-    # Получаем все публичные посты других пользователей
-    public_posts = get_public_posts()
-    other_public_posts = [post for post in public_posts if post.author != current_username]
-    # Получаем приватные посты других пользователей, на которые есть доступ
-    accessible_private_posts = get_accessible_private_posts(current_username)
-    # Получаем заголовки и логины авторов приватных постов, на которые нет доступа
-    inaccessible_private_posts = get_inaccessible_private_posts(current_username)
-    # Добавляем статус доступа к каждому посту
-    for post in user_posts:
-        post.access_status = "approved"  # У автора всегда есть доступ к своим постам
-    for post in other_public_posts:
-        post.access_status = "approved"  # Публичные посты доступны всем
-    for post in accessible_private_posts:
-        post.access_status = "approved"  # Приватные посты с доступом
-    for post in inaccessible_private_posts:
-        # Проверяем, есть ли запрос на доступ
-        access_requests = get_access_requests_by_requester(current_username)
-        request = next((r for r in access_requests if r.post_id == post.id), None)
-        if request:
-            post.access_status = request.status  # "pending" или "rejected"
+    after, limit = resolve_page(cursor, limit)
+    posts, next_cursor = split_page(get_posts_page(after, fetch_limit(limit)), limit)
+    granted_post_ids = get_granted_post_ids(current_username)
+    inaccessible_posts = []
+    for post in posts:
+        # Свои посты, публичные посты и приватные посты с доступом доступны полностью
+        if post.author == current_username or post.is_public or post.id in granted_post_ids:
+            post.access_status = "approved"
         else:
-            post.access_status = ""  # Запрос не отправлялся            
-    # Объединяем все посты в ленту
-    feed = user_posts + other_public_posts + accessible_private_posts + inaccessible_private_posts
-    # Убираем дубликаты (если есть)
-    unique_feed = list({post.id: post for post in feed}.values())
-    # Добавляем информацию о подписке и последнем комментарии
+            # Для приватных постов без доступа оставляем только заголовок и автора
+            post.content = ""
+            post.tags = []
+            inaccessible_posts.append(post)
+    if inaccessible_posts:
+        # Статусы запросов на доступ: "pending", "rejected" или "" (запрос не отправлялся)
+        request_statuses = get_access_request_statuses(current_username)
+        for post in inaccessible_posts:
+            post.access_status = request_statuses.get(post.id, "")
+    # Авторы, на которых подписан пользователь, и последние комментарии к постам страницы
+    followed_usernames = get_followed_usernames(current_username)
+    latest_comments = get_latest_comments(post.id for post in posts)
     feed_out = []
-    for post in unique_feed:
-        # Проверяем, подписан ли пользователь на автора поста
-        is_subscribed = is_user_subscribed(current_username, post.author)
-        # Получаем последний комментарий к посту
-        latest_comment = get_latest_comment(post.id)
-        latest_comment = latest_comment.dict() if latest_comment else None
-        # Формируем объект поста с дополнительной информацией
+    for post in posts:
+        # Формируем объект поста с дополнительной информацией.
+        # Поля поста берутся без post.dict(): модель уже проверена при чтении и не копируется заново
         post_with_details = PostWithDetails(
-            **post.dict(),
-            is_subscribed=is_subscribed,
-            latest_comment=latest_comment,
-            # access_status=access_status
+            **vars(post),
+            is_subscribed=post.author in followed_usernames,
+            latest_comment=latest_comments.get(post.id),
         )
         feed_out.append(post_with_details)
-    return feed_out
+    return feed_out, next_cursor
+
+def public_feed_item(post: Post, latest_comment: Optional[Comment]) -> PostWithDetails:
+    """
+    Пост в виде элемента публичной ленты: у приватных постов скрыто содержимое
+    и нет последнего комментария.
+    """
+    if not post.is_public:
+        # Для приватных постов скрываем содержимое
+        post.content = ""
+        return PostWithDetails(
+            **vars(post),
+            latest_comment=None
+        )
+    # Публичные посты возвращаются как есть
+    return PostWithDetails(
+        **vars(post),  # Копируем все поля из Post
+        latest_comment=latest_comment
+    )
 
-def get_all_posts_for_public_feed() -> List[PostWithDetails]:
+def get_all_posts_for_public_feed(
+    cursor: Optional[str] = None, limit: Optional[int] = None
+) -> Tuple[List[PostWithDetails], Optional[str]]:
     """
-    Получить все посты для ленты неавторизованных пользователей.
+    Получить страницу постов для ленты неавторизованных пользователей и курсор следующей страницы.
     Для приватных постов скрывает содержимое.
+    Эндпоинт /posts/public/feed отдает ту же ленту из снимка services.public_feed.
     """
-    # Чтение постов из базы данных (файла)
-    posts = read_posts_from_file()
-    # Обработка постов
-    processed_posts = []
-    for post in posts:
-        if not post.is_public:
-            # Для приватных постов скрываем содержимое
-            post.content = ""
-            processed_posts.append(
-                PostWithDetails(
-                    **post.dict(),
-                    latest_comment=None 
-                )
-            )
-        else:
-            # Публичные посты возвращаются как есть
-            latest_comment = get_latest_comment(post.id)
-            processed_posts.append(
-                PostWithDetails(
-                    **post.dict(),  # Копируем все поля из Post
-                    latest_comment=latest_comment
-                )
-            )
-    return processed_posts
\ No newline at end of file
+    after, limit = resolve_page(cursor, limit)
+    posts, next_cursor = split_page(get_posts_page(after, fetch_limit(limit)), limit)
+    # Последние комментарии нужны только к публичным постам страницы
+    latest_comments = get_latest_comments(post.id for post in posts if post.is_public)
+    return [public_feed_item(post, latest_comments.get(post.id)) for post in posts], next_cursor
@@ -0,0 +1,181 @@
+import threading
+from bisect import bisect_right, insort
+from typing import Dict, Iterator, List, Optional, Tuple
+from models.post import Post, Comment
+from repositories import pagination, post_repository, versions
+from repositories.pagination import PostKey, decode_cursor, encode_cursor, post_key, resolve_page
+from repositories.storage import get_storage
+from services.post_service import get_all_posts_for_public_feed, public_feed_item
+from services.serialization import dumps
+
+class PublicFeedSnapshot:
+    """
+    Материализованная публичная лента (/posts/public/feed).
+
+    Лента одинакова для всех посетителей, поэтому каждый ее элемент хранится
+    уже сериализованным в JSON, а ответ собирается склейкой байтов.
+    Снимок строится один раз и затем обновляется по событиям post_repository
+    (создание, изменение, удаление поста, новый комментарий), затрагивая только один пост.
+    Записи других процессов приходят теми же событиями через журнал изменений
+    (repositories.versions), а при изменении данных в обход репозиториев сдвигается
+    эпоха, и снимок строится заново.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._keys: List[PostKey] = []
+        self._key_by_id: Dict[str, PostKey] = {}
+        self._items: Dict[str, bytes] = {}
+        self._public: Dict[str, bool] = {}
+        # Дата последнего комментария публичного поста
+        self._latest_at: Dict[str, str] = {}
+        self._full_body: Optional[bytes] = None
+        # Эпоха repositories.versions, с которой согласован снимок
+        self._epoch = None
+        post_repository.add_change_listener(self._on_change)
+
+    def is_fresh(self) -> bool:
+        # События других процессов доставляются в ensure_fresh.
+        # Проверка читает журнал изменений: вызывается в пуле потоков, а не в цикле событий
+        current_epoch = versions.check(dispatch=False)
+        return self._built and self._epoch == current_epoch and not versions.has_pending()
+
+    def ensure_fresh(self):
+        """
+        Перестраивает снимок, если он еще не построен или расходится с хранилищем.
+        Параллельные запросы ждут одного перестроения.
+        """
+        # Проверка журнала вызывает подписчиков, поэтому выполняется до блокировки снимка
+        current_epoch = versions.check()
+        with self._lock:
+            if not self._built or self._epoch != current_epoch:
+                self.rebuild()
+
+    def rebuild(self):
+        """
+        Строит снимок по всем постам хранилища.
+        """
+        with self._lock:
+            self._epoch = versions.epoch()
+            items, _ = get_all_posts_for_public_feed()
+            self._keys = []
+            self._key_by_id = {}
+            self._items = {}
+            self._public = {}
+            self._latest_at = {}
+            for item in items:
+                self._store(item)
+            self._built = True
+            self._changed()
+
+    def _store(self, item):
+        key = post_key(item)
+        self._keys.append(key)
+        self._key_by_id[item.id] = key
+        self._items[item.id] = dumps(item)
+        self._public[item.id] = item.is_public
+        if item.latest_comment is not None:
+            self._latest_at[item.id] = str(item.latest_comment.created_at)
+
+    def _changed(self):
+        self._full_body = None
+
+    def _remove(self, post_id: str):
+        key = self._key_by_id.pop(post_id, None)
+        if key is None:
+            return
+        position = bisect_right(self._keys, key) - 1
+        if position >= 0 and self._keys[position] == key:
+            del self._keys[position]
+        del self._items[post_id]
+        del self._public[post_id]
+        self._latest_at.pop(post_id, None)
+
+    def _put(self, post: Post, latest_comment: Optional[Comment]):
+        item = public_feed_item(post.copy(), latest_comment)
+        key = post_key(item)
+        insort(self._keys, key)
+        self._key_by_id[post.id] = key
+        self._items[post.id] = dumps(item)
+        self._public[post.id] = post.is_public
+        if latest_comment is not None:
+            self._latest_at[post.id] = str(latest_comment.created_at)
+
+    def _on_change(self, event: str, payload):
+        with self._lock:
+            # Снимок еще не построен или данные менялись в обход репозитория: его перестроит следующий запрос
+            if not self._built or self._epoch != versions.epoch():
+                self._built = False
+                return
+            if event in ("post_saved", "post_updated"):
+                # События параллельных изменений могут прийти не по порядку, поэтому
+                # пост перечитывается из хранилища, а не берется из события
+                self._remove(payload.id)
+                post = get_storage().get_post(payload.id)
+                if post is not None:
+                    latest_comment = None
+                    if post.is_public:
+                        latest_comment = post_repository.get_latest_comments([post.id]).get(post.id)
+                    self._put(post, latest_comment)
+            elif event == "post_deleted":
+                self._remove(payload)
+            elif event == "comment_saved":
+                comment = payload
+                created_at = str(comment.created_at)
+                # Комментарий меняет ленту, только если он новее последнего у публичного поста
+                post = None
+                if self._public.get(comment.post_id) and created_at >= self._latest_at.get(comment.post_id, ""):
+                    post = get_storage().get_post(comment.post_id)
+                if post is not None:
+                    self._remove(comment.post_id)
+                    self._put(post, comment)
+                else:
+                    return
+            self._changed()
+
+    def render(self, cursor: Optional[str], limit: Optional[int]) -> Tuple[bytes, Optional[str]]:
+        """
+        Возвращает тело ответа (JSON-массив) и курсор следующей страницы.
+        Перед вызовом снимок должен быть актуален (is_fresh), иначе нужно вызвать ensure_fresh.
+        """
+        after, limit = resolve_page(cursor, limit)
+        with self._lock:
+            if after is None and limit is None:
+                if self._full_body is None:
+                    self._full_body = b"[" + b",".join(self._items[key[1]] for key in self._keys) + b"]"
+                return self._full_body, None
+            start = bisect_right(self._keys, after) if after is not None else 0
+            end = len(self._keys) if limit is None else min(start + limit, len(self._keys))
+            page_keys = self._keys[start:end]
+            body = b"[" + b",".join(self._items[key[1]] for key in page_keys) + b"]"
+            next_cursor = encode_cursor(page_keys[-1]) if page_keys and end < len(self._keys) else None
+            return body, next_cursor
+
+    def iter_ndjson(self, cursor: Optional[str], limit: Optional[int]) -> Iterator[bytes]:
+        """
+        Лента после курсора (не больше limit постов) в формате NDJSON порциями по
+        pagination.STREAM_CHUNK_SIZE строк. Блокировка снимка берется на время сборки
+        одной порции, поэтому медленный клиент не задерживает обновления ленты.
+        Перед вызовом снимок должен быть актуален, как для render.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        return self._ndjson_chunks(after, limit)
+
+    def _ndjson_chunks(self, after: Optional[PostKey], limit: Optional[int]) -> Iterator[bytes]:
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = pagination.STREAM_CHUNK_SIZE if remaining is None else min(pagination.STREAM_CHUNK_SIZE, remaining)
+            with self._lock:
+                start = bisect_right(self._keys, after) if after is not None else 0
+                chunk_keys = self._keys[start:start + size]
+                chunk = b"".join(self._items[key[1]] + b"\n" for key in chunk_keys)
+            if not chunk_keys:
+                return
+            yield chunk
+            after = chunk_keys[-1]
+            if remaining is not None:
+                remaining -= len(chunk_keys)
+
+# Снимок публичной ленты процесса
+public_feed_snapshot = PublicFeedSnapshot()
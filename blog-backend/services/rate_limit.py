@@ -0,0 +1,53 @@
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict
+
+class AttemptLimiter:
+    """
+    Ограничитель числа попыток в скользящем окне: не более limit попыток
+    по одному ключу (имени пользователя, IP-адресу) за window секунд.
+    """
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self._attempts: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + window
+
+    def _prune(self, attempts: Deque[float], now: float):
+        while attempts and attempts[0] <= now - self.window:
+            attempts.popleft()
+
+    def _sweep(self, now: float):
+        # Периодически удаляем ключи без попыток в текущем окне, чтобы словарь не рос бесконечно
+        for key in list(self._attempts):
+            self._prune(self._attempts[key], now)
+            if not self._attempts[key]:
+                del self._attempts[key]
+        self._next_sweep = now + self.window
+
+    def hit(self, key: str) -> float:
+        """
+        Регистрирует попытку. Возвращает 0, если попытка разрешена,
+        иначе - через сколько секунд можно будет повторить.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            attempts = self._attempts.setdefault(key, deque())
+            self._prune(attempts, now)
+            if len(attempts) >= self.limit:
+                return attempts[0] + self.window - now
+            attempts.append(now)
+            return 0
+
+    def reset(self, key: str):
+        with self._lock:
+            self._attempts.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._attempts.clear()
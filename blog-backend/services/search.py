@@ -0,0 +1,441 @@
+import base64
+import binascii
+import heapq
+import math
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from models.post import Post
+from repositories import post_repository, versions
+from repositories.pagination import DEFAULT_PAGE_LIMIT
+from repositories.storage import get_storage
+
+# Параметры ранжирования BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Слова заголовка учитываются с этим весом (как если бы заголовок повторялся)
+TITLE_WEIGHT = 2
+# Посты для построения индекса читаются порциями, чтобы не держать все тексты в памяти
+_BUILD_BATCH_SIZE = 1000
+
+# Вклад термина в документ хранится целым числом 0..65535 (доля от максимума k1 + 1)
+_IMPACT_SCALE = 65535
+# Для терминов, встречающихся хотя бы в такой доле постов, вклады дополнительно хранятся
+# плотным массивом по номеру документа: при оценке кандидатов они читаются без бинарного поиска
+_DENSE_RATIO = 0.1
+
+_TOKEN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+def encode_offset(offset: int) -> str:
+    return base64.urlsafe_b64encode(str(offset).encode("ascii")).decode("ascii").rstrip("=")
+
+def decode_offset(cursor: str) -> int:
+    try:
+        offset = int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Некорректный курсор")
+    if offset < 0:
+        raise ValueError("Некорректный курсор")
+    return offset
+
+class _Postings:
+    """
+    Список вхождений термина в двух порядках: по номеру документа (для проверки
+    вхождения бинарным поиском) и по убыванию вклада (для отбора лучших документов).
+    Для тегов (ranked=False) хранится только первый порядок.
+    """
+
+    __slots__ = ("ranked", "docs", "impacts", "ranked_docs", "ranks", "dense")
+
+    def __init__(self, ranked: bool = True):
+        self.ranked = ranked
+        self.docs = array("I")
+        self.impacts = array("H")
+        self.ranked_docs = array("I")
+        # _IMPACT_SCALE - вклад: по возрастанию ранга идут документы с наибольшим вкладом
+        self.ranks = array("H")
+        # Вклады по номеру документа для частых терминов (см. densify)
+        self.dense: Optional[array] = None
+
+    @classmethod
+    def build(cls, docs: List[int], impacts: List[int], ranked: bool = True) -> "_Postings":
+        """
+        Создает список вхождений по документам, упорядоченным по возрастанию номера.
+        """
+        postings = cls(ranked)
+        postings.docs = array("I", docs)
+        postings.impacts = array("H", impacts)
+        if ranked:
+            order = sorted(range(len(docs)), key=impacts.__getitem__, reverse=True)
+            postings.ranked_docs = array("I", [docs[position] for position in order])
+            postings.ranks = array("H", [_IMPACT_SCALE - impacts[position] for position in order])
+        return postings
+
+    def densify(self, size: int):
+        self.dense = array("H", bytes(2 * size))
+        for doc, impact in zip(self.docs, self.impacts):
+            self.dense[doc] = impact
+
+    def add(self, doc: int, impact: int):
+        if self.dense is not None:
+            if doc >= len(self.dense):
+                self.dense.extend(array("H", bytes(2 * (doc + 1 - len(self.dense)))))
+            self.dense[doc] = impact
+        position = bisect_left(self.docs, doc)
+        self.docs.insert(position, doc)
+        self.impacts.insert(position, impact)
+        if not self.ranked:
+            return
+        rank = _IMPACT_SCALE - impact
+        position = bisect_right(self.ranks, rank)
+        self.ranks.insert(position, rank)
+        self.ranked_docs.insert(position, doc)
+
+    def remove(self, doc: int):
+        position = bisect_left(self.docs, doc)
+        if position == len(self.docs) or self.docs[position] != doc:
+            return
+        rank = _IMPACT_SCALE - self.impacts[position]
+        if self.dense is not None:
+            self.dense[doc] = 0
+        del self.docs[position]
+        del self.impacts[position]
+        if not self.ranked:
+            return
+        position = bisect_left(self.ranks, rank)
+        while self.ranked_docs[position] != doc:
+            position += 1
+        del self.ranks[position]
+        del self.ranked_docs[position]
+
+    def impact(self, doc: int) -> int:
+        if self.dense is not None:
+            return self.dense[doc] if doc < len(self.dense) else 0
+        position = bisect_left(self.docs, doc)
+        if position < len(self.docs) and self.docs[position] == doc:
+            return self.impacts[position]
+        return 0
+
+    def __contains__(self, doc: int) -> bool:
+        position = bisect_left(self.docs, doc)
+        return position < len(self.docs) and self.docs[position] == doc
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+class SearchIndex:
+    """
+    Инвертированный индекс постов для /posts/search с ранжированием BM25.
+
+    Индекс строится из хранилища при первом поиске и затем обновляется по событиям
+    post_repository (создание, изменение, удаление поста). Номера документов выдаются
+    в порядке (created_at, id), поэтому больший номер означает более новый пост.
+    Вхождения терминов и тегов хранятся в массивах array, а не в объектах Python.
+
+    Лучшие документы отбираются пороговым алгоритмом: списки вхождений терминов
+    просматриваются по убыванию вклада, и просмотр заканчивается, как только
+    k-й найденный результат не хуже максимально возможной оценки непросмотренных
+    документов. Поэтому даже частые слова не требуют просмотра всех вхождений.
+    Видимость (публичный пост, свой пост, разрешение на просмотр) и теги
+    проверяются для каждого кандидата по данным индекса.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._epoch = None
+        self._reset()
+        post_repository.add_change_listener(self._on_change)
+
+    def _reset(self):
+        self._post_doc: Dict[str, int] = {}
+        self._doc_post: List[Optional[str]] = []
+        self._doc_author: List[Optional[str]] = []
+        # 0 - документ удален, 1 - приватный пост, 2 - публичный
+        self._doc_state = bytearray()
+        self._doc_length = array("I")
+        self._doc_terms: List[Optional[Tuple[str, ...]]] = []
+        self._doc_tags: List[Tuple[str, ...]] = []
+        self._terms: Dict[str, _Postings] = {}
+        self._tags: Dict[str, _Postings] = {}
+        self._live = 0
+        self._total_length = 0
+
+    def _on_change(self, event: str, payload):
+        with self._lock:
+            # Индекс еще не построен или данные менялись в обход репозитория: его перестроит следующий поиск
+            if not self._built or self._epoch != versions.epoch():
+                self._built = False
+                return
+            if event in ("post_saved", "post_updated"):
+                # Пост, записанный другим процессом, мог попасть в индекс при построении
+                doc = self._post_doc.get(payload.id)
+                if doc is None:
+                    doc = self._new_doc(payload.id)
+                else:
+                    self._remove(doc)
+                self._add(payload, doc)
+            elif event == "post_deleted":
+                doc = self._post_doc.pop(payload, None)
+                if doc is not None:
+                    self._remove(doc)
+                    self._doc_post[doc] = None
+
+    def ensure_built(self):
+        current_epoch = versions.check()
+        with self._lock:
+            if not self._built or self._epoch != current_epoch:
+                self.rebuild(current_epoch)
+
+    def rebuild(self, current_epoch: int):
+        """
+        Строит индекс по всем постам хранилища.
+        """
+        with self._lock:
+            self._reset()
+            storage = get_storage()
+            # При построении вхождения собираются в списки (номер документа, частота),
+            # вклады вычисляются после подсчета средней длины документа по всему корпусу
+            term_docs: Dict[str, Tuple[List[int], List[int]]] = {}
+            tag_docs: Dict[str, List[int]] = {}
+            after = None
+            while True:
+                batch = storage.list_posts_page(after, _BUILD_BATCH_SIZE)
+                for post in batch:
+                    doc = self._new_doc(post.id)
+                    frequencies, _ = self._register(post, doc)
+                    for term, frequency in frequencies.items():
+                        entry = term_docs.get(term)
+                        if entry is None:
+                            entry = term_docs[term] = ([], [])
+                        entry[0].append(doc)
+                        entry[1].append(frequency)
+                    for tag in self._doc_tags[doc]:
+                        tag_docs.setdefault(tag, []).append(doc)
+                if len(batch) < _BUILD_BATCH_SIZE:
+                    break
+                after = (str(batch[-1].created_at), batch[-1].id)
+            impact = self._impact_function()
+            lengths = self._doc_length
+            for term, (docs, frequencies) in term_docs.items():
+                impacts = [impact(frequency, lengths[doc]) for doc, frequency in zip(docs, frequencies)]
+                postings = self._terms[term] = _Postings.build(docs, impacts)
+                if len(docs) >= _DENSE_RATIO * self._live:
+                    postings.densify(len(self._doc_post))
+            for tag, docs in tag_docs.items():
+                self._tags[tag] = _Postings.build(docs, [0] * len(docs), ranked=False)
+            self._built = True
+            self._epoch = current_epoch
+
+    def _new_doc(self, post_id: str) -> int:
+        doc = len(self._doc_post)
+        self._post_doc[post_id] = doc
+        self._doc_post.append(post_id)
+        self._doc_author.append(None)
+        self._doc_state.append(0)
+        self._doc_length.append(0)
+        self._doc_terms.append(None)
+        self._doc_tags.append(())
+        return doc
+
+    def _register(self, post: Post, doc: int) -> Tuple[Dict[str, int], int]:
+        frequencies: Dict[str, int] = {}
+        for weight, text in [(TITLE_WEIGHT, post.title), (1, post.content), (1, " ".join(post.tags))]:
+            for token in tokenize(text):
+                frequencies[token] = frequencies.get(token, 0) + weight
+        length = sum(frequencies.values())
+        self._doc_author[doc] = post.author
+        self._doc_state[doc] = 2 if post.is_public else 1
+        self._doc_length[doc] = length
+        self._doc_terms[doc] = tuple(frequencies)
+        self._doc_tags[doc] = tuple(post.tags)
+        self._live += 1
+        self._total_length += length
+        return frequencies, length
+
+    def _impact_function(self) -> Callable[[int, int], int]:
+        # Средняя длина берется на момент вычисления вклада: при добавлении поста
+        # вклады остальных постов не пересчитываются
+        average_length = max(self._total_length / self._live if self._live else 1, 1)
+        base = BM25_K1 * (1 - BM25_B)
+        per_length = BM25_K1 * BM25_B / average_length
+
+        def impact(frequency: int, length: int) -> int:
+            return round(frequency / (frequency + base + per_length * length) * _IMPACT_SCALE)
+        return impact
+
+    def _add(self, post: Post, doc: int):
+        frequencies, length = self._register(post, doc)
+        impact = self._impact_function()
+        for term, frequency in frequencies.items():
+            self._terms.setdefault(term, _Postings()).add(doc, impact(frequency, length))
+        for tag in self._doc_tags[doc]:
+            self._tags.setdefault(tag, _Postings(ranked=False)).add(doc, 0)
+
+    def _remove(self, doc: int):
+        for term in self._doc_terms[doc] or ():
+            postings = self._terms[term]
+            postings.remove(doc)
+            if not postings:
+                del self._terms[term]
+        for tag in self._doc_tags[doc]:
+            postings = self._tags[tag]
+            postings.remove(doc)
+            if not postings:
+                del self._tags[tag]
+        if self._doc_state[doc]:
+            self._live -= 1
+            self._total_length -= self._doc_length[doc]
+        self._doc_state[doc] = 0
+        self._doc_terms[doc] = None
+        self._doc_tags[doc] = ()
+
+    def _idf(self, postings: _Postings) -> float:
+        frequency = len(postings)
+        return math.log(1 + (self._live - frequency + 0.5) / (frequency + 0.5))
+
+    def search(
+        self,
+        query: str,
+        tags: Iterable[str],
+        username: str,
+        load_granted_post_ids: Callable[[], Set[str]],
+        offset: int,
+        limit: int,
+    ) -> List[str]:
+        """
+        Возвращает ID постов страницы результатов: по убыванию оценки BM25,
+        а без поисковых слов (только теги) - от новых постов к старым.
+        Разрешения пользователя загружаются (load_granted_post_ids), только если
+        среди кандидатов встретился чужой приватный пост.
+        """
+        granted_post_ids: Optional[Set[str]] = None
+        self.ensure_built()
+        with self._lock:
+            terms = [self._terms.get(term) for term in dict.fromkeys(tokenize(query))]
+            tag_postings = [self._tags.get(tag) for tag in dict.fromkeys(tags)]
+            if any(postings is None for postings in tag_postings):
+                return []
+            tag_postings.sort(key=len)
+            # Слова, которых нет ни в одном посте, не влияют на результат
+            weighted = [(self._idf(postings), postings) for postings in terms if postings is not None]
+            if query.strip() and not weighted:
+                return []
+
+            def accept(doc: int) -> bool:
+                nonlocal granted_post_ids
+                state = self._doc_state[doc]
+                if not state:
+                    return False
+                if state == 1 and self._doc_author[doc] != username:
+                    if granted_post_ids is None:
+                        granted_post_ids = load_granted_post_ids()
+                    if self._doc_post[doc] not in granted_post_ids:
+                        return False
+                return all(doc in postings for postings in tag_postings)
+
+            count = offset + limit
+            if not weighted:
+                if not tag_postings:
+                    return []
+                docs = self._newest(tag_postings[0], accept, count)
+            elif tag_postings and len(tag_postings[0]) <= sum(len(postings) for _, postings in weighted):
+                # Редкий тег: оцениваем только помеченные им посты
+                docs = self._score_candidates(reversed(tag_postings[0].docs), weighted, accept, count)
+            else:
+                docs = self._top(weighted, accept, count)
+            return [self._doc_post[doc] for doc in docs[offset:]]
+
+    def _newest(self, postings: _Postings, accept: Callable[[int], bool], count: int) -> List[int]:
+        docs = []
+        for doc in reversed(postings.docs):
+            if accept(doc):
+                docs.append(doc)
+                if len(docs) == count:
+                    break
+        return docs
+
+    def _score(self, doc: int, weighted: List[Tuple[float, _Postings]]) -> float:
+        return sum(idf * postings.impact(doc) for idf, postings in weighted)
+
+    def _score_candidates(self, docs, weighted, accept, count: int) -> List[int]:
+        best: List[Tuple[float, int]] = []
+        for doc in docs:
+            if not accept(doc):
+                continue
+            score = self._score(doc, weighted)
+            if score > 0:
+                best.append((score, doc))
+        return [doc for _, doc in heapq.nlargest(count, best)]
+
+    def _top(self, weighted: List[Tuple[float, _Postings]], accept, count: int) -> List[int]:
+        # Пороговый алгоритм: списки вхождений просматриваются по убыванию вклада,
+        # на каждом шаге продвигается список с наибольшим текущим вкладом idf * impact
+        # (частые слова с малым idf почти не просматриваются), и для документа
+        # вычисляется полная оценка
+        heap: List[Tuple[float, int]] = []
+        seen: Set[int] = set()
+        positions = [0] * len(weighted)
+        while True:
+            threshold = 0.0
+            best = -1
+            best_value = -1.0
+            for index, (idf, postings) in enumerate(weighted):
+                position = positions[index]
+                if position < len(postings.ranks):
+                    value = idf * (_IMPACT_SCALE - postings.ranks[position])
+                    threshold += value
+                    if value > best_value:
+                        best, best_value = index, value
+            # Непросмотренные документы не могут набрать больше threshold
+            if best < 0 or (len(heap) == count and heap[0][0] >= threshold):
+                break
+            idf, postings = weighted[best]
+            doc = postings.ranked_docs[positions[best]]
+            positions[best] += 1
+            if doc in seen:
+                continue
+            seen.add(doc)
+            # Вклад текущего списка уже известен, остальные ищутся бинарным поиском
+            score = best_value + sum(
+                other_idf * other.impact(doc) for other_idf, other in weighted if other is not postings
+            )
+            entry = (score, doc)
+            full = len(heap) == count
+            # Видимость проверяется только для документов, которые попадают в результат
+            if (full and entry <= heap[0]) or not accept(doc):
+                continue
+            if full:
+                heapq.heapreplace(heap, entry)
+            else:
+                heapq.heappush(heap, entry)
+        return [doc for _, doc in sorted(heap, reverse=True)]
+
+# Поисковый индекс процесса
+search_index = SearchIndex()
+
+def search_posts(
+    query: str,
+    tags: List[str],
+    username: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Tuple[List[Post], Optional[str]]:
+    """
+    Поиск постов по словам заголовка, текста и тегов с фильтром по тегам.
+    Возвращает страницу видимых пользователю постов и курсор следующей страницы.
+    """
+    offset = decode_offset(cursor) if cursor else 0
+    limit = limit or DEFAULT_PAGE_LIMIT
+    # Запрашиваем на один результат больше, чтобы узнать, есть ли следующая страница
+    post_ids = search_index.search(
+        query, tags, username, lambda: post_repository.get_granted_post_ids(username), offset, limit + 1
+    )
+    posts = post_repository.get_posts_by_ids(post_ids[:limit])
+    next_cursor = encode_offset(offset + limit) if len(post_ids) > limit else None
+    return posts, next_cursor
@@ -0,0 +1,44 @@
+from typing import Iterable, Mapping, Optional
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+
+# Сериализация ответов в JSON через orjson.
+#
+# Модели из репозиториев уже проверены pydantic при чтении, поэтому ответы
+# со списками постов не проходят через jsonable_encoder (он заново обходит каждое
+# поле каждой модели) и сразу кодируются в байты. Результат совпадает байт в байт
+# с JSONResponse, которым FastAPI отдает response_model: компактный JSON в UTF-8
+# без экранирования не-ASCII символов, даты в формате isoformat().
+
+# Формат потоковой выдачи списков: по одному JSON-объекту в строке
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def _default(value):
+    if isinstance(value, BaseModel):
+        # Поля модели без копирования; вложенные модели orjson передаст сюда же
+        return vars(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(value) -> bytes:
+    return orjson.dumps(value, default=_default)
+
+def ndjson_lines(values: Iterable) -> bytes:
+    return b"".join(dumps(value) + b"\n" for value in values)
+
+def wants_ndjson(accept: Optional[str]) -> bool:
+    """
+    Запрошена ли потоковая выдача: application/x-ndjson в заголовке Accept (без q=0).
+    """
+    for media_range in (accept or "").split(","):
+        media_type, *params = [part.strip().lower() for part in media_range.split(";")]
+        if media_type == NDJSON_MEDIA_TYPE and "q=0" not in params:
+            return True
+    return False
+
+def json_response(value, headers: Optional[Mapping[str, str]] = None) -> Response:
+    """
+    JSON-ответ из моделей или готовых байтов (bytes отдаются как есть).
+    """
+    body = value if isinstance(value, bytes) else dumps(value)
+    return Response(body, media_type="application/json", headers=headers)
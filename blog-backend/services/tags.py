@@ -0,0 +1,118 @@
+import heapq
+import threading
+from bisect import bisect_right, insort
+from typing import Dict, List, Optional, Tuple
+from models.post import Post, TagCount
+from repositories import post_repository, versions
+from repositories.pagination import PostKey, fetch_limit, post_key, resolve_page, split_page
+from repositories.storage import get_storage
+
+class TagIndex:
+    """
+    Индекс публичных постов по тегам: тег -> отсортированные ключи (created_at, id) постов.
+
+    Число постов с тегом - длина его списка, поэтому популярные теги и страница постов
+    с тегом отдаются без просмотра всех постов. Индекс строится из метаданных постов
+    хранилища при первом запросе и затем обновляется по событиям post_repository
+    (создание, изменение, удаление поста). Приватные посты в индекс не попадают:
+    и списки, и счетчики одинаковы для всех посетителей.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._epoch = None
+        self._posts: Dict[str, List[PostKey]] = {}
+        # Теги проиндексированных постов: при изменении поста ключ удаляется из старых тегов
+        self._post_tags: Dict[str, Tuple[PostKey, Tuple[str, ...]]] = {}
+        post_repository.add_change_listener(self._on_change)
+
+    def _on_change(self, event: str, payload):
+        with self._lock:
+            # Индекс еще не построен или данные менялись в обход репозитория: его перестроит следующий запрос
+            if not self._built or self._epoch != versions.epoch():
+                self._built = False
+                return
+            if event in ("post_saved", "post_updated"):
+                self._remove(payload.id)
+                if payload.is_public:
+                    self._add(payload.id, post_key(payload), tuple(payload.tags))
+            elif event == "post_deleted":
+                self._remove(payload)
+
+    def ensure_built(self):
+        current_epoch = versions.check()
+        with self._lock:
+            if not self._built or self._epoch != current_epoch:
+                self.rebuild(current_epoch)
+
+    def rebuild(self, current_epoch: int):
+        """
+        Строит индекс по метаданным публичных постов хранилища.
+        """
+        with self._lock:
+            self._posts = {}
+            self._post_tags = {}
+            for meta in sorted(get_storage().list_post_meta(is_public=True), key=lambda meta: meta.key):
+                tags = tuple(dict.fromkeys(meta.tags))
+                self._post_tags[meta.id] = (meta.key, tags)
+                for tag in tags:
+                    # Метаданные отсортированы, поэтому ключи добавляются в конец списков
+                    self._posts.setdefault(tag, []).append(meta.key)
+            self._built = True
+            self._epoch = current_epoch
+
+    def _add(self, post_id: str, key: PostKey, tags: Tuple[str, ...]):
+        tags = tuple(dict.fromkeys(tags))
+        self._post_tags[post_id] = (key, tags)
+        for tag in tags:
+            insort(self._posts.setdefault(tag, []), key)
+
+    def _remove(self, post_id: str):
+        entry = self._post_tags.pop(post_id, None)
+        if entry is None:
+            return
+        key, tags = entry
+        for tag in tags:
+            keys = self._posts[tag]
+            position = bisect_right(keys, key) - 1
+            if position >= 0 and keys[position] == key:
+                del keys[position]
+            if not keys:
+                del self._posts[tag]
+
+    def top(self, limit: int) -> List[TagCount]:
+        """
+        Возвращает limit тегов с наибольшим числом публичных постов.
+        """
+        self.ensure_built()
+        with self._lock:
+            counts = heapq.nsmallest(limit, self._posts.items(), key=lambda item: (-len(item[1]), item[0]))
+            return [TagCount(tag=tag, count=len(keys)) for tag, keys in counts]
+
+    def page(self, tag: str, after: Optional[PostKey], limit: Optional[int]) -> List[PostKey]:
+        """
+        Ключи публичных постов с тегом в порядке (created_at, id) после ключа after.
+        """
+        self.ensure_built()
+        with self._lock:
+            keys = self._posts.get(tag, [])
+            start = bisect_right(keys, after) if after is not None else 0
+            end = len(keys) if limit is None else start + limit
+            return keys[start:end]
+
+# Индекс тегов процесса
+tag_index = TagIndex()
+
+def get_top_tags(limit: int) -> List[TagCount]:
+    return tag_index.top(limit)
+
+def get_public_posts_by_tag(
+    tag: str, cursor: Optional[str] = None, limit: Optional[int] = None
+) -> Tuple[List[Post], Optional[str]]:
+    """
+    Возвращает страницу публичных постов с тегом и курсор следующей страницы.
+    """
+    after, limit = resolve_page(cursor, limit)
+    keys = tag_index.page(tag, after, fetch_limit(limit))
+    return split_page(post_repository.get_posts_by_ids([key[1] for key in keys]), limit)
@@ -0,0 +1,209 @@
+import os
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+from models.post import Post
+from repositories import post_repository, user_repository, versions
+from repositories.pagination import PostKey, post_key
+from repositories.storage import get_storage
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Сколько первых (самых старых) постов хранится в хронологии одного подписчика
+TIMELINE_SIZE = int(os.getenv("TIMELINE_SIZE", "1000"))
+# Сколько хронологий хранится в памяти процесса (вытесняются давно не читавшиеся)
+TIMELINE_CACHE_SIZE = int(os.getenv("TIMELINE_CACHE_SIZE", "10000"))
+# Посты авторов с большим числом подписчиков (с хронологиями в памяти) не рассылаются
+# по хронологиям, а подмешиваются при чтении
+FANOUT_MAX_FOLLOWERS = int(os.getenv("FANOUT_MAX_FOLLOWERS", "1000"))
+
+class _Timeline:
+    """
+    Хронология подписчика: отсортированные ключи постов авторов, на которых он подписан.
+    Страницы читаются от старых постов к новым, поэтому хронология хранит начало
+    истории - TIMELINE_SIZE самых старых ключей.
+    """
+
+    def __init__(self, followed: Set[str], keys: List[PostKey], complete: bool):
+        self.followed = followed
+        self.keys = keys
+        # Хранится ли вся история (ни один пост не отброшен)
+        self.complete = complete
+
+    def add(self, key: PostKey):
+        if not self.complete and self.keys and key > self.keys[-1]:
+            # Пост позже хранимого начала истории: его прочитают из хранилища
+            return
+        position = bisect_right(self.keys, key)
+        if position > 0 and self.keys[position - 1] == key:
+            return
+        self.keys.insert(position, key)
+        if len(self.keys) > TIMELINE_SIZE:
+            del self.keys[TIMELINE_SIZE:]
+            self.complete = False
+
+    def keys_after(self, after: Optional[PostKey], limit: Optional[int]) -> Tuple[List[PostKey], bool]:
+        """
+        Ключи после after (не больше limit) и признак того, что хранимое начало истории
+        закончилось раньше: следующие ключи нужно читать из хранилища.
+        """
+        start = bisect_right(self.keys, after) if after is not None else 0
+        end = len(self.keys) if limit is None else start + limit
+        truncated = not self.complete and end > len(self.keys)
+        return self.keys[start:end], truncated
+
+class FollowerTimelines:
+    """
+    Хронологии подписчиков для /users/followed/posts (рассылка при записи).
+
+    Новый пост добавляется в хронологии подписчиков автора, уже построенные в памяти
+    (подписчики находятся по индексу автор -> хронологии, без чтения подписок),
+    поэтому чтение страницы стоит O(размер страницы) независимо от общего числа постов.
+    Хронология строится из хранилища при первом чтении и ограничена TIMELINE_SIZE
+    первыми постами: страницы дальше этого начала читаются из хранилища, как раньше.
+    Посты авторов, у которых больше FANOUT_MAX_FOLLOWERS подписчиков с хронологиями,
+    не рассылаются, а выбираются при чтении из индекса хранилища и сливаются с хронологией.
+    Видимость постов (приватные, удаленные) проверяется при чтении.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timelines: "OrderedDict[str, _Timeline]" = OrderedDict()
+        # Подписчики с хронологиями в памяти по авторам
+        self._followers: Dict[str, Set[str]] = {}
+        # Авторы, чьи посты подмешиваются при чтении
+        self._pull_authors: Set[str] = set()
+        # Счетчик изменений: хронология, построенная во время изменения, не кэшируется
+        self._generation = 0
+        # Эпоха repositories.versions, с которой согласованы хронологии
+        self._epoch = None
+        post_repository.add_change_listener(self._on_post_change)
+        user_repository.add_change_listener(self._on_subscription_change)
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self._timelines.clear()
+        self._followers.clear()
+        self._pull_authors.clear()
+        self._generation += 1
+
+    def _check_epoch(self, current_epoch: int):
+        # Данные изменены в обход репозиториев: хронологии строятся заново
+        if self._epoch != current_epoch:
+            self._reset()
+            self._epoch = current_epoch
+
+    def _store(self, follower: str, timeline: _Timeline):
+        self._timelines[follower] = timeline
+        for author in timeline.followed:
+            self._followers.setdefault(author, set()).add(follower)
+        while len(self._timelines) > TIMELINE_CACHE_SIZE:
+            self._discard(next(iter(self._timelines)))
+
+    def _discard(self, follower: str):
+        timeline = self._timelines.pop(follower, None)
+        if timeline is None:
+            return
+        for author in timeline.followed:
+            followers = self._followers.get(author)
+            if followers is not None:
+                followers.discard(follower)
+                if not followers:
+                    del self._followers[author]
+
+    def _on_post_change(self, event: str, payload):
+        if event != "post_saved":
+            return
+        post = payload
+        with self._lock:
+            self._generation += 1
+            self._check_epoch(versions.epoch())
+            if post.author in self._pull_authors:
+                return
+            followers = self._followers.get(post.author, ())
+            if len(followers) > FANOUT_MAX_FOLLOWERS:
+                self._pull_authors.add(post.author)
+                return
+            key = post_key(post)
+            for follower in followers:
+                self._timelines[follower].add(key)
+
+    def _on_subscription_change(self, event: str, payload):
+        if event != "subscription_saved":
+            return
+        with self._lock:
+            self._generation += 1
+            # Хронология с новым автором строится заново при следующем чтении
+            self._discard(payload.follower_username)
+
+    def _build(self, follower: str) -> _Timeline:
+        storage = get_storage()
+        followed = storage.get_followed_usernames(follower)
+        keys = sorted(meta.key for meta in storage.list_post_meta(authors=followed))
+        complete = len(keys) <= TIMELINE_SIZE
+        return _Timeline(followed, keys[:TIMELINE_SIZE], complete)
+
+    def _timeline(self, follower: str) -> Tuple[_Timeline, Set[str]]:
+        current_epoch = versions.check()
+        with self._lock:
+            self._check_epoch(current_epoch)
+            timeline = self._timelines.get(follower)
+            if timeline is not None:
+                self._timelines.move_to_end(follower)
+                return timeline, timeline.followed & self._pull_authors
+            generation = self._generation
+        timeline = self._build(follower)
+        with self._lock:
+            if generation == self._generation:
+                self._store(follower, timeline)
+            return timeline, timeline.followed & self._pull_authors
+
+    def page(self, follower: str, after: Optional[PostKey], limit: Optional[int]) -> List[Post]:
+        """
+        Страница постов авторов, на которых подписан пользователь, видимых ему
+        (публичные и приватные с разрешением), в порядке (created_at, id) после ключа after.
+        """
+        timeline, pull_authors = self._timeline(follower)
+        storage = get_storage()
+        granted_post_ids = None
+        post_ids = []
+        while True:
+            with self._lock:
+                keys, truncated = timeline.keys_after(after, limit)
+            if truncated and not keys:
+                # Остаток страницы за пределами хранимого начала истории читается из хранилища
+                remaining = None if limit is None else limit - len(post_ids)
+                return storage.get_posts(post_ids) + post_repository.get_posts_by_authors_page(
+                    list(timeline.followed), follower, after, remaining
+                )
+            if granted_post_ids is None:
+                granted_post_ids = storage.get_granted_post_ids(follower)
+            if pull_authors:
+                pulled = storage.list_post_meta_page(after, limit, authors=pull_authors)
+                merged = sorted(set(keys) | {meta.key for meta in pulled})
+                if truncated:
+                    # Дальше последнего ключа хронологии могут быть не учтенные в ней посты
+                    merged = [key for key in merged if key <= keys[-1]]
+                keys = merged[:limit]
+            for key in keys:
+                meta = storage.get_post_meta(key[1])
+                # Удаленные посты и скрытые посты без разрешения пропускаются
+                if meta is None or meta.author not in timeline.followed:
+                    continue
+                if meta.is_public or meta.id in granted_post_ids:
+                    post_ids.append(meta.id)
+            page_full = limit is not None and len(post_ids) >= limit
+            exhausted = not truncated and (limit is None or len(keys) < limit)
+            if page_full or exhausted:
+                # Полные посты читаются только для страницы
+                return storage.get_posts(post_ids[:limit])
+            after = keys[-1]
+
+# Хронологии подписчиков процесса
+follower_timelines = FollowerTimelines()
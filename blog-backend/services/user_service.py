@@ -1,7 +1,10 @@
-from repositories.user_repository import save_subscription, get_subscriptions_by_follower
+from repositories.user_repository import save_subscription
+from repositories.pagination import resolve_page, fetch_limit, split_page
 from models.user import Subscription
+from services.timelines import follower_timelines
 from datetime import datetime
 import uuid
+from typing import Optional
 
 def follow_user(follower_username: str, following_username: str) -> Subscription:
     subscription = Subscription(
@@ -13,11 +16,8 @@ def follow_user(follower_username: str, following_username: str) -> Subscription
     save_subscription(subscription)
     return subscription
 
-def get_followed_users_posts(follower_username: str):
-    # Получаем список пользователей, на которых подписан текущий пользователь
-    subscriptions = get_subscriptions_by_follower(follower_username)
-    followed_usernames = [sub.following_username for sub in subscriptions]
-
-    # Получаем посты от этих пользователей
-    from repositories.post_repository import get_posts_by_authors
-    return get_posts_by_authors(followed_usernames, follower_username)
\ No newline at end of file
+def get_followed_users_posts(follower_username: str, cursor: Optional[str] = None, limit: Optional[int] = None):
+    # Получаем страницу постов из хронологии подписчика и курсор следующей страницы
+    after, limit = resolve_page(cursor, limit)
+    posts = follower_timelines.page(follower_username, after, fetch_limit(limit))
+    return split_page(posts, limit)
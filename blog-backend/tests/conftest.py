@@ -1,13 +1,42 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# Файлы тестовой базы (pytest.ini) создаются во временном каталоге, а не в database/
+# исходников: блокировки, индексы .idx и журнал изменений не остаются в дереве
+# и не накапливаются между запусками. Переменные задаются до импорта приложения
+_database_dir = tempfile.mkdtemp(prefix="blog-tests-")
+atexit.register(shutil.rmtree, _database_dir, ignore_errors=True)
+for _name in [
+    "DATABASE_USERS_FILE", "DATABASE_POSTS_FILE", "DATABASE_ACCESS_REQUESTS_FILE", "DATABASE_ACCESS_FILE",
+    "DATABASE_COMMENTS_FILE", "DATABASE_SUBSCRIPTIONS_FILE", "DATABASE_REFRESH_TOKENS_FILE",
+    "CHANGE_JOURNAL_FILE", "DATABASE_SQLITE_FILE",
+]:
+    if os.getenv(_name):
+        os.environ[_name] = os.path.join(_database_dir, os.path.basename(os.environ[_name]))
+
 import pytest
 from fastapi.testclient import TestClient
 from main import app
-import os
+from repositories.storage import STORAGE_BACKEND, get_storage
+from repositories.text_storage import TextStorage
+from services import auth_service
 
 # Отладочный вывод
 print("Загружены переменные окружения:")
 print("DATABASE_USERS_FILE:", os.getenv("DATABASE_USERS_FILE"))
 print("DATABASE_POSTS_FILE:", os.getenv("DATABASE_POSTS_FILE"))
 
+# Тесты с маркером text_storage читают и меняют файлы текстового хранилища напрямую
+def pytest_collection_modifyitems(config, items):
+    if STORAGE_BACKEND == "text":
+        return
+    skip = pytest.mark.skip(reason=f"только для текстового хранилища (STORAGE_BACKEND={STORAGE_BACKEND})")
+    for item in items:
+        if "text_storage" in item.keywords:
+            item.add_marker(skip)
+
 @pytest.fixture
 def client():
     with TestClient(app) as client:
@@ -17,14 +46,30 @@ def client():
 @pytest.fixture(autouse=True)
 def clean_database():
     # Получаем пути к файлам базы данных из переменных окружения
-    users_file = os.getenv("DATABASE_USERS_FILE")
-    posts_file = os.getenv("DATABASE_POSTS_FILE")
-    
-    # Очищаем тестовые файлы базы данных
-    if users_file and os.path.exists(users_file):
-        with open(users_file, "w") as file:
-            file.write("")
-    if posts_file and os.path.exists(posts_file):
-        with open(posts_file, "w") as file:
-            file.write("")
+    database_files = [
+        os.getenv("DATABASE_USERS_FILE"),
+        os.getenv("DATABASE_POSTS_FILE"),
+        os.getenv("DATABASE_ACCESS_REQUESTS_FILE"),
+        os.getenv("DATABASE_ACCESS_FILE"),
+        os.getenv("DATABASE_COMMENTS_FILE"),
+        os.getenv("DATABASE_SUBSCRIPTIONS_FILE"),
+        os.getenv("DATABASE_REFRESH_TOKENS_FILE"),
+    ]
+
+    # Очищаем (или создаем) тестовые файлы базы данных
+    for database_file in database_files:
+        if database_file:
+            os.makedirs(os.path.dirname(database_file) or ".", exist_ok=True)
+            with open(database_file, "w") as file:
+                file.write("")
+            # Сохраненный индекс очищенного файла (posts.txt.idx, comments.txt.idx) устарел
+            if os.path.exists(f"{database_file}.idx"):
+                os.remove(f"{database_file}.idx")
+    # Хранилище SQLite (STORAGE_BACKEND=sqlite) очищается целиком
+    storage = get_storage()
+    if not isinstance(storage, TextStorage):
+        storage.clear()
+    # Счетчики попыток входа и регистрации не переносятся между тестами
+    for limiter in [auth_service.login_username_limiter, auth_service.login_ip_limiter, auth_service.register_ip_limiter]:
+        limiter.clear()
     yield
\ No newline at end of file
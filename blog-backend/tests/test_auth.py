@@ -1,5 +1,14 @@
+import asyncio
+import os
 import pytest
-from fastapi import status
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import Request, status
+from controllers import auth_controller
+from services import auth_service
+from datetime import datetime, timedelta
+from repositories import token_repository, user_repository
+from repositories.storage import get_storage
 
 # Тест для успешной регистрации пользователя
 def test_register_user_success(client):
@@ -106,4 +115,184 @@ def test_get_current_user(client):
 def test_get_current_user_unauthorized(client):
     response = client.get("/users/me")
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
-    assert response.json() == {"detail": "Not authenticated"}
\ No newline at end of file
+    assert response.json() == {"detail": "Not authenticated"}
+
+# Тест кэша пользователей: запись берется из кэша и сбрасывается при сохранении пользователя
+def test_current_user_cache(client):
+    client.post("/register", json={"username": "testuser", "email": "testuser@example.com", "password": "testpassword"})
+    token = client.post("/token", data={"username": "testuser", "password": "testpassword"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/users/me", headers=headers).status_code == status.HTTP_200_OK
+
+    # Файл пользователей очищен извне: до истечения TTL пользователь берется из кэша
+    user = user_repository.get_user("testuser")
+    with open(os.getenv("DATABASE_USERS_FILE"), "w") as file:
+        file.write("")
+    assert client.get("/users/me", headers=headers).status_code == status.HTTP_200_OK
+
+    # Сохранение пользователя сбрасывает запись кэша
+    user.email = "new@example.com"
+    user_repository.save_user(user)
+    assert client.get("/users/me", headers=headers).json()["email"] == "new@example.com"
+
+# Тест гонки кэша: версия, прочитанная до сохранения пользователя, не попадает в кэш
+def test_user_cache_skips_stale_read(client, monkeypatch):
+    client.post("/register", json={"username": "testuser", "email": "testuser@example.com", "password": "testpassword"})
+    user_repository.clear_user_cache()
+    storage = get_storage()
+    read_user = storage.get_user
+
+    def read_then_save(username):
+        # Пока запрос читает старую версию, другой поток сохраняет новую
+        stale = read_user(username)
+        updated = stale.copy()
+        updated.email = "new@example.com"
+        monkeypatch.setattr(storage, "get_user", read_user)
+        user_repository.save_user(updated)
+        return stale
+
+    monkeypatch.setattr(storage, "get_user", read_then_save)
+    assert user_repository.get_cached_user("testuser").email == "testuser@example.com"
+    assert user_repository.lookup_cached_user("testuser") is None
+    assert user_repository.get_cached_user("testuser").email == "new@example.com"
+
+# Тест режима доверия данным токена на эндпоинтах только для чтения
+@pytest.mark.text_storage
+def test_trust_token_claims(client, monkeypatch):
+    client.post("/register", json={"username": "testuser", "email": "testuser@example.com", "password": "testpassword"})
+    token = client.post("/token", data={"username": "testuser", "password": "testpassword"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    monkeypatch.setattr(auth_service, "AUTH_TRUST_TOKEN_CLAIMS", True)
+    user_repository.clear_user_cache()
+    with open(os.getenv("DATABASE_USERS_FILE"), "w") as file:
+        file.write("")
+
+    # Чтение работает по данным токена, изменение требует существующего пользователя
+    response = client.get("/users/me", headers=headers)
+    assert response.json() == {"username": "testuser", "email": "testuser@example.com"}
+    response = client.post("/posts/", json={"title": "t", "content": "c"}, headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+# Тест refresh token: вход не переписывает файл пользователей, токены нескольких устройств, отзыв
+def test_refresh_tokens(client):
+    client.post("/register", json={"username": "testuser", "email": "testuser@example.com", "password": "testpassword"})
+    with open(os.getenv("DATABASE_USERS_FILE")) as file:
+        users = file.read()
+    login_data = {"username": "testuser", "password": "testpassword"}
+    first = client.post("/token", data=login_data).json()
+    second = client.post("/token", data=login_data).json()
+    assert first["refresh_token"] != second["refresh_token"]
+    with open(os.getenv("DATABASE_USERS_FILE")) as file:
+        assert file.read() == users
+
+    for tokens in [first, second]:
+        response = client.post("/refresh-token", params={"refresh_token": tokens["refresh_token"]})
+        assert response.status_code == status.HTTP_200_OK
+        assert "access_token" in response.json()
+
+    # Выход на одном устройстве не затрагивает другое
+    client.post("/logout", params={"refresh_token": first["refresh_token"]})
+    response = client.post("/refresh-token", params={"refresh_token": first["refresh_token"]})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert client.post("/refresh-token", params={"refresh_token": second["refresh_token"]}).status_code == status.HTTP_200_OK
+
+    headers = {"Authorization": f"Bearer {second['access_token']}"}
+    assert client.post("/logout-all", headers=headers).status_code == status.HTTP_200_OK
+    response = client.post("/refresh-token", params={"refresh_token": second["refresh_token"]})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+# Тест удаления просроченных refresh token
+def test_refresh_token_sweep(client):
+    token_repository.save_refresh_token("testuser", "old", datetime.utcnow() - timedelta(minutes=1))
+    token_repository.save_refresh_token("testuser", "new", datetime.utcnow() + timedelta(days=1))
+    assert token_repository.get_refresh_token_owner("old") is None
+    assert token_repository.get_refresh_token_owner("new") == "testuser"
+    assert token_repository.sweep_expired_refresh_tokens(force=True)
+    storage = get_storage()
+    assert storage.list_refresh_token_hashes("testuser") == [token_repository.hash_refresh_token("new")]
+
+# Тест переноса refresh token из файла пользователей: выданные ранее токены продолжают действовать
+def test_migrate_legacy_refresh_tokens(client):
+    client.post("/register", json={"username": "testuser", "email": "testuser@example.com", "password": "testpassword"})
+    storage = get_storage()
+    legacy_token = auth_service.create_refresh_token(data={"sub": "testuser"})
+    user = storage.get_user("testuser")
+    user.refresh_token = legacy_token
+    storage.save_user(user)
+
+    assert token_repository.migrate_legacy_refresh_tokens() == 1
+    assert not storage.get_user("testuser").refresh_token
+    assert token_repository.migrate_legacy_refresh_tokens() == 0
+    response = client.post("/refresh-token", params={"refresh_token": legacy_token})
+    assert response.status_code == status.HTTP_200_OK
+
+# Тест ограничения попыток входа: после лимита запрос отклоняется до проверки пароля
+def test_login_rate_limit(client, monkeypatch):
+    client.post("/register", json={"username": "testuser", "email": "testuser@example.com", "password": "testpassword"})
+    monkeypatch.setattr(auth_service.login_username_limiter, "limit", 3)
+    for _ in range(3):
+        response = client.post("/token", data={"username": "testuser", "password": "wrong"})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    response = client.post("/token", data={"username": "testuser", "password": "testpassword"})
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(response.headers["Retry-After"]) > 0
+
+# Тест адреса клиента: X-Real-IP учитывается только от доверенного прокси
+def test_client_ip_proxy_header(monkeypatch):
+    monkeypatch.setattr(auth_controller, "TRUST_PROXY_HEADERS", True)
+
+    def request(peer):
+        return Request({"type": "http", "headers": [(b"x-real-ip", b"203.0.113.7")], "client": (peer, 40000)})
+
+    assert auth_controller.client_ip(request("172.18.0.5")) == "203.0.113.7"
+    # Клиент, подключившийся напрямую, не может подменить свой адрес
+    assert auth_controller.client_ip(request("198.51.100.1")) == "198.51.100.1"
+
+# Тест параллельной регистрации одного имени: сохраняется один пользователь, второй запрос получает 400
+def test_concurrent_register_same_username(client, monkeypatch):
+    hash_password = auth_service.get_password_hash_async
+
+    async def slow_hash(password):
+        # Оба запроса успевают проверить имя до того, как первый сохранит пользователя
+        await asyncio.sleep(0.3)
+        return await hash_password(password)
+
+    monkeypatch.setattr(auth_service, "get_password_hash_async", slow_hash)
+
+    def register(password):
+        return client.post("/register", json={"username": "alice", "email": "a@x.com", "password": password})
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        responses = list(pool.map(register, ["first-password", "second-password"]))
+    assert sorted(response.status_code for response in responses) == [status.HTTP_200_OK, status.HTTP_400_BAD_REQUEST]
+    [rejected] = [response for response in responses if response.status_code == status.HTTP_400_BAD_REQUEST]
+    assert rejected.json()["detail"] == "Username already registered"
+
+    # Войти можно с паролем того запроса, который получил 200
+    [password] = [p for p, r in zip(["first-password", "second-password"], responses) if r.status_code == status.HTTP_200_OK]
+    assert client.post("/token", data={"username": "alice", "password": password}).status_code == status.HTTP_200_OK
+    assert [user.username for user in get_storage().iter_users()] == ["alice"]
+
+# Тест переполнения очереди bcrypt: запрос сразу отклоняется с 503
+def test_password_pool_queue_full(client, monkeypatch):
+    from services import password_hashing
+    monkeypatch.setattr(password_hashing, "PASSWORD_QUEUE_SIZE", 0)
+    response = client.post("/register", json={"username": "testuser", "email": "testuser@example.com", "password": "testpassword"})
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "1"
+
+# Тест сбоя процесса bcrypt: пул пересоздается, вход и регистрация продолжают работать
+def test_password_pool_recovers_after_crash(client):
+    from services import password_hashing
+    user_data = {"username": "testuser", "email": "testuser@example.com", "password": "testpassword"}
+    assert client.post("/register", json=user_data).status_code == status.HTTP_200_OK
+    broken = password_hashing._get_pool()
+    for process in list(broken._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+        process.join()
+
+    response = client.post("/token", data={"username": "testuser", "password": "testpassword"})
+    assert response.status_code == status.HTTP_200_OK
+    assert password_hashing._get_pool() is not broken
+    user_data["username"] = "otheruser"
+    assert client.post("/register", json=user_data).status_code == status.HTTP_200_OK
@@ -0,0 +1,59 @@
+from fastapi import status
+from controllers import post_controller
+from tests.test_posts import auth_headers, create_post
+
+# Тест условных запросов к публичным постам: ETag, Cache-Control и 304 без обращения к сервисам
+def test_public_posts_not_modified(client, monkeypatch):
+    alice = auth_headers(client, "alice")
+    create_post(client, alice, "first")
+
+    response = client.get("/posts/public")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Cache-Control"].startswith("public, max-age=")
+    etag = response.headers["ETag"]
+
+    # Ответ 304 формируется до вызова эндпоинта: сервис не должен вызываться
+    def fail(*args, **kwargs):
+        raise AssertionError("сервис не должен вызываться")
+    monkeypatch.setattr(post_controller, "get_all_public_posts", fail)
+    response = client.get("/posts/public", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["ETag"] == etag
+    monkeypatch.undo()
+
+    # Другие параметры запроса - другой ETag
+    assert client.get("/posts/public", params={"limit": 1}).headers["ETag"] != etag
+
+    create_post(client, alice, "second")
+    response = client.get("/posts/public", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+    assert [post["title"] for post in response.json()] == ["first", "second"]
+
+# Тест персональных ответов: private, no-cache, ETag зависит от пользователя и отдельного поста
+def test_personal_etags(client):
+    alice = auth_headers(client, "alice")
+    bob = auth_headers(client, "bob")
+    first = create_post(client, alice, "first")
+    second = create_post(client, alice, "second")
+
+    response = client.get(f"/posts/{first['id']}", headers=alice)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    assert response.headers["Vary"] == "Authorization"
+    etag = response.headers["ETag"]
+    assert client.get(f"/posts/{first['id']}", headers=bob).headers["ETag"] != etag
+
+    # Изменение другого поста не меняет ETag первого
+    client.put(f"/posts/{second['id']}", json={"title": "changed", "content": "текст", "is_public": True}, headers=alice)
+    response = client.get(f"/posts/{first['id']}", headers={**alice, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    client.put(f"/posts/{first['id']}", json={"title": "changed", "content": "текст", "is_public": True}, headers=alice)
+    response = client.get(f"/posts/{first['id']}", headers={**alice, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["title"] == "changed"
+
+    # Без токена 304 не отдается даже при совпадении ETag
+    response = client.get(f"/posts/{first['id']}", headers={"If-None-Match": "*"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
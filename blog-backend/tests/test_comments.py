@@ -0,0 +1,42 @@
+import os
+from fastapi import status
+from repositories.comment_index import CommentIndex
+from tests.test_posts import auth_headers, create_post
+
+# Тест комментариев: порядок в списке и последний комментарий в публичной ленте
+def test_comments_list_and_latest(client):
+    alice = auth_headers(client, "alice")
+    post = create_post(client, alice, "post")
+    for content in ["первый", "второй", "третий"]:
+        response = client.post(f"/posts/{post['id']}/comments/", params={"content": content}, headers=alice)
+        assert response.status_code == status.HTTP_200_OK
+
+    comments = client.get(f"/posts/{post['id']}/comments/", headers=alice).json()
+    assert [comment["content"] for comment in comments] == ["первый", "второй", "третий"]
+
+    feed = client.get("/posts/public/feed").json()
+    assert feed[0]["latest_comment"]["content"] == "третий"
+
+# Тест индекса: загрузка из файла индекса, доиндексация внешних строк и перестроение после перезаписи
+def test_comment_index_persistence(tmp_path):
+    comments_path = str(tmp_path / "comments.txt")
+    index_path = str(tmp_path / "comments.txt.idx")
+    index = CommentIndex(comments_path, index_path)
+    index.append("c1|p1|alice|один|2025-01-01 10:00:00\n")
+    index.append("c2|p2|bob|два|2025-01-01 11:00:00\n")
+    index.append("c3|p1|bob|три|2025-01-01 12:00:00\n")
+    assert os.path.getsize(index_path) > 0
+
+    # Новый экземпляр читает индекс из файла, строку другого процесса доиндексирует
+    with open(comments_path, "a", encoding="utf-8") as file:
+        file.write("c4|p1|carol|четыре|2025-01-01 09:00:00\n")
+    reloaded = CommentIndex(comments_path, index_path)
+    assert [comment.id for comment in reloaded.get_comments("p1")] == ["c1", "c3", "c4"]
+    assert reloaded.get_latest(["p1", "p2", "p3"])["p1"].id == "c3"
+
+    # Файл комментариев перезаписан другим содержимым: индекс строится заново
+    with open(comments_path, "w", encoding="utf-8") as file:
+        file.write("x1|p2|alice|новый|2025-02-01 10:00:00\n")
+        file.write("x2|p2|alice|еще новее|2025-02-01 11:00:00\n")
+    assert reloaded.get_comments("p1") == []
+    assert reloaded.get_latest(["p2"])["p2"].id == "x2"
@@ -0,0 +1,83 @@
+import multiprocessing
+import threading
+from datetime import datetime
+from models.post import Comment
+from models.user import UserInDB, Subscription
+from repositories.text_storage import TextStorage
+from tests.test_storage import make_post, make_text_storage
+
+PROCESSES = 3
+THREADS = 4
+ITERATIONS = 15
+
+def open_storage(paths) -> TextStorage:
+    return TextStorage(*paths)
+
+def storage_paths(storage: TextStorage):
+    return [
+        storage.users_file, storage.posts_file, storage.access_requests_file, storage.access_file,
+        storage.comments_file, storage.comment_index.index_path, storage.subscriptions_file,
+    ]
+
+def write_all(storage: TextStorage, writer: str):
+    """
+    Параллельно (в нескольких потоках) создает пользователей, посты, комментарии и подписки
+    и многократно перезаписывает refresh token своего пользователя, как при повторных входах.
+    """
+    def run(thread: int):
+        name = f"{writer}-{thread}"
+        for i in range(ITERATIONS):
+            storage.save_user(UserInDB(
+                username=name, email=f"{name}@example.com", hashed_password="hash", refresh_token=f"token{i}"
+            ))
+            storage.save_user(UserInDB(username=f"{name}-{i}", email=f"{name}-{i}@example.com", hashed_password="hash"))
+            post = make_post(f"{name}-p{i}", name, minute=i)
+            storage.insert_post(post)
+            post.title = "изменен"
+            storage.update_post(post)
+            storage.insert_comment(Comment(
+                id=f"{name}-c{i}", post_id=post.id, author_username=name, content="текст", created_at=datetime(2025, 1, 2)
+            ))
+            storage.insert_subscription(Subscription(
+                id=f"{name}-s{i}", follower_username=name, following_username=f"author{i}", created_at=datetime(2025, 1, 3)
+            ))
+    threads = [threading.Thread(target=run, args=(thread,)) for thread in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def write_in_process(paths, writer: str):
+    write_all(open_storage(paths), writer)
+
+# Стресс-тест: несколько процессов и потоков пишут в одни файлы, ни одна запись не теряется
+def test_parallel_writers(tmp_path):
+    storage = make_text_storage(tmp_path)
+    # Хранилище процесса уже прочитало файлы: чужие записи должны обнаружиться
+    assert storage.list_posts() == []
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=write_in_process, args=(storage_paths(storage), f"w{index}"))
+        for index in range(PROCESSES)
+    ]
+    for process in processes:
+        process.start()
+    write_all(storage, "main")
+    for process in processes:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+
+    writers = [f"w{index}-{thread}" for index in range(PROCESSES) for thread in range(THREADS)]
+    writers += [f"main-{thread}" for thread in range(THREADS)]
+    for check in [storage, open_storage(storage_paths(storage))]:
+        users = {user.username: user for user in check.iter_users()}
+        assert len(users) == len(writers) * (ITERATIONS + 1)
+        for writer in writers:
+            assert users[writer].refresh_token == f"token{ITERATIONS - 1}"
+        posts = check.list_posts()
+        assert len(posts) == len(writers) * ITERATIONS
+        assert {post.title for post in posts} == {"изменен"}
+        for writer in writers:
+            assert len(check.list_posts_by_author(writer)) == ITERATIONS
+            assert len(check.list_comments_by_post(f"{writer}-p0")) == 1
+            assert check.get_followed_usernames(writer) == {f"author{i}" for i in range(ITERATIONS)}
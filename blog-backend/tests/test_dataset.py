@@ -0,0 +1,52 @@
+import json
+import pytest
+from tests.test_storage import fill, make_sqlite_storage, make_text_storage
+from tools.dataset import InvalidRecord, export_dataset, generate, import_dataset, kind_files, validate_dataset
+
+def read_dataset(directory):
+    return {
+        name: [json.loads(line) for path in kind_files(str(directory), name) for line in open(path, encoding="utf-8")]
+        for name in ["users", "posts", "comments", "access_requests", "access", "subscriptions"]
+    }
+
+# Тест выгрузки и загрузки: набор данных переносится между хранилищами без изменений
+@pytest.mark.parametrize("make_target", [make_text_storage, make_sqlite_storage], ids=["text", "sqlite"])
+def test_export_import(tmp_path, make_target):
+    (tmp_path / "source").mkdir()
+    (tmp_path / "target").mkdir()
+    source = make_text_storage(tmp_path / "source")
+    fill(source)
+    counts = export_dataset(source, str(tmp_path / "dump"), chunk_rows=2)
+    assert counts == {"users": 1, "posts": 3, "comments": 2, "access_requests": 1, "access": 1, "subscriptions": 1}
+    assert [path.rsplit("/", 1)[1] for path in kind_files(str(tmp_path / "dump"), "posts")] == [
+        "posts.00000.jsonl", "posts.00001.jsonl"
+    ]
+
+    target = make_target(tmp_path / "target")
+    assert import_dataset(target, str(tmp_path / "dump")) == counts
+    export_dataset(target, str(tmp_path / "copy"))
+    assert read_dataset(tmp_path / "copy") == read_dataset(tmp_path / "dump")
+
+# Тест проверки записей: ошибка модели и недопустимый для текстовых файлов символ
+def test_invalid_records(tmp_path):
+    dump = tmp_path / "dump"
+    generate(str(dump), users=5, posts=20, seed=1)
+    counts, errors = validate_dataset(str(dump))
+    assert counts["posts"] == 20 and errors == []
+
+    with open(dump / "posts.jsonl", "a", encoding="utf-8") as file:
+        file.write(json.dumps({"id": "bad", "title": "t", "content": "c", "author": "user0"}) + "\n")
+        file.write(json.dumps({
+            "id": "pipe", "title": "a|b", "content": "c", "author": "user0", "created_at": "2025-01-01T00:00:00"
+        }) + "\n")
+    counts, errors = validate_dataset(str(dump))
+    assert counts["posts"] == 20
+    assert [error.split(": ", 1)[0].rsplit(":", 1)[1] for error in errors] == ["21", "22"]
+
+    (tmp_path / "target").mkdir()
+    target = make_text_storage(tmp_path / "target")
+    with pytest.raises(InvalidRecord):
+        import_dataset(target, str(dump))
+    errors = []
+    assert import_dataset(make_sqlite_storage(tmp_path), str(dump), errors)["posts"] == 21
+    assert len(errors) == 1
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+import time
+from services.executor import CONCURRENCY_LIMITS, run_blocking
+
+# Тест пула потоков: группа ограничивает число одновременных вызовов, цикл событий не блокируется
+def test_run_blocking_group_limit():
+    active, peak = 0, 0
+    lock = threading.Lock()
+
+    def heavy():
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+        return threading.current_thread().name
+
+    async def scenario():
+        tasks = [asyncio.create_task(run_blocking(heavy, group="feed")) for _ in range(CONCURRENCY_LIMITS["feed"] + 2)]
+        # Пока тяжелые вызовы выполняются, легкий вызов без группы проходит сразу
+        started = time.perf_counter()
+        await run_blocking(lambda: None)
+        light_latency = time.perf_counter() - started
+        return await asyncio.gather(*tasks), light_latency
+
+    names, light_latency = asyncio.run(scenario())
+    assert all(name.startswith("blocking") for name in names)
+    assert peak == CONCURRENCY_LIMITS["feed"]
+    assert light_latency < 0.05
+
+# Тест групп: медленные задачи одной группы не задерживают другую группу
+def test_run_blocking_groups_are_independent():
+    def slow():
+        time.sleep(0.2)
+
+    async def scenario():
+        tasks = [asyncio.create_task(run_blocking(slow, group="search")) for _ in range(CONCURRENCY_LIMITS["search"] + 1)]
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        await run_blocking(lambda: None, group="posts")
+        latency = time.perf_counter() - started
+        await asyncio.gather(*tasks)
+        return latency
+
+    assert asyncio.run(scenario()) < 0.1
@@ -0,0 +1,75 @@
+import logging
+import re
+from fastapi.testclient import TestClient
+from controllers import metrics
+from main import app
+from repositories.storage import STORAGE_BACKEND
+from tests.test_posts import auth_headers, create_post
+
+def metric_values(text, name):
+    # Значения метрики по строке меток: {'function="..."': 3.0}
+    return {
+        labels: float(value)
+        for labels, value in re.findall(rf"^{name}{{(.*)}} (\S+)$", text, re.MULTILINE)
+    }
+
+def scrape(peer, headers=None):
+    # Запрос метрик с заданного адреса: тестовый клиент не передает адрес подключения
+    async def app_with_peer(scope, receive, send):
+        if scope["type"] == "http":
+            scope = {**scope, "client": (peer, 40000)}
+        await app(scope, receive, send)
+    return TestClient(app_with_peer).get("/metrics", headers=headers)
+
+# Тест /metrics: гистограммы по шаблонам путей и счетчики вызовов репозиториев
+def test_metrics_endpoint(client):
+    alice = auth_headers(client, "alice")
+    post = create_post(client, alice, "measured")
+    for _ in range(3):
+        assert client.get(f"/posts/{post['id']}", headers=alice).status_code == 200
+
+    response = scrape("172.18.0.7")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+
+    counts = metric_values(text, "http_request_duration_seconds_count")
+    # ID поста не попадает в метки: все просмотры в одном ряду шаблона пути
+    assert counts['method="GET",route="/posts/{post_id}",status="200"'] >= 3
+    assert not any(post["id"] in labels for labels in counts)
+    buckets = metric_values(text, "http_request_duration_seconds_bucket")
+    assert buckets['method="GET",route="/posts/{post_id}",status="200",le="+Inf"'] == counts[
+        'method="GET",route="/posts/{post_id}",status="200"'
+    ]
+
+    calls = metric_values(text, "repository_calls_total")
+    assert calls['function="post_repository.get_post_by_id"'] >= 3
+    assert calls['function="user_repository.get_user"'] >= 1
+    rows = metric_values(text, "repository_rows_scanned_total")
+    read = metric_values(text, "repository_bytes_read_total")
+    assert rows['function="post_repository.get_post_by_id"'] >= 3
+    if STORAGE_BACKEND == "text":
+        # Прочитанные байты сообщает только текстовое хранилище
+        assert read['function="post_repository.get_post_by_id"'] > 0
+    # Вспомогательные функции без обращения к хранилищу не учитываются
+    assert not any("add_change_listener" in labels or "invalidate_cached_user" in labels for labels in calls)
+
+# Тест доступа к /metrics: только прямые подключения из внутренних сетей
+def test_metrics_access(client):
+    assert client.get("/metrics").status_code == 403
+    assert scrape("198.51.100.1").status_code == 403
+    # Запрос снаружи через nginx приходит с внутреннего адреса, но с заголовками клиента
+    assert scrape("172.18.0.5", {"X-Real-IP": "203.0.113.7"}).status_code == 403
+    assert scrape("127.0.0.1").status_code == 200
+
+# Тест журнала медленных запросов: разбивка включает вызовы репозиториев из пула потоков
+def test_slow_request_log(client, monkeypatch, caplog):
+    alice = auth_headers(client, "alice")
+    post = create_post(client, alice, "slow")
+    monkeypatch.setattr(metrics, "SLOW_REQUEST_THRESHOLD", 0)
+    with caplog.at_level(logging.WARNING, logger=metrics.__name__):
+        client.get(f"/posts/{post['id']}", headers=alice)
+    [record] = [record for record in caplog.records if "/posts/{post_id}" in record.getMessage()]
+    message = record.getMessage()
+    assert f"GET /posts/{post['id']}" in message
+    assert re.search(r"post_repository\.get_post_by_id: вызовов 1, [\d.]+ мс, строк [1-9]", message)
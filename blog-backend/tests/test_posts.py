@@ -0,0 +1,125 @@
+import os
+import pytest
+from fastapi import status
+from repositories import record_log
+from repositories.storage import STORAGE_BACKEND
+
+# Регистрирует пользователя и возвращает заголовки авторизации
+def auth_headers(client, username):
+    client.post("/register", json={
+        "username": username,
+        "email": f"{username}@example.com",
+        "password": "testpassword"
+    })
+    response = client.post("/token", data={"username": username, "password": "testpassword"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+# Создает пост от имени пользователя и возвращает его данные
+def create_post(client, headers, title, is_public=True, tags=None):
+    response = client.post("/posts/", json={
+        "title": title,
+        "content": f"Текст поста {title}",
+        "is_public": is_public,
+        "tags": tags or []
+    }, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+# Тест ленты: статусы доступа, подписки и последние комментарии
+def test_user_feed_details(client):
+    alice = auth_headers(client, "alice")
+    bob = auth_headers(client, "bob")
+
+    public_post = create_post(client, alice, "public")
+    private_post = create_post(client, alice, "private", is_public=False)
+    own_post = create_post(client, bob, "own", is_public=False)
+
+    client.post("/users/follow/alice", headers=bob)
+    client.post(f"/posts/{public_post['id']}/comments/", params={"content": "первый"}, headers=alice)
+    client.post(f"/posts/{public_post['id']}/comments/", params={"content": "второй"}, headers=bob)
+    client.post(f"/posts/access/request/{private_post['id']}", headers=bob)
+
+    response = client.get("/posts/feed", headers=bob)
+    assert response.status_code == status.HTTP_200_OK
+    feed = {post["id"]: post for post in response.json()}
+
+    assert feed[own_post["id"]]["access_status"] == "approved"
+    assert feed[own_post["id"]]["is_subscribed"] is False
+    assert feed[public_post["id"]]["is_subscribed"] is True
+    assert feed[public_post["id"]]["latest_comment"]["content"] == "второй"
+    # Содержимое приватного поста без доступа скрыто, запрос на доступ ожидает решения
+    assert feed[private_post["id"]]["content"] == ""
+    assert feed[private_post["id"]]["access_status"] == "pending"
+
+# Тест ленты: после одобрения запроса приватный пост становится доступен
+def test_user_feed_after_access_granted(client):
+    alice = auth_headers(client, "alice")
+    bob = auth_headers(client, "bob")
+
+    private_post = create_post(client, alice, "private", is_public=False)
+    request = client.post(f"/posts/access/request/{private_post['id']}", headers=bob).json()
+    response = client.post(f"/posts/access/grant/{request['id']}", headers=alice)
+    assert response.status_code == status.HTTP_200_OK
+
+    feed = {post["id"]: post for post in client.get("/posts/feed", headers=bob).json()}
+    assert feed[private_post["id"]]["content"] == "Текст поста private"
+    assert feed[private_post["id"]]["access_status"] == "approved"
+
+# Тест редактирования и удаления поста: изменения видны в выборках и сохраняются в файл
+def test_update_and_delete_post(client):
+    alice = auth_headers(client, "alice")
+    first = create_post(client, alice, "first")
+    second = create_post(client, alice, "second")
+
+    response = client.put(f"/posts/{first['id']}", json={
+        "title": "first (edited)",
+        "content": "Новый текст",
+        "is_public": False,
+        "tags": ["python"]
+    }, headers=alice)
+    assert response.status_code == status.HTTP_200_OK
+
+    my_posts = client.get("/posts/me", headers=alice).json()
+    assert [post["title"] for post in my_posts] == ["first (edited)", "second"]
+    assert [post["id"] for post in client.get("/posts/public").json()] == [second["id"]]
+
+    response = client.delete(f"/posts/{second['id']}", headers=alice)
+    assert response.status_code == status.HTTP_200_OK
+    assert client.get(f"/posts/{second['id']}", headers=alice).status_code == status.HTTP_404_NOT_FOUND
+
+    if STORAGE_BACKEND != "text":
+        return
+    # Изменения дописываются в журнал, а после компактизации в файле остаются только живые записи
+    posts_file = os.getenv("DATABASE_POSTS_FILE")
+    record_log.compact(posts_file)
+    with open(posts_file, encoding="utf-8") as file:
+        content = file.read()
+    assert content.count(first["id"]) == 1
+    assert "first (edited)|Новый текст|False|alice|python|" in content
+    assert second["id"] not in content
+    assert [post["title"] for post in client.get("/posts/me", headers=alice).json()] == ["first (edited)"]
+
+# Тест постраничной выдачи: курсор следующей страницы в заголовке и порядок (created_at, id)
+def test_feed_pagination(client):
+    alice = auth_headers(client, "alice")
+    bob = auth_headers(client, "bob")
+    created = [create_post(client, alice, f"post {i}", is_public=i % 2 == 0) for i in range(5)]
+    expected = [post["id"] for post in sorted(created, key=lambda post: (post["created_at"], post["id"]))]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/posts/feed", params=params, headers=bob)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()) <= 2
+        seen.extend(post["id"] for post in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == expected
+
+    public_ids = {post["id"] for post in created if post["is_public"]}
+    public = client.get("/posts/public", params={"limit": 2}).json()
+    assert [post["id"] for post in public] == [post_id for post_id in expected if post_id in public_ids][:2]
+    assert "X-Next-Cursor" not in client.get("/posts/me", params={"limit": 5}, headers=alice).headers
+    assert client.get("/posts/public/feed", params={"cursor": "не курсор"}).status_code == status.HTTP_400_BAD_REQUEST
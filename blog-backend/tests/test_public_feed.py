@@ -0,0 +1,71 @@
+from fastapi import status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from repositories.storage import get_storage
+from services.post_service import get_all_posts_for_public_feed, get_comments_for_post, get_user_feed
+from services.public_feed import public_feed_snapshot
+from tests.test_posts import auth_headers, create_post
+
+def expected_feed():
+    posts, _ = get_all_posts_for_public_feed()
+    return jsonable_encoder(posts)
+
+# Тест снимка публичной ленты: совпадение с лентой из хранилища после изменений и ответ 304
+def test_public_feed_snapshot(client):
+    alice = auth_headers(client, "alice")
+    public_post = create_post(client, alice, "public")
+    private_post = create_post(client, alice, "private", is_public=False)
+
+    response = client.get("/posts/public/feed")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == expected_feed()
+    etag = response.headers["ETag"]
+    assert client.get("/posts/public/feed", headers={"If-None-Match": etag}).status_code == status.HTTP_304_NOT_MODIFIED
+
+    # Каждое изменение обновляет снимок и его ETag
+    client.post(f"/posts/{public_post['id']}/comments/", params={"content": "первый"}, headers=alice)
+    client.put(f"/posts/{private_post['id']}", json={"title": "открыт", "content": "текст", "is_public": True}, headers=alice)
+    create_post(client, alice, "third")
+    client.delete(f"/posts/{public_post['id']}", headers=alice)
+    response = client.get("/posts/public/feed", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+    assert response.json() == expected_feed()
+    assert [post["title"] for post in response.json()] == ["открыт", "third"]
+
+    page = client.get("/posts/public/feed", params={"limit": 1})
+    assert [post["title"] for post in page.json()] == ["открыт"]
+    next_page = client.get("/posts/public/feed", params={"limit": 1, "cursor": page.headers["X-Next-Cursor"]})
+    assert [post["title"] for post in next_page.json()] == ["third"]
+    assert "X-Next-Cursor" not in next_page.headers
+
+# Тест событий не по порядку: снимок берет пост из хранилища, а не из запоздавшего события
+def test_public_feed_ignores_stale_event(client):
+    alice = auth_headers(client, "alice")
+    post = create_post(client, alice, "first")
+    client.get("/posts/public/feed")
+
+    stale = get_storage().get_post(post["id"])
+    client.put(f"/posts/{post['id']}", json={"title": "second", "content": "текст", "is_public": True}, headers=alice)
+    public_feed_snapshot._on_change("post_updated", stale)
+    assert [item["title"] for item in client.get("/posts/public/feed").json()] == ["second"]
+
+    client.delete(f"/posts/{post['id']}", headers=alice)
+    public_feed_snapshot._on_change("post_saved", stale)
+    assert client.get("/posts/public/feed").json() == []
+
+# Тест сериализации через orjson: тела ответов совпадают байт в байт с JSONResponse FastAPI
+def test_feed_serialization_matches_json_response(client):
+    alice = auth_headers(client, "alice")
+    bob = auth_headers(client, "bob")
+    post = create_post(client, alice, "Заголовок \"в кавычках\"", tags=["теги", "json"])
+    create_post(client, alice, "private", is_public=False)
+    client.post(f"/posts/{post['id']}/comments/", params={"content": "коммент ✓"}, headers=bob)
+
+    feed, _ = get_user_feed("bob")
+    response = client.get("/posts/feed", headers=bob)
+    assert response.content == JSONResponse(jsonable_encoder(feed)).body
+    response = client.get("/posts/public/feed")
+    assert response.content == JSONResponse(expected_feed()).body
+    response = client.get(f"/posts/{post['id']}/comments/", headers=bob)
+    assert response.content == JSONResponse(jsonable_encoder(get_comments_for_post(post["id"], "bob"))).body
@@ -0,0 +1,34 @@
+from repositories import record_log
+
+# Тест чтения журнала: побеждает последняя версия записи, надгробия удаляют записи
+def test_read_records_applies_updates_and_tombstones(tmp_path):
+    path = str(tmp_path / "access.txt")
+    record_log.append_record(path, "1|post1|bob|alice|2025-01-01 10:00:00\n")
+    record_log.append_record(path, "2|post2|bob|alice|2025-01-01 11:00:00\n")
+    record_log.append_record(path, "3|post3|bob|alice|2025-01-01 12:00:00\n")
+    record_log.append_record(path, "1|post1|carol|alice|2025-01-01 10:00:00\n", replaces=True)
+    record_log.append_tombstone(path, "2")
+
+    records = record_log.read_records(path)
+    assert [record[0] for record in records] == ["1", "3"]
+    assert records[0][2] == "carol"
+    # Потоковое чтение (выгрузка данных) возвращает те же записи в том же порядке
+    assert list(record_log.iter_records(path)) == records
+
+# Тест компактизации: содержимое не меняется, мертвые строки удаляются
+def test_compact_keeps_live_records(tmp_path):
+    path = str(tmp_path / "access.txt")
+    for i in range(10):
+        record_log.append_record(path, f"{i}|post{i}|bob|alice|2025-01-01 10:00:00\n")
+    for i in range(0, 10, 2):
+        record_log.append_tombstone(path, str(i))
+    record_log.append_record(path, "1|post1|carol|alice|2025-01-01 10:00:00\n", replaces=True)
+    before = record_log.read_records(path)
+
+    record_log.compact(path)
+
+    assert record_log.read_records(path) == before
+    with open(path, encoding="utf-8") as file:
+        lines = file.read().splitlines()
+    assert lines == ["|".join(record) for record in before]
+    assert not (tmp_path / "access.txt.compact").exists()
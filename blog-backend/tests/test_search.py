@@ -0,0 +1,65 @@
+from fastapi import status
+from tests.test_posts import auth_headers
+
+def create_post(client, headers, title, content, tags=(), is_public=True):
+    response = client.post("/posts/", json={
+        "title": title, "content": content, "is_public": is_public, "tags": list(tags)
+    }, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+def search_titles(client, headers, **params):
+    response = client.get("/posts/search", params=params, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    return [post["title"] for post in response.json()]
+
+# Тест поиска: ранжирование, фильтр по тегам, видимость приватных постов, обновление индекса
+def test_search_posts(client):
+    alice = auth_headers(client, "alice")
+    bob = auth_headers(client, "bob")
+    create_post(client, alice, "Заметки", "немного про python и fastapi", tags=["python"])
+    create_post(client, alice, "Python и asyncio", "асинхронный python на практике", tags=["python"])
+    create_post(client, alice, "Рецепт борща", "свекла, капуста и картофель", tags=["food"])
+    secret = create_post(client, alice, "Секретный python", "черновик", tags=["python"], is_public=False)
+
+    # Слово в заголовке и повтор в тексте ставят пост выше; приватный пост виден только автору
+    assert search_titles(client, bob, q="Python") == ["Python и asyncio", "Заметки"]
+    assert sorted(search_titles(client, alice, q="python")) == ["Python и asyncio", "Заметки", "Секретный python"]
+    assert search_titles(client, bob, q="рецепт капуста") == ["Рецепт борща"]
+    assert search_titles(client, bob, q="неизвестное") == []
+
+    # Только теги: от новых постов к старым; теги и слова вместе
+    assert search_titles(client, bob, tags=["python"]) == ["Python и asyncio", "Заметки"]
+    assert search_titles(client, bob, q="fastapi", tags=["python"]) == ["Заметки"]
+    assert search_titles(client, bob, q="python", tags=["python", "food"]) == []
+
+    request = client.post(f"/posts/access/request/{secret['id']}", headers=bob).json()
+    client.post(f"/posts/access/grant/{request['id']}", headers=alice)
+    assert "Секретный python" in search_titles(client, bob, q="черновик")
+
+    response = client.put(f"/posts/{secret['id']}", json={
+        "title": "Чистовик", "content": "готовый текст", "is_public": True, "tags": []
+    }, headers=alice)
+    assert response.status_code == status.HTTP_200_OK
+    assert search_titles(client, bob, q="черновик") == []
+    assert search_titles(client, bob, q="чистовик") == ["Чистовик"]
+    assert client.delete(f"/posts/{secret['id']}", headers=alice).status_code == status.HTTP_200_OK
+    assert search_titles(client, bob, q="чистовик") == []
+
+# Тест постраничной выдачи результатов поиска
+def test_search_pagination(client):
+    alice = auth_headers(client, "alice")
+    for i in range(3):
+        create_post(client, alice, f"Пост {i}", "общий текст " * (i + 1))
+
+    response = client.get("/posts/search", params={"q": "общий", "limit": 2}, headers=alice)
+    first_page = [post["title"] for post in response.json()]
+    response = client.get("/posts/search", params={
+        "q": "общий", "limit": 2, "cursor": response.headers["X-Next-Cursor"]
+    }, headers=alice)
+    assert len(first_page) == 2
+    assert sorted(first_page + [post["title"] for post in response.json()]) == ["Пост 0", "Пост 1", "Пост 2"]
+    assert "X-Next-Cursor" not in response.headers
+
+    response = client.get("/posts/search", params={"q": "общий", "cursor": "!!!"}, headers=alice)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,213 @@
+import pytest
+from datetime import datetime
+from models.post import Post, PostAccessRequest, PostAccess, Comment
+from models.user import UserInDB, Subscription, RefreshToken
+from repositories import record_log
+from repositories.post_store import PostStore
+from repositories.sqlite_storage import SQLiteStorage
+from repositories.text_storage import TextStorage
+from tools.migrate import copy_storage
+
+def make_text_storage(directory) -> TextStorage:
+    names = ["users", "posts", "access_requests", "access", "comments", "subscriptions", "refresh_tokens"]
+    for name in names:
+        (directory / f"{name}.txt").write_text("")
+    return TextStorage(*[str(directory / f"{name}.txt") for name in names[:5]],
+                       str(directory / "comments.txt.idx"), str(directory / "subscriptions.txt"),
+                       str(directory / "refresh_tokens.txt"))
+
+def make_sqlite_storage(directory) -> SQLiteStorage:
+    return SQLiteStorage(str(directory / "blog.db"))
+
+def make_post(post_id, author, is_public=True, minute=0):
+    return Post(id=post_id, title=f"title {post_id}", content="text", is_public=is_public,
+                tags=["a", "b"], author=author, created_at=datetime(2025, 1, 1, 10, minute))
+
+def fill(storage):
+    storage.insert_post(make_post("p1", "alice"))
+    storage.insert_post(make_post("p2", "bob", is_public=False, minute=1))
+    storage.insert_post(make_post("p3", "alice", is_public=False, minute=2))
+    storage.insert_access_request(PostAccessRequest(
+        id="r1", post_id="p2", requester_username="alice", status="pending", created_at=datetime(2025, 1, 2)))
+    storage.insert_access(PostAccess(
+        id="a1", post_id="p2", viewer_username="alice", granted_by="bob", created_at=datetime(2025, 1, 3)))
+    storage.insert_comment(Comment(
+        id="c1", post_id="p1", author_username="bob", content="первый", created_at=datetime(2025, 1, 4, 10)))
+    storage.insert_comment(Comment(
+        id="c2", post_id="p1", author_username="alice", content="второй", created_at=datetime(2025, 1, 4, 11)))
+    storage.save_user(UserInDB(username="alice", email="alice@example.com", hashed_password="hash"))
+    storage.insert_subscription(Subscription(
+        id="s1", follower_username="alice", following_username="bob", created_at=datetime(2025, 1, 5)))
+    storage.insert_refresh_token(RefreshToken(
+        token_hash="h1", username="alice", expires_at=datetime(2025, 2, 1), created_at=datetime(2025, 1, 6)))
+
+# Оба движка хранения должны вести себя одинаково
+@pytest.fixture(params=[make_text_storage, make_sqlite_storage], ids=["text", "sqlite"])
+def storage(request, tmp_path):
+    return request.param(tmp_path)
+
+# Тест операций с постами: выборки по автору и видимости, изменение и удаление
+def test_storage_posts(storage):
+    fill(storage)
+    assert [post.id for post in storage.list_posts()] == ["p1", "p2", "p3"]
+    assert [post.id for post in storage.list_posts_by_author("alice")] == ["p1", "p3"]
+    assert [post.id for post in storage.list_posts_by_authors(["bob", "alice"])] == ["p1", "p2", "p3"]
+    assert [post.id for post in storage.list_public_posts()] == ["p1"]
+    assert [post.id for post in storage.list_private_posts()] == ["p2", "p3"]
+    assert storage.get_post_ids_by_author("bob") == {"p2"}
+    assert storage.get_post("p1").tags == ["a", "b"]
+
+    updated = make_post("p1", "alice", is_public=False)
+    updated.title = "новый заголовок"
+    storage.update_post(updated)
+    assert storage.get_post("p1").title == "новый заголовок"
+    assert [post.id for post in storage.list_private_posts()] == ["p1", "p2", "p3"]
+
+    storage.delete_post("p3")
+    assert storage.get_post("p3") is None
+    assert [post.id for post in storage.list_posts()] == ["p1", "p2"]
+
+# Тест запросов на доступ, разрешений, комментариев, пользователей и подписок
+def test_storage_access_comments_users(storage):
+    fill(storage)
+    request = storage.get_access_request("r1")
+    request.status = "approved"
+    storage.update_access_request(request)
+    assert storage.list_access_requests_by_post("p2")[0].status == "approved"
+    assert [r.id for r in storage.list_access_requests_by_requester("alice")] == ["r1"]
+    assert [r.id for r in storage.list_access_requests_for_author("bob")] == ["r1"]
+    assert storage.list_access_requests_for_author("alice") == []
+
+    assert storage.get_granted_post_ids("alice") == {"p2"}
+    assert [access.id for access in storage.list_access_by_post("p2")] == ["a1"]
+    storage.delete_access("a1")
+    assert storage.get_granted_post_ids("alice") == set()
+
+    assert [comment.id for comment in storage.list_comments_by_post("p1")] == ["c1", "c2"]
+    assert storage.get_latest_comments(["p1", "p2"]) == {"p1": storage.list_comments_by_post("p1")[1]}
+
+    storage.save_user(UserInDB(username="alice", email="alice@example.com", hashed_password="hash",
+                               refresh_token="token"))
+    assert storage.get_user("alice").refresh_token == "token"
+    assert storage.get_user("nobody") is None
+    # Добавление не перезаписывает существующего пользователя
+    assert not storage.insert_user(UserInDB(username="alice", email="other@example.com", hashed_password="other"))
+    assert storage.get_user("alice").hashed_password == "hash"
+    assert storage.insert_user(UserInDB(username="carol", email="carol@example.com", hashed_password="hash"))
+    assert storage.get_user("carol").email == "carol@example.com"
+
+    assert storage.is_subscribed("alice", "bob")
+    assert not storage.is_subscribed("bob", "alice")
+    assert storage.get_followed_usernames("alice") == {"bob"}
+    assert storage.get_follower_usernames("bob") == {"alice"}
+    assert [s.id for s in storage.list_subscriptions_by_follower("alice")] == ["s1"]
+
+# Тест хранилища refresh token: поиск по хешу, токены пользователя, просроченные и удаление
+def test_storage_refresh_tokens(storage):
+    fill(storage)
+    storage.insert_refresh_token(RefreshToken(
+        token_hash="h2", username="alice", expires_at=datetime(2025, 3, 1), created_at=datetime(2025, 1, 7)))
+    storage.insert_refresh_token(RefreshToken(
+        token_hash="h3", username="bob", expires_at=datetime(2025, 3, 1), created_at=datetime(2025, 1, 7)))
+    assert storage.get_refresh_token("h1").username == "alice"
+    assert storage.get_refresh_token("missing") is None
+    assert sorted(storage.list_refresh_token_hashes("alice")) == ["h1", "h2"]
+    assert storage.list_expired_refresh_token_hashes(datetime(2025, 2, 15)) == ["h1"]
+
+    storage.delete_refresh_tokens(["h1", "missing"])
+    assert storage.get_refresh_token("h1") is None
+    assert storage.list_refresh_token_hashes("alice") == ["h2"]
+    assert {token.token_hash for token in storage.iter_refresh_tokens()} == {"h2", "h3"}
+
+# Тест переноса данных из текстовых файлов в SQLite
+def test_migrate_text_to_sqlite(tmp_path):
+    source = make_text_storage(tmp_path)
+    fill(source)
+    target = make_sqlite_storage(tmp_path)
+    with target.transaction():
+        counts = copy_storage(source, target)
+    assert counts == {"posts": 3, "access_requests": 1, "access": 1, "comments": 2, "users": 1, "subscriptions": 1,
+                      "refresh_tokens": 1}
+    assert [post.id for post in target.list_posts()] == ["p1", "p2", "p3"]
+    assert target.get_granted_post_ids("alice") == {"p2"}
+    assert target.get_latest_comments(["p1"])["p1"].id == "c2"
+    assert target.get_user("alice").email == "alice@example.com"
+    assert target.get_followed_usernames("alice") == {"bob"}
+    assert not target.is_empty()
+
+# Тест постраничной выдачи постов по ключу (created_at, id)
+def test_storage_posts_page(storage):
+    fill(storage)
+    storage.insert_post(make_post("p0", "bob", minute=1))
+    page = storage.list_posts_page(None, 2)
+    assert [post.id for post in page] == ["p1", "p0"]
+    after = (str(page[-1].created_at), page[-1].id)
+    assert [post.id for post in storage.list_posts_page(after, 2)] == ["p2", "p3"]
+    assert [post.id for post in storage.list_posts_page(None, None, authors=["alice", "bob"])] == ["p1", "p0", "p2", "p3"]
+    assert [post.id for post in storage.list_posts_page(after, 1, authors=["alice"])] == ["p3"]
+    assert [post.id for post in storage.list_posts_page(None, None, is_public=False)] == ["p2", "p3"]
+    storage.delete_post("p2")
+    assert [post.id for post in storage.list_posts_page(after, None)] == ["p3"]
+
+# Тест метаданных постов: выборки без заголовков и текстов, полные посты по списку ID
+def test_storage_post_meta(storage):
+    fill(storage)
+    meta = storage.get_post_meta("p2")
+    assert (meta.author, meta.is_public, meta.tags) == ("bob", False, ["a", "b"])
+    assert meta.key == (str(storage.get_post("p2").created_at), "p2")
+    assert storage.get_post_meta("missing") is None
+    assert [meta.id for meta in storage.list_post_meta(is_public=False)] == ["p2", "p3"]
+    assert [meta.id for meta in storage.list_post_meta(authors=["bob", "alice"], is_public=False)] == ["p2", "p3"]
+    assert [meta.id for meta in storage.list_post_meta_page(None, 1, authors=["alice"], is_public=False)] == ["p3"]
+    posts = storage.get_posts(["p3", "missing", "p1"])
+    assert [(post.id, post.title) for post in posts] == [("p3", "title p3"), ("p1", "title p1")]
+
+# Тест чтения текстов постов по смещениям строк после изменения и компактизации файла
+def test_text_storage_reads_content_lazily(tmp_path):
+    storage = make_text_storage(tmp_path)
+    fill(storage)
+    updated = make_post("p1", "alice")
+    updated.content = "новый текст"
+    storage.update_post(updated)
+    storage.delete_post("p2")
+    record_log.compact(storage.posts_file)
+    assert [(post.id, post.content) for post in storage.list_posts()] == [("p1", "новый текст"), ("p3", "text")]
+
+
+# Тест сохраненного индекса постов: после перезапуска posts.txt не читается целиком,
+# строки без записи в индексе дочитываются, переписанный файл индексируется заново
+def test_text_storage_post_index(tmp_path, monkeypatch):
+    storage = make_text_storage(tmp_path)
+    fill(storage)
+    updated = make_post("p1", "alice")
+    updated.content = "новый текст"
+    storage.update_post(updated)
+    storage.delete_post("p2")
+
+    def scan_forbidden(path, parse):
+        raise AssertionError(f"{path} прочитан целиком")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(record_log, "scan_records", scan_forbidden)
+        restarted = PostStore(storage.posts_file)
+        restarted.load()
+        assert [(post.id, post.content) for post in restarted.all()] == [("p1", "новый текст"), ("p3", "text")]
+
+        # Последняя строка индекса потеряна: пост дочитывается из posts.txt
+        storage.insert_post(make_post("p4", "bob", minute=3))
+        index_path = storage.post_store.index_path
+        with open(index_path, encoding="utf-8") as file:
+            lines = file.readlines()
+        with open(index_path, "w", encoding="utf-8") as file:
+            file.writelines(lines[:-1])
+        restarted = PostStore(storage.posts_file)
+        restarted.load()
+        assert [post.id for post in restarted.all()] == ["p1", "p3", "p4"]
+        assert restarted.get("p4").title == "title p4"
+
+    # posts.txt переписан на месте: индекс не подходит и строится заново
+    with open(storage.posts_file, "w", encoding="utf-8") as file:
+        file.write("p9|заголовок|текст|True|carol||2025-01-01 10:00:00\n")
+    restarted = PostStore(storage.posts_file)
+    restarted.load()
+    assert [(post.id, post.title) for post in restarted.all()] == [("p9", "заголовок")]
@@ -0,0 +1,65 @@
+import json
+from fastapi import status
+from repositories import pagination
+from repositories.storage import get_storage
+from tests.test_posts import auth_headers, create_post
+
+NDJSON = {"Accept": "application/x-ndjson"}
+
+def ndjson(response):
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+# Тест потоковой выдачи: те же посты, что и в JSON-массиве, порциями по STREAM_CHUNK_SIZE
+def test_ndjson_streaming(client, monkeypatch):
+    monkeypatch.setattr(pagination, "STREAM_CHUNK_SIZE", 2)
+    alice = auth_headers(client, "alice")
+    for index in range(5):
+        create_post(client, alice, f"public {index}")
+    create_post(client, alice, "private", is_public=False)
+
+    storage = get_storage()
+    page_sizes = []
+    list_posts_page = storage.list_posts_page
+
+    def counting_page(after, limit, *args, **kwargs):
+        page_sizes.append(limit)
+        return list_posts_page(after, limit, *args, **kwargs)
+
+    monkeypatch.setattr(storage, "list_posts_page", counting_page)
+    posts = ndjson(client.get("/posts/public", headers=NDJSON))
+    assert posts == client.get("/posts/public").json()
+    assert [post["title"] for post in posts] == [f"public {index}" for index in range(5)]
+    # Хранилище читается порциями, а не целиком
+    assert page_sizes[:3] == [2, 2, 2]
+
+    assert ndjson(client.get("/posts/me", headers={**alice, **NDJSON})) == client.get("/posts/me", headers=alice).json()
+    feed = ndjson(client.get("/posts/public/feed", headers=NDJSON))
+    assert feed == client.get("/posts/public/feed").json()
+    assert feed[-1]["title"] == "private" and feed[-1]["content"] == ""
+
+    # Курсор задает начало выдачи, limit - число постов
+    page = client.get("/posts/public", params={"limit": 2})
+    cursor = page.headers["X-Next-Cursor"]
+    for path in ("/posts/public", "/posts/public/feed"):
+        rest = ndjson(client.get(path, params={"cursor": cursor, "limit": 3}, headers=NDJSON))
+        assert [post["title"] for post in rest] == ["public 2", "public 3", "public 4"]
+        assert "X-Next-Cursor" not in client.get(path, params={"cursor": cursor}, headers=NDJSON).headers
+    assert client.get("/posts/public", params={"cursor": "???"}, headers=NDJSON).status_code == status.HTTP_400_BAD_REQUEST
+
+# Тест кэширования: у потока и JSON-массива разные ETag, ответ зависит от Accept
+def test_ndjson_etag(client):
+    alice = auth_headers(client, "alice")
+    create_post(client, alice, "first")
+
+    response = client.get("/posts/public/feed")
+    streamed = client.get("/posts/public/feed", headers=NDJSON)
+    assert streamed.headers["ETag"] != response.headers["ETag"]
+    assert streamed.headers["Vary"] == "Accept"
+    not_modified = client.get("/posts/public/feed", headers={**NDJSON, "If-None-Match": streamed.headers["ETag"]})
+    assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+    assert client.get(
+        "/posts/public/feed", headers={**NDJSON, "If-None-Match": response.headers["ETag"]}
+    ).status_code == status.HTTP_200_OK
+    assert client.get("/posts/me", headers=alice).headers["Vary"] == "Authorization, Accept"
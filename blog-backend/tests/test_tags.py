@@ -0,0 +1,50 @@
+from fastapi import status
+from tests.test_posts import auth_headers
+from tests.test_search import create_post
+
+def tagged_titles(client, tag, **params):
+    response = client.get(f"/posts/public/tags/{tag}", params=params)
+    assert response.status_code == status.HTTP_200_OK
+    return [post["title"] for post in response.json()]
+
+# Тест индекса тегов: счетчики публичных постов, список постов с тегом, обновление индекса
+def test_tags(client):
+    alice = auth_headers(client, "alice")
+    first = create_post(client, alice, "first", "текст", tags=["python", "news"])
+    create_post(client, alice, "second", "текст", tags=["python"])
+    create_post(client, alice, "third", "текст", tags=["food", "python"])
+    create_post(client, alice, "secret", "текст", tags=["python", "food"], is_public=False)
+
+    response = client.get("/posts/public/tags")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [
+        {"tag": "python", "count": 3}, {"tag": "food", "count": 1}, {"tag": "news", "count": 1}
+    ]
+    assert client.get("/posts/public/tags", params={"limit": 1}).json() == [{"tag": "python", "count": 3}]
+    assert tagged_titles(client, "python") == ["first", "second", "third"]
+    assert tagged_titles(client, "unknown") == []
+
+    client.put(f"/posts/{first['id']}", json={
+        "title": "first", "content": "текст", "is_public": True, "tags": ["food"]
+    }, headers=alice)
+    assert tagged_titles(client, "python") == ["second", "third"]
+    assert tagged_titles(client, "food") == ["first", "third"]
+    assert client.delete(f"/posts/{first['id']}", headers=alice).status_code == status.HTTP_200_OK
+    assert client.get("/posts/public/tags").json() == [{"tag": "python", "count": 2}, {"tag": "food", "count": 1}]
+
+# Тест постраничной выдачи постов с тегом
+def test_tag_pagination(client):
+    alice = auth_headers(client, "alice")
+    for i in range(3):
+        create_post(client, alice, f"Пост {i}", "текст", tags=["python"])
+
+    response = client.get("/posts/public/tags/python", params={"limit": 2})
+    assert [post["title"] for post in response.json()] == ["Пост 0", "Пост 1"]
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get("/posts/public/tags/python", params={"limit": 2, "cursor": cursor})
+    assert [post["title"] for post in response.json()] == ["Пост 2"]
+    assert "X-Next-Cursor" not in response.headers
+    assert response.headers["Cache-Control"].startswith("public")
+
+    response = client.get("/posts/public/tags/python", params={"cursor": "!!!"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,78 @@
+from fastapi import status
+from repositories import post_repository
+from services import timelines
+from services.timelines import follower_timelines
+from tests.test_posts import auth_headers, create_post
+
+def followed_titles(client, headers, **params):
+    response = client.get("/users/followed/posts", params=params, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    return [post["title"] for post in response.json()], response.headers.get("X-Next-Cursor")
+
+def read_all_pages(client, headers, limit):
+    titles, cursor = followed_titles(client, headers, limit=limit)
+    while cursor:
+        page, cursor = followed_titles(client, headers, limit=limit, cursor=cursor)
+        titles.extend(page)
+    return titles
+
+# Тест хронологии подписчика: рассылка новых постов, видимость приватных постов, новая подписка
+def test_follower_timeline(client, monkeypatch):
+    alice = auth_headers(client, "alice")
+    bob = auth_headers(client, "bob")
+    carol = auth_headers(client, "carol")
+    client.post("/users/follow/alice", headers=bob)
+    create_post(client, alice, "a1")
+    create_post(client, carol, "c1")
+    assert followed_titles(client, bob) == (["a1"], None)
+
+    # Хронология построена: дальше страницы читаются без обхода постов авторов
+    def fail(*args, **kwargs):
+        raise AssertionError("хронология должна читаться из памяти")
+    monkeypatch.setattr(post_repository, "get_posts_by_authors_page", fail)
+    private_post = create_post(client, alice, "a2", is_public=False)
+    create_post(client, alice, "a3")
+    assert followed_titles(client, bob) == (["a1", "a3"], None)
+
+    request = client.post(f"/posts/access/request/{private_post['id']}", headers=bob).json()
+    client.post(f"/posts/access/grant/{request['id']}", headers=alice)
+    assert read_all_pages(client, bob, limit=1) == ["a1", "a2", "a3"]
+
+    # После подписки в хронологию попадают и старые посты нового автора
+    client.post("/users/follow/carol", headers=bob)
+    create_post(client, carol, "c2")
+    assert read_all_pages(client, bob, limit=2) == ["a1", "c1", "a2", "a3", "c2"]
+
+# Тест ограниченной хронологии и авторов с большим числом подписчиков
+def test_bounded_timeline_and_pull_authors(client, monkeypatch):
+    monkeypatch.setattr(timelines, "TIMELINE_SIZE", 2)
+    alice = auth_headers(client, "alice")
+    bob = auth_headers(client, "bob")
+    client.post("/users/follow/alice", headers=bob)
+    for title in ["a1", "a2", "a3"]:
+        create_post(client, alice, title)
+    # Посты после первых TIMELINE_SIZE читаются из хранилища
+    assert read_all_pages(client, bob, limit=1) == ["a1", "a2", "a3"]
+
+    # Первые страницы читаются из хронологии, в хранилище - только остаток за ее пределами
+    storage_pages = []
+    get_posts_by_authors_page = post_repository.get_posts_by_authors_page
+
+    def counting_page(authors, current_username, after, limit):
+        storage_pages.append(limit)
+        return get_posts_by_authors_page(authors, current_username, after, limit)
+
+    monkeypatch.setattr(post_repository, "get_posts_by_authors_page", counting_page)
+    # Страница из одного поста читает два ключа (второй - признак следующей страницы)
+    assert followed_titles(client, bob, limit=1)[0] == ["a1"]
+    assert storage_pages == []
+    assert followed_titles(client, bob, limit=2)[0] == ["a1", "a2"]
+    assert storage_pages == [1]
+    create_post(client, alice, "a4")
+    assert read_all_pages(client, bob, limit=2) == ["a1", "a2", "a3", "a4"]
+
+    # Посты автора с большим числом подписчиков не рассылаются, а подмешиваются при чтении
+    monkeypatch.setattr(timelines, "FANOUT_MAX_FOLLOWERS", 0)
+    create_post(client, alice, "a5")
+    assert "alice" in follower_timelines._pull_authors
+    assert followed_titles(client, bob, limit=3, cursor=followed_titles(client, bob, limit=2)[1])[0] == ["a3", "a4", "a5"]
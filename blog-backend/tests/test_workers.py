@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import uuid
+import pytest
+from datetime import datetime
+from fastapi import status
+from models.post import Post, Comment
+from repositories import post_repository, record_log, versions
+from repositories.post_store import PostStore
+from repositories.storage import get_storage
+from services.public_feed import PublicFeedSnapshot
+from services.search import SearchIndex
+from services.tags import TagIndex
+from tests.test_posts import auth_headers
+from tests.test_search import create_post, search_titles
+
+def write_in_worker(post_id: str, results):
+    """
+    Другой воркер: пишет через репозитории и сообщает свою версию ресурсов.
+    """
+    post_repository.save_post(Post(
+        id=uuid.uuid4().hex, title="из воркера", content="редкое слово", is_public=True,
+        tags=["python"], author="alice", created_at=datetime(2030, 1, 1)
+    ))
+    post_repository.save_comment(Comment(
+        id=uuid.uuid4().hex, post_id=post_id, author_username="alice", content="ответ", created_at=datetime(2030, 1, 2)
+    ))
+    results.put(versions.current("posts", f"comments:{post_id}"))
+
+def fail_rebuild(*args, **kwargs):
+    raise AssertionError("кэш перестроен целиком")
+
+# Тест согласования кэшей между процессами: записи другого воркера попадают
+# в индексы и снимок ленты этого процесса без их перестроения
+def test_changes_from_other_worker(client, monkeypatch):
+    alice = auth_headers(client, "alice")
+    first = create_post(client, alice, "первый", "текст", tags=["python"])
+    assert client.get("/posts/public/tags").json() == [{"tag": "python", "count": 1}]
+    assert search_titles(client, alice, q="редкое") == []
+    assert client.get("/posts/public/feed").status_code == status.HTTP_200_OK
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=write_in_worker, args=(first["id"], results))
+    process.start()
+    worker_version = results.get(timeout=60)
+    process.join(timeout=60)
+    assert process.exitcode == 0
+
+    for cache in [TagIndex, SearchIndex, PublicFeedSnapshot]:
+        monkeypatch.setattr(cache, "rebuild", fail_rebuild)
+    # Хранилище дочитывает только строки, дописанные воркером
+    monkeypatch.setattr(PostStore, "load", fail_rebuild)
+    assert client.get("/posts/public/tags").json() == [{"tag": "python", "count": 2}]
+    assert search_titles(client, alice, q="редкое") == ["из воркера"]
+    feed = client.get("/posts/public/feed").json()
+    assert [post["title"] for post in feed] == ["первый", "из воркера"]
+    assert feed[0]["latest_comment"]["content"] == "ответ"
+    # Версии ресурсов (и ETag) одинаковы во всех воркерах
+    assert versions.current("posts", f"comments:{first['id']}") == worker_version
+
+# Тест изменения данных в обход репозиториев: сдвигается эпоха и версии ресурсов
+@pytest.mark.text_storage
+def test_external_change(client):
+    alice = auth_headers(client, "alice")
+    create_post(client, alice, "первый", "текст")
+    epoch = versions.check()
+    version = versions.current("posts")
+    with open(get_storage().posts_file, "a", encoding="utf-8") as file:
+        file.write(f"{uuid.uuid4().hex}|вручную|текст|True|alice||2030-01-01 00:00:00\n")
+    assert versions.check() == epoch + 1
+    assert versions.current("posts") != version
+    assert [post["title"] for post in client.get("/posts/public/feed").json()] == ["первый", "вручную"]
+
+# Тест компактизации: новая метка файла не считается изменением в обход репозиториев
+@pytest.mark.text_storage
+def test_compaction_keeps_epoch(client):
+    alice = auth_headers(client, "alice")
+    post = create_post(client, alice, "первый", "текст")
+    client.put(f"/posts/{post['id']}", json={"title": "изменен", "content": "текст", "is_public": True}, headers=alice)
+    epoch = versions.check()
+    version = versions.current("posts")
+    posts_file = get_storage().posts_file
+    size = os.path.getsize(posts_file)
+    record_log.compact(posts_file)
+    assert os.path.getsize(posts_file) < size
+    assert versions.check() == epoch
+    assert versions.current("posts") == version
+    assert [post["title"] for post in client.get("/posts/public/feed").json()] == ["изменен"]
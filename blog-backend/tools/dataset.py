@@ -0,0 +1,294 @@
+"""
+Выгрузка и загрузка данных блога в формате JSON Lines, генерация синтетических наборов.
+
+Запуск из каталога blog-backend:
+    python -m tools.dataset export DIR [--chunk-rows N]
+    python -m tools.dataset import DIR [--skip-invalid] [--fsync]
+    python -m tools.dataset validate DIR
+    python -m tools.dataset generate DIR --users N --posts N [--seed N]
+
+Набор данных - директория с файлами <вид>.jsonl (users, posts, comments, access_requests,
+access, subscriptions), по одной записи JSON в строке. С --chunk-rows каждый вид
+разбивается на файлы <вид>.00000.jsonl, <вид>.00001.jsonl, ... по N записей.
+Записи читаются и пишутся потоком: в памяти находится только текущая порция.
+Каждая запись проверяется моделью из models/ (и допустимостью полей для текстовых файлов),
+ошибка сообщается с именем файла и номером строки.
+
+Загрузка пишет в хранилище, выбранное переменными окружения (STORAGE_BACKEND, DATABASE_*).
+По умолчанию загрузка выполняется без fsync каждой записи: прерванную загрузку
+нужно повторить в пустое хранилище.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Type
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, ValidationError
+from models.post import Post, PostAccessRequest, PostAccess, Comment
+from models.user import UserInDB, Subscription
+from repositories import write_coordinator
+from repositories.storage import Storage, get_storage
+
+# Сколько записей читается и записывается за раз
+BATCH_SIZE = 1000
+
+class Kind(NamedTuple):
+    model: Type[BaseModel]
+    # Поток всех записей хранилища
+    read: Callable[[Storage], Iterable[BaseModel]]
+    # Запись порции записей в хранилище
+    write: Callable[[Storage, List[BaseModel]], None]
+    # Разделители, недопустимые в полях текстовых файлов
+    separators: str = "|"
+
+def _iter_posts(storage: Storage) -> Iterator[Post]:
+    # Посты читаются страницами, полные тексты не загружаются в память все сразу
+    after = None
+    while True:
+        page = storage.list_posts_page(after, BATCH_SIZE)
+        yield from page
+        if len(page) < BATCH_SIZE:
+            return
+        after = (str(page[-1].created_at), page[-1].id)
+
+def _insert_each(method: str) -> Callable[[Storage, List[BaseModel]], None]:
+    def write(storage: Storage, records: List[BaseModel]):
+        insert = getattr(storage, method)
+        for record in records:
+            insert(record)
+    return write
+
+# Виды записей в порядке загрузки: пользователи и посты раньше ссылающихся на них записей
+KINDS: Dict[str, Kind] = {
+    "users": Kind(
+        UserInDB, lambda storage: storage.iter_users(), lambda storage, users: storage.save_users(users), "|:"
+    ),
+    "posts": Kind(Post, _iter_posts, _insert_each("insert_post")),
+    "comments": Kind(Comment, lambda storage: storage.iter_comments(), _insert_each("insert_comment")),
+    "access_requests": Kind(
+        PostAccessRequest, lambda storage: storage.iter_access_requests(),
+        _insert_each("insert_access_request")
+    ),
+    "access": Kind(PostAccess, lambda storage: storage.iter_access(), _insert_each("insert_access")),
+    "subscriptions": Kind(
+        Subscription, lambda storage: storage.iter_subscriptions(), _insert_each("insert_subscription")
+    ),
+}
+
+class InvalidRecord(ValueError):
+    def __init__(self, path: str, line: int, message: str):
+        super().__init__(f"{path}:{line}: {message}")
+
+def _encode(record: BaseModel) -> str:
+    # access_status вычисляется для каждого пользователя, refresh token хранятся отдельно
+    return json.dumps(jsonable_encoder(record, exclude={"access_status", "refresh_token"}), ensure_ascii=False) + "\n"
+
+def _check_separators(record: BaseModel, separators: str) -> Optional[str]:
+    for name, value in jsonable_encoder(record).items():
+        values = value if isinstance(value, list) else [value]
+        for item in values:
+            if isinstance(item, str) and any(char in item for char in separators + "\n"):
+                return f"поле {name} содержит недопустимый символ ({separators!r} или перевод строки)"
+        if name == "tags" and any("," in item for item in values):
+            return "тег содержит запятую"
+    return None
+
+def kind_files(directory: str, name: str) -> List[str]:
+    single = os.path.join(directory, f"{name}.jsonl")
+    chunks = sorted(glob.glob(os.path.join(directory, f"{name}.[0-9]*.jsonl")))
+    return ([single] if os.path.exists(single) else []) + chunks
+
+def read_records(
+    directory: str, name: str, check_text_fields: bool = True, errors: Optional[List[str]] = None
+) -> Iterator[BaseModel]:
+    """
+    Читает записи вида name из набора данных, проверяя каждую моделью.
+    Если передан список errors, некорректные записи пропускаются и описания ошибок
+    добавляются в него, иначе выбрасывается InvalidRecord.
+    """
+    kind = KINDS[name]
+    for path in kind_files(directory, name):
+        with open(path, "r", encoding="utf-8") as file:
+            for line_number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = kind.model(**json.loads(line))
+                    problem = _check_separators(record, kind.separators) if check_text_fields else None
+                except (ValueError, TypeError, ValidationError) as e:
+                    problem = str(e).replace("\n", " ")
+                if problem is not None:
+                    error = InvalidRecord(path, line_number, problem)
+                    if errors is None:
+                        raise error
+                    errors.append(str(error))
+                    continue
+                yield record
+
+class _ChunkWriter:
+    """
+    Пишет строки в <вид>.jsonl или, с chunk_rows, в <вид>.NNNNN.jsonl по chunk_rows строк.
+    """
+
+    def __init__(self, directory: str, name: str, chunk_rows: Optional[int]):
+        self.directory = directory
+        self.name = name
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self._file = None
+
+    def write(self, line: str):
+        if self._file is None or (self.chunk_rows and self.rows % self.chunk_rows == 0):
+            self.close()
+            suffix = f".{self.rows // self.chunk_rows:05d}" if self.chunk_rows else ""
+            self._file = open(os.path.join(self.directory, f"{self.name}{suffix}.jsonl"), "w", encoding="utf-8")
+        self._file.write(line)
+        self.rows += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def export_dataset(storage: Storage, directory: str, chunk_rows: Optional[int] = None) -> Dict[str, int]:
+    """
+    Выгружает все записи хранилища в набор данных. Возвращает количество записей по видам.
+    """
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    for name, kind in KINDS.items():
+        writer = _ChunkWriter(directory, name, chunk_rows)
+        try:
+            # Пустой вид выгружается пустым файлом, чтобы набор был полным
+            if not chunk_rows:
+                open(os.path.join(directory, f"{name}.jsonl"), "w").close()
+            for record in kind.read(storage):
+                writer.write(_encode(record))
+        finally:
+            writer.close()
+        counts[name] = writer.rows
+    return counts
+
+@contextmanager
+def _without_fsync():
+    previous = write_coordinator.WRITE_FSYNC
+    write_coordinator.WRITE_FSYNC = False
+    try:
+        yield
+    finally:
+        write_coordinator.WRITE_FSYNC = previous
+
+def _batches(records: Iterable[BaseModel]) -> Iterator[List[BaseModel]]:
+    records = iter(records)
+    while True:
+        batch = list(islice(records, BATCH_SIZE))
+        if not batch:
+            return
+        yield batch
+
+def import_dataset(
+    storage: Storage, directory: str, errors: Optional[List[str]] = None, fsync: bool = False
+) -> Dict[str, int]:
+    """
+    Загружает набор данных в хранилище порциями по BATCH_SIZE записей.
+    Возвращает количество загруженных записей по видам (см. read_records про errors).
+    """
+    from repositories.text_storage import TextStorage
+    check_text_fields = isinstance(storage, TextStorage)
+    transaction = getattr(storage, "transaction", nullcontext)
+    counts = {}
+    with (nullcontext() if fsync else _without_fsync()), transaction():
+        for name, kind in KINDS.items():
+            counts[name] = 0
+            for batch in _batches(read_records(directory, name, check_text_fields, errors)):
+                kind.write(storage, batch)
+                counts[name] += len(batch)
+    return counts
+
+def validate_dataset(directory: str, check_text_fields: bool = True) -> Tuple[Dict[str, int], List[str]]:
+    """
+    Проверяет набор данных без загрузки. Возвращает количество корректных записей и ошибки.
+    """
+    errors: List[str] = []
+    counts = {name: sum(1 for _ in read_records(directory, name, check_text_fields, errors)) for name in KINDS}
+    return counts, errors
+
+def generate(directory: str, users: int, posts: int, seed: int = 42, chunk_rows: Optional[int] = None, **options):
+    """
+    Генерирует синтетический набор данных (benchmarks.dataset) и выгружает его в directory.
+    """
+    from benchmarks.dataset import DATABASE_FILES, generate_dataset
+    from repositories.text_storage import TextStorage
+    with tempfile.TemporaryDirectory() as temp_directory:
+        generate_dataset(temp_directory, users=users, posts=posts, seed=seed, **options)
+        paths = {env_name: os.path.join(temp_directory, file_name) for env_name, file_name in DATABASE_FILES.items()}
+        source = TextStorage(
+            users_file=paths["DATABASE_USERS_FILE"],
+            posts_file=paths["DATABASE_POSTS_FILE"],
+            access_requests_file=paths["DATABASE_ACCESS_REQUESTS_FILE"],
+            access_file=paths["DATABASE_ACCESS_FILE"],
+            comments_file=paths["DATABASE_COMMENTS_FILE"],
+            comments_index_file=os.path.join(temp_directory, "comments.txt.idx"),
+            subscriptions_file=paths["DATABASE_SUBSCRIPTIONS_FILE"],
+            refresh_tokens_file=os.path.join(temp_directory, "refresh_tokens.txt"),
+        )
+        return export_dataset(source, directory, chunk_rows)
+
+def _print_counts(counts: Dict[str, int]):
+    for name, count in counts.items():
+        print(f"{name}: {count}")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Выгрузка, загрузка и генерация данных блога (JSON Lines)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="выгрузить хранилище в набор данных")
+    export_parser.add_argument("directory")
+    export_parser.add_argument("--chunk-rows", type=int, default=None, help="записей в одном файле")
+    import_parser = commands.add_parser("import", help="загрузить набор данных в хранилище")
+    import_parser.add_argument("directory")
+    import_parser.add_argument("--skip-invalid", action="store_true", help="пропускать некорректные записи")
+    import_parser.add_argument("--fsync", action="store_true", help="сбрасывать на диск каждую запись")
+    validate_parser = commands.add_parser("validate", help="проверить набор данных")
+    validate_parser.add_argument("directory")
+    generate_parser = commands.add_parser("generate", help="сгенерировать синтетический набор данных")
+    generate_parser.add_argument("directory")
+    generate_parser.add_argument("--users", type=int, default=1000)
+    generate_parser.add_argument("--posts", type=int, default=10000)
+    generate_parser.add_argument("--comments-per-post", type=float, default=2)
+    generate_parser.add_argument("--content-length", type=int, default=0)
+    generate_parser.add_argument("--seed", type=int, default=42)
+    generate_parser.add_argument("--chunk-rows", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        _print_counts(export_dataset(get_storage(), args.directory, args.chunk_rows))
+    elif args.command == "generate":
+        _print_counts(generate(
+            args.directory, args.users, args.posts, args.seed, args.chunk_rows,
+            comments_per_post=args.comments_per_post, content_length=args.content_length,
+        ))
+    elif args.command == "validate":
+        counts, errors = validate_dataset(args.directory)
+        _print_counts(counts)
+        for error in errors:
+            print(error, file=sys.stderr)
+        return 1 if errors else 0
+    else:
+        errors = [] if args.skip_invalid else None
+        try:
+            counts = import_dataset(get_storage(), args.directory, errors, fsync=args.fsync)
+        except InvalidRecord as e:
+            print(f"Некорректная запись: {e}", file=sys.stderr)
+            return 1
+        _print_counts(counts)
+        for error in errors or []:
+            print(f"Пропущена запись: {error}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Перенос данных из текстовых файлов (database/*.txt) в базу SQLite.
+
+Запуск из каталога blog-backend:
+    python -m tools.migrate [--sqlite database/blog.db] [--replace]
+
+Пути к текстовым файлам берутся из тех же переменных окружения, что и у приложения.
+После переноса приложение переключается на SQLite переменной STORAGE_BACKEND=sqlite.
+"""
+import argparse
+import sys
+from repositories.sqlite_storage import DATABASE_SQLITE_FILE, SQLiteStorage
+from repositories.storage import Storage
+from repositories.text_storage import TextStorage
+from typing import Dict
+
+def copy_storage(source: Storage, target: Storage) -> Dict[str, int]:
+    """
+    Копирует все записи из одного хранилища в другое.
+    Возвращает количество перенесенных записей по типам.
+    """
+    counts = {"posts": 0, "access_requests": 0, "access": 0, "comments": 0, "users": 0, "subscriptions": 0,
+              "refresh_tokens": 0}
+    for post in source.list_posts():
+        target.insert_post(post)
+        counts["posts"] += 1
+    for request in source.iter_access_requests():
+        target.insert_access_request(request)
+        counts["access_requests"] += 1
+    for access in source.iter_access():
+        target.insert_access(access)
+        counts["access"] += 1
+    for comment in source.iter_comments():
+        target.insert_comment(comment)
+        counts["comments"] += 1
+    for user in source.iter_users():
+        target.save_user(user)
+        counts["users"] += 1
+    for subscription in source.iter_subscriptions():
+        target.insert_subscription(subscription)
+        counts["subscriptions"] += 1
+    for token in source.iter_refresh_tokens():
+        target.insert_refresh_token(token)
+        counts["refresh_tokens"] += 1
+    return counts
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Перенос данных из текстовых файлов в SQLite")
+    parser.add_argument("--sqlite", default=DATABASE_SQLITE_FILE, help="путь к файлу базы SQLite")
+    parser.add_argument("--replace", action="store_true", help="очистить непустую базу перед переносом")
+    args = parser.parse_args(argv)
+
+    target = SQLiteStorage(args.sqlite)
+    if not target.is_empty():
+        if not args.replace:
+            print(f"База {args.sqlite} уже содержит данные, для перезаписи укажите --replace", file=sys.stderr)
+            return 1
+        target.clear()
+
+    # Весь перенос выполняется одной транзакцией: при ошибке база остается пустой
+    with target.transaction():
+        counts = copy_storage(TextStorage(), target)
+    for name, count in counts.items():
+        print(f"{name}: {count}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())